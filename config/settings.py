@@ -139,4 +139,20 @@ LOGOUT_REDIRECT_URL = '/admin/login/'  # После выхода обратно
 EXCEL_FOLDER = BASE_DIR / 'import_export'
 os.makedirs(EXCEL_FOLDER, exist_ok=True)
 
+# Мониторинг принтеров: TTL кэша DNS для принтеров с именем хоста (сек)
+PRINTER_DNS_TTL = 300
+PRINTER_DNS_NEGATIVE_TTL = 60
+
+# Снимок метрик последней проверки принтеров (общий для cron и веб-процесса)
+# и адреса, с которых /metrics доступен без входа (сервер Prometheus)
+PRINTER_METRICS_FILE = BASE_DIR / 'printer_metrics.json'
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Автодополнение поиска: полная перестройка индекса в памяти раз в N секунд
+# (изменения из других процессов; в своем процессе индекс обновляется сигналами)
+AUTOCOMPLETE_MAX_AGE = 300
+
+# Дисковый кэш готовых файлов экспорта (EXCEL_FOLDER/export_cache), предел размера в байтах
+EXPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -5,6 +5,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 from django.contrib.auth import views as auth_views
+from printer_monitor.views import metrics_view
 
 def redirect_to_admin_login(request):
     """Перенаправляет на страницу логина админки"""
@@ -18,6 +19,7 @@ urlpatterns = [
     path('', RedirectView.as_view(url='/equipment/', permanent=False)),
     path('export/', include('excel_export.urls')),
     path('printers/', include('printer_monitor.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('accounts/login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('accounts/logout/', auth_views.LogoutView.as_view(), name='logout'),
 
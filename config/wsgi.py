@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Фоновые задачи Excel, потерянные при перезапуске сервера, - снова в очередь
+from excel_export.jobs import start_recovery  # noqa: E402
+
+start_recovery()
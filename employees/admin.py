@@ -1,5 +1,7 @@
 # employees/admin.py
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
 from .models import Department, Employee
 
 @admin.register(Department)
@@ -7,12 +9,42 @@ class DepartmentAdmin(admin.ModelAdmin):
     list_display = ('name',)
     search_fields = ('name',)
 
+
+class OffboardingActionForm(ActionForm):
+    """Панель действий списка сотрудников: отдел, куда передать оборудование уволенных"""
+    department = forms.ModelChoiceField(
+        Department.objects.all(), required=False, label='Оборудование в отдел',
+        empty_label='на склад',
+    )
+
+
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
-    list_display = ('last_name', 'first_name', 'middle_name', 'department', 'position', 'is_active')
+    list_display = ('last_name', 'first_name', 'middle_name', 'department', 'position', 'external_id', 'is_active')
     list_filter = ('department', 'is_active')
-    search_fields = ('last_name', 'first_name', 'middle_name')
+    search_fields = ('last_name', 'first_name', 'middle_name', 'external_id')
     ordering = ('last_name', 'first_name')
+    action_form = OffboardingActionForm
+    actions = ['offboard']
     
     # Убираем email и телефон из формы
-    fields = ('last_name', 'first_name', 'middle_name', 'department', 'position', 'is_active')
\ No newline at end of file
+    fields = ('last_name', 'first_name', 'middle_name', 'department', 'position', 'external_id', 'is_active')
+
+    @admin.action(description='Уволить и вернуть оборудование', permissions=['change'])
+    def offboard(self, request, queryset):
+        from equipments.bulk import offboard_employees
+
+        from django.contrib import messages
+        from django.core.exceptions import ValidationError
+
+        try:
+            department = self.action_form.base_fields['department'].clean(request.POST.get('department'))
+        except ValidationError:
+            self.message_user(request, 'Неверно выбран отдел для оборудования', messages.ERROR)
+            return
+        result = offboard_employees(queryset, department=department, created_by=request.user.username)
+        target = f'в отдел «{department.name}»' if department else 'на склад'
+        self.message_user(
+            request,
+            f"Уволено сотрудников: {result.employees}; оборудования {target}: {result.equipment}",
+        )
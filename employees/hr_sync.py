@@ -0,0 +1,288 @@
+# employees/hr_sync.py
+"""
+Синхронизация справочника сотрудников с выгрузкой кадровой системы.
+
+Файл (csv/xlsx, колонки HR_COLUMNS) читается пачками теми же функциями,
+что и импорт оборудования. Сотрудники сопоставляются по табельному
+номеру (Employee.external_id); сотрудник, заведенный вручную и еще не
+связанный с кадровой системой, находится по ФИО, если совпадение
+единственное, и получает табельный номер. Отделы сопоставляются по
+названию без учета регистра, новые создаются.
+
+Все сотрудники и отделы загружаются в словари одним запросом на таблицу,
+запись - несколько массовых операций в одной транзакции: bulk_create
+отделов и сотрудников, bulk_update изменившихся полей, UPDATE
+is_active=False пачками для тех, кого нет в файле. Сигналы при этом не
+посылаются, поэтому версии данных сбрасываются явно.
+
+Неверный файл не должен увольнять людей: без колонок REQUIRED_COLUMNS
+синхронизация не начинается, сотрудники из строк с ошибками считаются
+присутствующими в файле, без единой правильной строки никто не
+увольняется, а если уволить нужно больше HR_SYNC_MAX_DEACTIVATE человек,
+синхронизация прерывается целиком.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from equipments.autocomplete import INDEX, normalize
+from equipments.importer import FIRST_DATA_ROW, IMPORT_BATCH_SIZE, iter_import_frames
+from equipments.versioning import bump_data_version
+from .models import Department, Employee
+
+# Колонка файла -> поле Employee
+HR_COLUMNS = {
+    'Табельный номер': 'external_id',
+    'Фамилия': 'last_name',
+    'Имя': 'first_name',
+    'Отчество': 'middle_name',
+    'Должность': 'position',
+}
+DEPARTMENT_COLUMN = 'Отдел'
+# Без этих колонок файл не выгрузка кадров - синхронизация не выполняется
+REQUIRED_COLUMNS = ('Табельный номер', 'Фамилия')
+
+# Больше стольких увольнений за один запуск - скорее всего, файл неполный
+HR_SYNC_MAX_DEACTIVATE = getattr(settings, 'HR_SYNC_MAX_DEACTIVATE', 50)
+
+# Поля, которые синхронизация сравнивает и обновляет
+SYNC_FIELDS = ('last_name', 'first_name', 'middle_name', 'position', 'department_id', 'is_active')
+
+# Изменение для отчета: kind - 'create', 'update', 'link' (ручная запись
+# получила табельный номер) или 'deactivate'; fields - {подпись: (было, стало)}
+HRChange = namedtuple('HRChange', 'kind row_number external_id name fields')
+
+
+class HRSyncError(ValueError):
+    """Файл или результат синхронизации не прошел проверку - ничего не записано"""
+
+
+class SyncResult:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.linked = 0
+        self.unchanged = 0
+        self.deactivated = 0
+        self.departments_created = []
+        self.changes = []     # [HRChange]
+        self.failed = []      # [(номер строки, сообщение)]
+        self.warnings = []
+        # строки с ошибками: эти сотрудники в файле есть, увольнять их нельзя
+        self.failed_ids = set()
+        self.failed_names = set()
+
+    @property
+    def errors(self):
+        return [f"Строка {row_number}: {message}" for row_number, message in sorted(self.failed)]
+
+
+def _clean(value):
+    """Ячейка как очищенная строка; пустые ячейки и 'nan'/'None' -> ''"""
+    if value is None:
+        return ''
+    text = str(value).strip()
+    return '' if text.lower() in ('nan', 'none') else text
+
+
+def _name_key(last_name, first_name, middle_name):
+    return (normalize(last_name), normalize(first_name), normalize(middle_name))
+
+
+def _full_name(values):
+    return f"{values['last_name']} {values['first_name']} {values['middle_name']}".strip()
+
+
+def read_rows(frames, result):
+    """
+    Строки файла -> {табельный номер: (номер строки, {поле: значение}, отдел)}.
+    Строки без табельного номера или фамилии и повторы номера - в ошибки.
+    Файл без колонок REQUIRED_COLUMNS - HRSyncError.
+    """
+    max_lengths = {column: Employee._meta.get_field(field_name).max_length for column, field_name in HR_COLUMNS.items()}
+    max_lengths[DEPARTMENT_COLUMN] = Department._meta.get_field('name').max_length
+    rows = {}
+    for df in frames:
+        missing_columns = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+        if missing_columns:
+            raise HRSyncError(
+                f"В файле нет колонок: {', '.join(missing_columns)} (найдены: {', '.join(map(str, df.columns))})"
+            )
+        result.processed += len(df)
+        columns = [column for column in (*HR_COLUMNS, DEPARTMENT_COLUMN) if column in df.columns]
+        for index, record in zip(df.index, df[columns].itertuples(index=False, name=None)):
+            row_number = index + FIRST_DATA_ROW
+            cells = dict(zip(columns, map(_clean, record)))
+            values = {field_name: cells.get(column, '') for column, field_name in HR_COLUMNS.items()}
+            external_id = values.pop('external_id')
+
+            error = None
+            too_long = [column for column, max_length in max_lengths.items() if len(cells.get(column, '')) > max_length]
+            if not external_id:
+                error = 'нет табельного номера'
+            elif not values['last_name']:
+                error = f'табельный номер {external_id}: нет фамилии'
+            elif too_long:
+                error = f"{too_long[0]}: длина больше {max_lengths[too_long[0]]} символов"
+            elif external_id in rows:
+                error = f'табельный номер {external_id} повторяется в файле'
+            if error:
+                result.failed.append((row_number, error))
+                if external_id:
+                    result.failed_ids.add(external_id)
+                if values['last_name']:
+                    result.failed_names.add(_name_key(values['last_name'], values['first_name'], values['middle_name']))
+                continue
+            rows[external_id] = (row_number, values, cells.get(DEPARTMENT_COLUMN, ''))
+    return rows
+
+
+def resolve_departments(rows, result, dry_run=False):
+    """
+    Название отдела (нормализованное) -> id; недостающие отделы создаются
+    одним bulk_create. В dry_run вместо id нового отдела - его название.
+    """
+    departments = {normalize(name): pk for pk, name in Department.objects.values_list('id', 'name')}
+    new_names = {}
+    for _, _, name in rows.values():
+        key = normalize(name)
+        if key and key not in departments:
+            new_names.setdefault(key, name)
+    result.departments_created = sorted(new_names.values())
+    if not new_names:
+        return departments
+    if dry_run:
+        departments.update(new_names)
+    else:
+        Department.objects.bulk_create([Department(name=name) for name in new_names.values()])
+        departments.update(
+            (normalize(name), pk)
+            for pk, name in Department.objects.filter(name__in=new_names.values()).values_list('id', 'name')
+        )
+    return departments
+
+
+def _in_file(record, result):
+    """Сотрудник есть в файле, но в строке с ошибкой"""
+    if record['external_id']:
+        return record['external_id'] in result.failed_ids
+    return _name_key(record['last_name'], record['first_name'], record['middle_name']) in result.failed_names
+
+
+def sync_employees(frames, batch_size=IMPORT_BATCH_SIZE, dry_run=False, deactivate=True,
+                   max_deactivate=HR_SYNC_MAX_DEACTIVATE):
+    """
+    Синхронизирует сотрудников с пачками строк кадровой выгрузки.
+
+    dry_run - только отчет (result.changes), без записи;
+    deactivate - снять признак "Работает" с тех, кого нет в файле;
+    max_deactivate - предел увольнений за запуск (больше - HRSyncError,
+    в dry_run - предупреждение).
+    """
+    result = SyncResult()
+    rows = read_rows(frames, result)
+
+    existing = {}       # табельный номер -> запись
+    unlinked = {}       # ключ ФИО -> [записи без табельного номера]
+    for pk, external_id, *values in Employee.objects.order_by('id').values_list('id', 'external_id', *SYNC_FIELDS):
+        record = {'pk': pk, 'external_id': external_id, **dict(zip(SYNC_FIELDS, values))}
+        if external_id:
+            existing[external_id] = record
+        else:
+            unlinked.setdefault(_name_key(record['last_name'], record['first_name'], record['middle_name']), []).append(record)
+
+    labels = {field_name: str(Employee._meta.get_field(field_name).verbose_name) for field_name in SYNC_FIELDS}
+
+    def display(field_name, value):
+        if field_name == 'department_id':
+            return department_names.get(value, value) if value else '—'
+        if field_name == 'is_active':
+            return 'Работает' if value else 'Уволен'
+        return value or '—'
+
+    with transaction.atomic():
+        departments = resolve_departments(rows, result, dry_run)
+        department_names = dict(Department.objects.values_list('id', 'name'))
+
+        to_create, to_update, changed_fields, seen = [], [], set(), set()
+        for external_id, (row_number, values, department) in rows.items():
+            values['department_id'] = departments.get(normalize(department)) if department else None
+            values['is_active'] = True
+
+            record = existing.get(external_id)
+            linked = False
+            if record is None:
+                candidates = unlinked.get(_name_key(values['last_name'], values['first_name'], values['middle_name']), [])
+                if len(candidates) == 1:
+                    record = candidates.pop()
+                    linked = True
+            if record is None:
+                to_create.append(Employee(external_id=external_id, **values))
+                result.changes.append(HRChange('create', row_number, external_id, _full_name(values), {}))
+                continue
+
+            seen.add(record['pk'])
+            diff = {
+                field_name: (record[field_name], values[field_name])
+                for field_name in SYNC_FIELDS if record[field_name] != values[field_name]
+            }
+            if not diff and not linked:
+                result.unchanged += 1
+                continue
+            to_update.append(Employee(pk=record['pk'], external_id=external_id, **values))
+            changed_fields.update(diff)
+            if linked:
+                changed_fields.add('external_id')
+                result.linked += 1
+            else:
+                result.updated += 1
+            fields = {
+                labels[field_name]: (display(field_name, before), display(field_name, after))
+                for field_name, (before, after) in diff.items()
+            }
+            result.changes.append(
+                HRChange('link' if linked else 'update', row_number, external_id, _full_name(values), fields)
+            )
+
+        # все, кого нет в файле: и уже связанные, и заведенные вручную
+        missing = []
+        if deactivate and not rows:
+            result.warnings.append('В файле нет ни одной правильной строки - никто не уволен')
+        elif deactivate:
+            for record in [*existing.values(), *(r for records in unlinked.values() for r in records)]:
+                if record['pk'] not in seen and record['is_active'] and not _in_file(record, result):
+                    missing.append(record['pk'])
+                    result.changes.append(HRChange(
+                        'deactivate', None, record['external_id'] or '',
+                        _full_name(record), {labels['is_active']: ('Работает', 'Уволен')},
+                    ))
+        result.deactivated = len(missing)
+        result.created = len(to_create)
+        if len(missing) > max_deactivate:
+            message = (
+                f'Нужно уволить {len(missing)} сотрудников, предел за один запуск - {max_deactivate}. '
+                f'Проверьте файл или увеличьте предел.'
+            )
+            if not dry_run:
+                raise HRSyncError(message)
+            result.warnings.append(message)
+
+        if not dry_run:
+            Employee.objects.bulk_create(to_create, batch_size=batch_size)
+            if to_update:
+                Employee.objects.bulk_update(to_update, sorted(changed_fields), batch_size=batch_size)
+            for start in range(0, len(missing), batch_size):
+                Employee.objects.filter(pk__in=missing[start:start + batch_size]).update(is_active=False)
+
+    if not dry_run and (to_create or to_update or missing or result.departments_created):
+        # массовые операции не посылают сигналов - сбрасываем кэши явно
+        bump_data_version(Employee, Department)
+        INDEX.invalidate()
+    return result
+
+
+def sync_employees_file(file, filename=None, batch_size=IMPORT_BATCH_SIZE, **options):
+    """Синхронизация из файла xlsx/csv (читается пачками)"""
+    return sync_employees(iter_import_frames(file, filename, batch_size), batch_size, **options)
@@ -0,0 +1,65 @@
+# employees/management/commands/sync_hr.py
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.hr_sync import HR_COLUMNS, HR_SYNC_MAX_DEACTIVATE, HRSyncError, sync_employees_file
+from equipments.importer import IMPORT_BATCH_SIZE, write_error_report
+
+CHANGE_LABELS = {
+    'create': 'новый',
+    'update': 'изменен',
+    'link': 'связан по ФИО',
+    'deactivate': 'уволен',
+}
+
+
+class Command(BaseCommand):
+    help = 'Синхронизирует сотрудников и отделы с выгрузкой кадровой системы (xlsx/csv)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help=f"Путь к файлу .xlsx или .csv (колонки: {', '.join(HR_COLUMNS)}, Отдел)")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Строк в пачке')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать изменения, без записи')
+        parser.add_argument('--keep-missing', action='store_true',
+                            help='Не увольнять сотрудников, которых нет в файле')
+        parser.add_argument('--max-deactivate', type=int, default=HR_SYNC_MAX_DEACTIVATE,
+                            help='Больше стольких увольнений за запуск - синхронизация прерывается')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+
+        try:
+            with open(path, 'rb') as file:
+                result = sync_employees_file(
+                    file, path, options['batch_size'], dry_run=options['dry_run'],
+                    deactivate=not options['keep_missing'], max_deactivate=options['max_deactivate'],
+                )
+        except HRSyncError as e:
+            raise CommandError(f'{e}. Изменения не записаны.')
+
+        for change in result.changes:
+            fields = '; '.join(f"{label}: {before} → {after}" for label, (before, after) in change.fields.items())
+            row = f"строка {change.row_number}, " if change.row_number else ''
+            self.stdout.write(
+                f"  [{CHANGE_LABELS[change.kind]}] {row}{change.external_id or 'без номера'} {change.name} {fields}".rstrip()
+            )
+        if options['dry_run']:
+            self.stdout.write("ℹ️ Проверка без записи в базу")
+
+        self.stdout.write(f"✅ Строк в файле: {result.processed}")
+        self.stdout.write(
+            f"👥 Новых: {result.created}, изменено: {result.updated}, связано по ФИО: {result.linked}, "
+            f"без изменений: {result.unchanged}, уволено: {result.deactivated}"
+        )
+        if result.departments_created:
+            self.stdout.write(f"🏢 Новые отделы: {', '.join(result.departments_created)}")
+        for warning in result.warnings:
+            self.stdout.write(f"⚠️ {warning}")
+        if result.errors:
+            error_file = write_error_report(result.errors, prefix='hr_errors')
+            self.stdout.write(f"⚠️ Ошибок: {len(result.errors)}, отчет: {error_file}")
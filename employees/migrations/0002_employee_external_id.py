@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True, verbose_name='Табельный номер'),
+        ),
+    ]
@@ -19,6 +19,8 @@ class Employee(models.Model):
     department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Отдел')
     position = models.CharField('Должность', max_length=100, blank=True)
     is_active = models.BooleanField('Работает', default=True)
+    # Табельный номер из кадровой системы: ключ синхронизации (sync_hr)
+    external_id = models.CharField('Табельный номер', max_length=50, unique=True, null=True, blank=True)
     
     class Meta:
         verbose_name = 'Сотрудник'
@@ -1,3 +1,187 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from equipments.models import Equipment
+from .models import Department, Employee
+
+
+class EmployeeListTest(TestCase):
+    """Список сотрудников: количество оборудования через annotate и пагинация"""
+
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Бухгалтерия')
+
+    def _add_employees(self, count, start=0):
+        for i in range(start, start + count):
+            employee = Employee.objects.create(last_name=f'Сотрудник{i:03d}', first_name='Тест',
+                                               department=self.department)
+            for j in range(2):
+                Equipment.objects.create(mc_number=f'L{i}-{j}', type='laptop', assigned_to=employee)
+
+    def test_query_count_does_not_grow_with_employees(self):
+        self._add_employees(3)
+        cache.clear()
+        with self.assertNumQueries(4):  # версия данных, страница, количество, отделы
+            response = self.client.get('/employees/')
+        self.assertContains(response, '2 ед.', count=3)
+
+        self._add_employees(40, start=3)
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get('/employees/', {'limit': 20})
+        self.assertContains(response, '2 ед.', count=20)
+        self.assertContains(response, 'Всего: 43 сотрудников')
+
+    def test_pages_cover_all_employees(self):
+        self._add_employees(5)
+        Employee.objects.create(last_name='Уволенный', first_name='Тест', is_active=False)
+
+        names, params = [], {'limit': 2}
+        while True:
+            page = self.client.get('/employees/', params).context['page']
+            names += [employee.last_name for employee in page]
+            if not page.has_next:
+                break
+            params = {'limit': 2, 'after': page.next_cursor}
+        self.assertEqual(names, [f'Сотрудник{i:03d}' for i in range(5)])
+
+
+class EmployeeDetailTest(TestCase):
+    """Страница сотрудника: фиксированное число запросов при любой длине истории"""
+
+    def test_query_count_does_not_grow_with_history(self):
+        from datetime import date, timedelta
+
+        from history.models import EquipmentHistory
+
+        employee = Employee.objects.create(last_name='Орлов', first_name='Иван',
+                                           department=Department.objects.create(name='Склад'))
+        laptop = Equipment.objects.create(mc_number='D1', type='laptop', assigned_to=employee)
+        Equipment.objects.create(mc_number='D2', type='mouse', assigned_to=employee)
+        EquipmentHistory.objects.bulk_create(
+            EquipmentHistory(equipment=laptop, employee=employee, date=date(2024, 1, 1) + timedelta(days=i))
+            for i in range(25)
+        )
+
+        with self.assertNumQueries(3):  # сотрудник, оборудование, страница истории с количеством
+            response = self.client.get(f'/employees/{employee.pk}/')
+        self.assertEqual(len(response.context['history']), 10)
+        self.assertEqual(response.context['history_total'], 25)
+        self.assertEqual(response.context['equipment_count'], 2)
+        self.assertContains(response, 'Вся история (25)')
+
+
+class HRSyncTest(TestCase):
+    """Синхронизация с кадровой выгрузкой: массовые операции и отчет"""
+
+    HEADER = 'Табельный номер;Фамилия;Имя;Отчество;Отдел;Должность\n'
+
+    def setUp(self):
+        cache.clear()
+        self.it = Department.objects.create(name='ИТ')
+        self.linked = Employee.objects.create(last_name='Иванов', first_name='Иван', department=self.it,
+                                              position='Инженер', external_id='100')
+        self.manual = Employee.objects.create(last_name='Петрова', first_name='Анна', middle_name='Сергеевна')
+        self.gone = Employee.objects.create(last_name='Сидоров', first_name='Олег', external_id='300')
+
+    def _sync(self, rows, **options):
+        import io
+
+        from .hr_sync import sync_employees_file
+
+        content = (self.HEADER + ''.join(rows)).encode('utf-8')
+        return sync_employees_file(io.BytesIO(content), 'hr.csv', **options)
+
+    def test_upsert_link_and_deactivate(self):
+        from equipments.versioning import data_version
+
+        version = data_version(Employee)
+        rows = [
+            '100;Иванов;Иван;;ИТ;Ведущий инженер\n',
+            '200;Петрова;Анна;Сергеевна;Бухгалтерия;Бухгалтер\n',
+            '400;Новиков;Павел;;бухгалтерия;\n',
+            ';Безномера;Иван;;;\n',
+            '400;Новиков;Павел;;;\n',
+        ]
+        # отделы, сотрудники, названия отделов; bulk_create отделов и их id;
+        # bulk_create, bulk_update, UPDATE уволенных (+ savepoint транзакции), версия данных
+        with self.assertNumQueries(11):
+            result = self._sync(rows)
+
+        self.assertEqual((result.created, result.updated, result.linked, result.deactivated), (1, 1, 1, 1))
+        self.assertEqual(result.departments_created, ['Бухгалтерия'])
+        self.assertEqual(result.errors, ['Строка 5: нет табельного номера', 'Строка 6: табельный номер 400 повторяется в файле'])
+        self.assertEqual(
+            [(change.kind, change.external_id) for change in result.changes],
+            [('update', '100'), ('link', '200'), ('create', '400'), ('deactivate', '300')],
+        )
+        self.assertEqual(result.changes[0].fields, {'Должность': ('Инженер', 'Ведущий инженер')})
+
+        accounting = Department.objects.get(name='Бухгалтерия')
+        self.manual.refresh_from_db()
+        self.assertEqual((self.manual.external_id, self.manual.department, self.manual.position),
+                         ('200', accounting, 'Бухгалтер'))
+        self.assertEqual(Employee.objects.get(external_id='400').department, accounting)
+        self.gone.refresh_from_db()
+        self.assertFalse(self.gone.is_active)
+        self.assertNotEqual(data_version(Employee), version)
+
+        # повторный запуск с тем же файлом ничего не меняет
+        result = self._sync(rows)
+        self.assertEqual((result.created, result.updated, result.linked, result.deactivated), (0, 0, 0, 0))
+        self.assertEqual(result.unchanged, 3)
+
+    def test_dry_run_and_reactivation(self):
+        self.gone.is_active = False
+        self.gone.save()
+
+        result = self._sync(['300;Сидоров;Олег;;Склад;\n'], dry_run=True)
+        self.assertEqual(result.changes[0].fields, {
+            'Отдел': ('—', 'Склад'), 'Работает': ('Уволен', 'Работает'),
+        })
+        self.assertEqual(result.deactivated, 2)
+        self.assertFalse(Department.objects.filter(name='Склад').exists())
+        self.assertTrue(Employee.objects.get(pk=self.linked.pk).is_active)
+
+        self._sync(['300;Сидоров;Олег;;Склад;\n'], deactivate=False)
+        self.gone.refresh_from_db()
+        self.assertTrue(self.gone.is_active)
+        self.assertTrue(Employee.objects.get(pk=self.linked.pk).is_active)
+
+    def test_wrong_header_aborts(self):
+        import io
+
+        from .hr_sync import HRSyncError, sync_employees_file
+
+        with self.assertRaises(HRSyncError):
+            sync_employees_file(io.BytesIO(b'ID,Surname,Name\n100,Ivanov,Ivan\n'), 'hr.csv')
+        self.assertEqual(Employee.objects.filter(is_active=True).count(), 3)
+
+    def test_failed_rows_and_empty_file_do_not_deactivate(self):
+        # должность длиннее 100 символов: строка с ошибкой, но сотрудник в файле есть
+        result = self._sync([
+            f"100;Иванов;Иван;;ИТ;{'x' * 101}\n",
+            '300;Сидоров;Олег;;;\n',
+            f"200;Петрова;Анна;Сергеевна;;{'x' * 101}\n",
+        ])
+        self.assertEqual(len(result.errors), 2)
+        self.assertEqual(result.deactivated, 0)
+        self.assertEqual(Employee.objects.filter(is_active=True).count(), 3)
+
+        result = self._sync([';Безномера;;;;\n'])
+        self.assertEqual(result.deactivated, 0)
+        self.assertEqual(result.warnings, ['В файле нет ни одной правильной строки - никто не уволен'])
+        self.assertEqual(Employee.objects.filter(is_active=True).count(), 3)
+
+    def test_deactivation_cap(self):
+        from .hr_sync import HRSyncError
+
+        with self.assertRaises(HRSyncError):
+            self._sync(['500;Новый;Сотрудник;;Новый отдел;\n'], max_deactivate=2)
+        self.assertEqual(Employee.objects.filter(is_active=True).count(), 3)
+        self.assertFalse(Department.objects.filter(name='Новый отдел').exists())
+
+        result = self._sync(['500;Новый;Сотрудник;;;\n'], max_deactivate=2, dry_run=True)
+        self.assertEqual(result.deactivated, 3)
+        self.assertEqual(len(result.warnings), 1)
@@ -1,88 +1,73 @@
 # employees/views.py
-import pandas as pd
-from django.http import HttpResponse
-from datetime import datetime
+from django.db.models import Count
 from django.shortcuts import render, get_object_or_404
+from equipments.pagination import KeysetPaginator, cached_count, page_size_from_request
+from equipments.versioning import versioned_key
 from .models import Employee, Department
 
+# Записей истории на странице сотрудника
+EMPLOYEE_HISTORY_LIMIT = 10
+
 def employee_list(request):
     """Список сотрудников"""
-    employees = Employee.objects.select_related('department').filter(is_active=True)
+    employees = Employee.objects.filter(is_active=True)
     
     # Фильтрация по отделу
     department_filter = request.GET.get('department')
     if department_filter:
         employees = employees.filter(department_id=department_filter)
+    total_count = cached_count(employees, versioned_key(f'employee_list_count:{department_filter or ""}', Employee))
+    
+    # Количество оборудования - в том же запросе, что и страница (без запроса на строку)
+    employees = employees.select_related('department').annotate(equipment_count=Count('assigned_equipment'))
+    paginator = KeysetPaginator(employees, keys=('last_name', 'first_name', 'id'),
+                                per_page=page_size_from_request(request))
+    page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    
+    # Параметры фильтров для ссылок пагинации (без курсоров)
+    filter_params = request.GET.copy()
+    filter_params.pop('after', None)
+    filter_params.pop('before', None)
     
     # Получаем все отделы для фильтра
     departments = Department.objects.all()
     
     context = {
-        'employees': employees,
+        'employees': page.object_list,
+        'page': page,
+        'total_count': total_count,
+        'filter_query': filter_params.urlencode(),
         'departments': departments,
         'department_filter': department_filter,
     }
     return render(request, 'employees/employee_list.html', context)
 
 def employee_detail(request, pk):
-    """Детальная информация о сотруднике"""
+    """Детальная информация о сотруднике (три запроса при любой длине истории)"""
+    from history.loaders import history_page
+
     employee = get_object_or_404(Employee.objects.select_related('department'), pk=pk)
     
-    # Оборудование сотрудника
-    from equipments.models import Equipment
-    equipment = Equipment.objects.filter(assigned_to=employee).select_related('assigned_to')
+    # Оборудование сотрудника (количество - по загруженному списку, без COUNT)
+    equipment = list(employee.assigned_equipment.all())
     
-    # История выдачи (если нужно)
-    from history.models import EquipmentHistory
-    history = EquipmentHistory.objects.filter(employee=employee).select_related('equipment')
+    # Последние записи истории и их общее количество одним запросом
+    history, history_total = history_page(
+        employee.equipmenthistory_set.select_related('equipment'), EMPLOYEE_HISTORY_LIMIT,
+    )
     
     context = {
         'employee': employee,
         'equipment': equipment,
         'history': history,
-        'equipment_count': equipment.count(),
+        'history_total': history_total,
+        'equipment_count': len(equipment),
     }
     return render(request, 'employees/employee_detail.html', context)
 
 
 def export_employees_excel(request):
     """Экспорт сотрудников в Excel"""
-    employees = Employee.objects.select_related('department').filter(is_active=True)
-    
-    # Фильтрация
-    department_filter = request.GET.get('department')
-    
-    if department_filter:
-        employees = employees.filter(department_id=department_filter)
-    
-    # Создаем DataFrame
-    data = []
-    for emp in employees:
-        # Считаем оборудование сотрудника
-        from equipments.models import Equipment
-        equipment_count = Equipment.objects.filter(assigned_to=emp).count()
-        
-        data.append({
-            'Фамилия': emp.last_name,
-            'Имя': emp.first_name,
-            'Отчество': emp.middle_name or '',
-            'Отдел': emp.department.name if emp.department else '',
-            'Должность': emp.position or '',
-            'Количество оборудования': equipment_count,
-            'Статус': 'Работает' if emp.is_active else 'Уволен',
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Создаем имя файла
-    filename = f'employees_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    # Создаем HttpResponse с Excel файлом
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Сохраняем в HttpResponse
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Сотрудники')
-    
-    return response
\ No newline at end of file
+    from excel_export.exporters import employee_xlsx_response
+
+    return employee_xlsx_response(request.GET.get('department'))
@@ -1,15 +1,36 @@
 # equipments/admin.py
+from datetime import datetime
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
+from django.utils import timezone
+from employees.models import Department, Employee
 from .models import Equipment
 
+
+class TransferActionForm(ActionForm):
+    """Панель действий списка оборудования: куда передать выбранное"""
+    department = forms.ModelChoiceField(
+        Department.objects.all(), required=False, label='В отдел', empty_label='без отдела',
+    )
+    employee = forms.ModelChoiceField(
+        Employee.objects.filter(is_active=True), required=False, label='Сотруднику', empty_label='без сотрудника',
+    )
+    # Момент показа списка: изменения после него - конфликт, а не перезапись
+    as_of = forms.CharField(widget=forms.HiddenInput, required=False, initial=lambda: timezone.now().isoformat())
+
+
 @admin.register(Equipment)
 class EquipmentAdmin(admin.ModelAdmin):
-    list_display = ('mc_number', 'type', 'brand', 'model', 'ip_address', 'status', 'assigned_to', 'assigned_department')
+    list_display = ('mc_number', 'type', 'brand', 'model', 'ip_address', 'hostname', 'status', 'assigned_to', 'assigned_department')
     list_filter = ('type', 'status', 'assigned_department')
-    search_fields = ('mc_number', 'brand', 'model', 'ip_address')
+    search_fields = ('mc_number', 'brand', 'model', 'ip_address', 'hostname')
+    action_form = TransferActionForm
+    actions = ['transfer']
     fieldsets = (
         ('Основная информация', {
-            'fields': ('mc_number', 'type', 'brand', 'model', 'ip_address')
+            'fields': ('mc_number', 'type', 'brand', 'model', 'ip_address', 'hostname')
         }),
         ('Закрепление', {
             'fields': ('assigned_to', 'assigned_department')
@@ -25,4 +46,33 @@ class EquipmentAdmin(admin.ModelAdmin):
             # По умолчанию гарантия 2 года
             from datetime import timedelta
             obj.warranty_until = obj.purchase_date + timedelta(days=365*2)
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description='Передать в отдел / сотруднику', permissions=['change'])
+    def transfer(self, request, queryset):
+        from django.contrib import messages
+        from django.core.exceptions import ValidationError
+        from .bulk import transfer_equipment
+
+        fields = self.action_form.base_fields
+        try:
+            department = fields['department'].clean(request.POST.get('department'))
+            employee = fields['employee'].clean(request.POST.get('employee'))
+        except ValidationError:
+            self.message_user(request, 'Неверно выбран отдел или сотрудник', messages.ERROR)
+            return
+        try:
+            as_of = datetime.fromisoformat(request.POST.get('as_of', ''))
+        except ValueError:
+            as_of = None
+
+        result = transfer_equipment(queryset, department, employee, as_of, created_by=request.user.username)
+        self.message_user(request, f"Передано единиц оборудования: {result.equipment}")
+        if result.conflicts:
+            numbers = ', '.join(mc_number or f'id {pk}' for pk, mc_number in result.conflicts)
+            self.message_user(
+                request,
+                f"Не переданы - изменены другим пользователем после открытия списка: {numbers}. "
+                f"Обновите страницу и повторите.",
+                messages.WARNING,
+            )
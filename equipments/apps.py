@@ -1,5 +1,16 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 
 
 class EquipmentsConfig(AppConfig):
     name = 'equipments'
+
+    def ready(self):
+        from .autocomplete import connect_signals
+        from .versioning import track_models
+        connect_signals()
+        # Версии данных для кэшей (фасеты, количество, файлы экспорта)
+        track_models(
+            self.get_model('Equipment'),
+            apps.get_model('employees', 'Employee'),
+            apps.get_model('employees', 'Department'),
+        )
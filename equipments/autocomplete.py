@@ -0,0 +1,251 @@
+# equipments/autocomplete.py
+"""
+Автодополнение поиска: МЦ оборудования, ФИО сотрудников, отделы.
+
+Индекс - отсортированный в памяти список нормализованных ключей,
+поиск по префиксу через bisect. Строится один раз при первом запросе
+и дальше обновляется точечно по сигналам post_save/post_delete.
+Сигналы видит только процесс, в котором произошло изменение, поэтому
+индекс дополнительно перестраивается целиком раз в AUTOCOMPLETE_MAX_AGE
+секунд (изменения из других процессов воркеров).
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.urls import reverse
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def normalize(text):
+    """Нормализация для русского текста: регистр, ё -> е, лишние пробелы"""
+    return ' '.join(str(text or '').lower().replace('ё', 'е').split())
+
+
+class PrefixIndex:
+    """
+    Отсортированный индекс (ключ, тип, id) с поиском по префиксу.
+
+    Полная перестройка читает БД без блокировки индекса и затем подменяет
+    списки: поиск во время загрузки не ждет, а отдает прежний индекс
+    (ждут только запросы, пришедшие до первого построения). Перестраивает
+    один поток за раз; изменения из сигналов, пришедшие во время загрузки,
+    применяются к новому индексу после подмены.
+    """
+
+    def __init__(self, loader, max_age=300, clock=time.monotonic):
+        self._loader = loader
+        self.max_age = max_age
+        self._clock = clock
+        self._keys = []       # отсортированные (ключ, тип, id)
+        self._entries = {}    # (тип, id) -> (подпись, url, [ключи])
+        self._built_at = None
+        self._loaded = False  # списки хоть раз построены - их можно отдавать
+        self._generation = 0  # меняется при invalidate()
+        self._pending = None  # [(метод, аргументы)] из сигналов во время загрузки
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def rebuild(self):
+        """Полная перестройка (ждет, если перестройка уже идет в другом потоке)"""
+        with self._rebuild_lock:
+            self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        with self._lock:
+            self._pending = []
+            generation = self._generation
+        try:
+            keys = []
+            entries = {}
+            for kind, obj_id, label, url, terms in self._loader():
+                normalized = sorted({normalize(term) for term in terms if normalize(term)})
+                entries[(kind, obj_id)] = (label, url, normalized)
+                keys.extend((term, kind, obj_id) for term in normalized)
+            keys.sort()
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._keys = keys
+            self._entries = entries
+            for apply, args in pending:
+                apply(*args)
+            self._loaded = True
+            # invalidate() во время загрузки - данные могли устареть, при следующем поиске еще раз
+            self._built_at = self._clock() if generation == self._generation else None
+
+    def invalidate(self):
+        """Полная перестройка при следующем поиске (после массовых операций без сигналов)"""
+        with self._lock:
+            self._built_at = None
+            self._generation += 1
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if self._built_at is not None and self._clock() - self._built_at <= self.max_age:
+                return
+            loaded = self._loaded
+        if not loaded:
+            # отдавать нечего - ждем построения; построивший первым избавляет остальных
+            with self._rebuild_lock:
+                if not self._loaded:
+                    self._rebuild_locked()
+        elif self._rebuild_lock.acquire(blocking=False):
+            # перестраивает этот запрос, параллельные пока отдают прежний индекс
+            try:
+                self._rebuild_locked()
+            finally:
+                self._rebuild_lock.release()
+
+    def add(self, kind, obj_id, label, url, terms):
+        """Добавляет или заменяет запись (вызывается из сигналов)"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self._add_locked, (kind, obj_id, label, url, terms)))
+            if self._loaded:
+                self._add_locked(kind, obj_id, label, url, terms)
+            # иначе индекс построится целиком при первом запросе
+
+    def remove(self, kind, obj_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self._remove_locked, (kind, obj_id)))
+            if self._loaded:
+                self._remove_locked(kind, obj_id)
+
+    def _add_locked(self, kind, obj_id, label, url, terms):
+        self._remove_locked(kind, obj_id)
+        normalized = sorted({normalize(term) for term in terms if normalize(term)})
+        self._entries[(kind, obj_id)] = (label, url, normalized)
+        for term in normalized:
+            bisect.insort(self._keys, (term, kind, obj_id))
+
+    def _remove_locked(self, kind, obj_id):
+        entry = self._entries.pop((kind, obj_id), None)
+        if not entry:
+            return
+        for term in entry[2]:
+            position = bisect.bisect_left(self._keys, (term, kind, obj_id))
+            if position < len(self._keys) and self._keys[position] == (term, kind, obj_id):
+                del self._keys[position]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        self._ensure_fresh()
+        with self._lock:
+            results = []
+            seen = set()
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(results) < limit:
+                term, kind, obj_id = self._keys[position]
+                if not term.startswith(prefix):
+                    break
+                position += 1
+                if (kind, obj_id) in seen:
+                    continue
+                seen.add((kind, obj_id))
+                label, url, _ = self._entries[(kind, obj_id)]
+                results.append({'type': kind, 'id': obj_id, 'label': label, 'url': url})
+            return results
+
+
+# --- источники данных ---
+
+def equipment_entry(equipment_id, mc_number, type_display, brand, model):
+    label = ' '.join(part for part in (mc_number, '—', type_display, brand, model) if part)
+    url = reverse('equipments:equipment_detail', kwargs={'pk': equipment_id})
+    return 'equipment', equipment_id, label, url, [mc_number]
+
+
+def employee_entry(employee_id, last_name, first_name, middle_name):
+    full_name = f"{last_name} {first_name} {middle_name}".strip()
+    url = reverse('employees:employee_detail', kwargs={'pk': employee_id})
+    # По фамилии (ФИО целиком) и по имени
+    return 'employee', employee_id, full_name, url, [full_name, f"{first_name} {last_name}"]
+
+
+def department_entry(department_id, name, short_name):
+    url = reverse('equipments:equipment_list') + f'?assigned_department={department_id}'
+    return 'department', department_id, name, url, [name, short_name]
+
+
+def load_entries():
+    """Полная загрузка индекса: три запроса values_list без моделей"""
+    from employees.models import Department, Employee
+    from .models import Equipment
+
+    type_labels = dict(Equipment.TYPE_CHOICES)
+    for pk, mc_number, type_, brand, model in Equipment.objects.exclude(
+        mc_number__isnull=True
+    ).exclude(mc_number='').values_list('id', 'mc_number', 'type', 'brand', 'model').iterator():
+        yield equipment_entry(pk, mc_number, type_labels.get(type_, type_), brand, model)
+
+    for row in Employee.objects.filter(is_active=True).values_list(
+        'id', 'last_name', 'first_name', 'middle_name'
+    ).iterator():
+        yield employee_entry(*row)
+
+    for row in Department.objects.values_list('id', 'name', 'short_name').iterator():
+        yield department_entry(*row)
+
+
+INDEX = PrefixIndex(load_entries, max_age=getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 300))
+
+
+# --- сигналы ---
+
+def equipment_saved(sender, instance, **kwargs):
+    if instance.mc_number:
+        INDEX.add(*equipment_entry(instance.pk, instance.mc_number, instance.get_type_display(),
+                                   instance.brand, instance.model))
+    else:
+        INDEX.remove('equipment', instance.pk)
+
+
+def employee_saved(sender, instance, **kwargs):
+    if instance.is_active:
+        INDEX.add(*employee_entry(instance.pk, instance.last_name, instance.first_name, instance.middle_name))
+    else:
+        INDEX.remove('employee', instance.pk)
+
+
+def department_saved(sender, instance, **kwargs):
+    INDEX.add(*department_entry(instance.pk, instance.name, instance.short_name))
+
+
+def equipment_deleted(sender, instance, **kwargs):
+    INDEX.remove('equipment', instance.pk)
+
+
+def employee_deleted(sender, instance, **kwargs):
+    INDEX.remove('employee', instance.pk)
+
+
+def department_deleted(sender, instance, **kwargs):
+    INDEX.remove('department', instance.pk)
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_save
+    from employees.models import Department, Employee
+    from .models import Equipment
+
+    post_save.connect(equipment_saved, sender=Equipment, dispatch_uid='autocomplete_equipment_saved')
+    post_save.connect(employee_saved, sender=Employee, dispatch_uid='autocomplete_employee_saved')
+    post_save.connect(department_saved, sender=Department, dispatch_uid='autocomplete_department_saved')
+    post_delete.connect(equipment_deleted, sender=Equipment, dispatch_uid='autocomplete_equipment_deleted')
+    post_delete.connect(employee_deleted, sender=Employee, dispatch_uid='autocomplete_employee_deleted')
+    post_delete.connect(department_deleted, sender=Department, dispatch_uid='autocomplete_department_deleted')
@@ -0,0 +1,169 @@
+# equipments/bulk.py
+"""
+Массовые операции с оборудованием.
+
+Число запросов не зависит от количества единиц: затронутые строки
+читаются одним values_list, меняются одним UPDATE (update() по
+множеству), записи истории создаются одним bulk_create - все в одной
+транзакции. Сигналы save() при этом не посылаются, поэтому версии
+данных и индекс автодополнения сбрасываются явно.
+
+Передача между отделами не блокирует строки: изменения, сделанные
+другими пользователями после момента as_of (когда выборка была
+показана), находятся по updated_at и попадают в конфликты вместо того,
+чтобы быть молча перезаписанными.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.query import QuerySet
+from django.utils import timezone
+
+from .autocomplete import INDEX
+from .filters import EquipmentFilter
+from .models import Equipment
+from .versioning import bump_data_version
+
+# Итог увольнения: уволено сотрудников, возвращено единиц, записей истории
+OffboardingResult = namedtuple('OffboardingResult', 'employees equipment history')
+# Итог передачи: передано единиц, записей истории, конфликты [(id, номер МЦ)]
+TransferResult = namedtuple('TransferResult', 'equipment history conflicts')
+
+
+def _ids(objects):
+    """id из queryset, списка объектов или списка id"""
+    if isinstance(objects, QuerySet):
+        return list(objects.values_list('pk', flat=True))
+    return [getattr(obj, 'pk', obj) for obj in objects]
+
+
+def offboard_employees(employees, department=None, deactivate=True, created_by='', notes=''):
+    """
+    Увольнение сотрудников: все их оборудование снимается с них и
+    закрепляется за отделом department или, если он не указан,
+    возвращается на склад (выданное становится "На складе", сломанное и
+    в ремонте сохраняет статус). На каждую единицу - запись истории
+    'return' на сотрудника, у которого она была.
+
+    employees - queryset, список сотрудников или их id.
+    """
+    from employees.models import Employee
+    from history.models import EquipmentHistory
+
+    employee_ids = _ids(employees)
+    if not notes:
+        notes = 'Увольнение сотрудника' + (f'; передано в отдел «{department.name}»' if department else '; возврат на склад')
+    changes = {
+        'assigned_to': None,
+        'assigned_department': department,
+        'updated_at': timezone.now(),
+    }
+    if department is None:
+        changes['status'] = Case(When(status='issued', then=Value('available')), default=F('status'))
+
+    with transaction.atomic():
+        items = list(
+            Equipment.objects.select_for_update()
+            .filter(assigned_to_id__in=employee_ids)
+            .values_list('id', 'assigned_to_id')
+        )
+        if items:
+            Equipment.objects.filter(pk__in=[pk for pk, _ in items]).update(**changes)
+            today = timezone.localdate()
+            EquipmentHistory.objects.bulk_create([
+                EquipmentHistory(equipment_id=pk, employee_id=employee_id, action='return',
+                                 date=today, notes=notes, created_by=created_by)
+                for pk, employee_id in items
+            ])
+        deactivated = (
+            Employee.objects.filter(pk__in=employee_ids, is_active=True).update(is_active=False)
+            if deactivate else 0
+        )
+
+    if items or deactivated:
+        bump_data_version(Equipment, Employee, EquipmentHistory)
+        INDEX.invalidate()
+    return OffboardingResult(deactivated, len(items), len(items))
+
+
+def _equipment_queryset(items):
+    """Оборудование из спецификации фильтра, queryset, списка объектов или id"""
+    if isinstance(items, EquipmentFilter):
+        return items.queryset(related=())
+    if isinstance(items, QuerySet):
+        return items
+    return Equipment.objects.filter(pk__in=_ids(items))
+
+
+def transfer_equipment(items, department=None, employee=None, as_of=None, created_by='', notes=''):
+    """
+    Передача оборудования: assigned_department и assigned_to всех единиц
+    становятся department и employee (None - снять закрепление) одним
+    UPDATE. Статус не меняется, кроме единиц со склада, передаваемых
+    сотруднику, - они становятся выданными. На каждую единицу - запись
+    истории 'transfer' с прежним и новым закреплением.
+
+    items - EquipmentFilter, queryset, список оборудования или id.
+    as_of - момент, когда пользователь видел выборку (по умолчанию -
+    начало операции): единицы, измененные позже, не передаются и
+    возвращаются в conflicts.
+    """
+    from employees.models import Department, Employee
+    from history.models import EquipmentHistory
+
+    now = timezone.now()
+    as_of = as_of or now
+    changes = {
+        'assigned_department': department,
+        'assigned_to': employee,
+        'updated_at': now,
+    }
+    if employee is not None:
+        changes['status'] = Case(When(status='available', then=Value('issued')), default=F('status'))
+
+    with transaction.atomic():
+        rows = list(
+            _equipment_queryset(items).order_by('id')
+            .values_list('id', 'mc_number', 'assigned_to_id', 'assigned_department_id', 'updated_at')
+        )
+        conflicts = [(pk, mc_number) for pk, mc_number, *_, updated_at in rows if updated_at > as_of]
+        rows = [row for row in rows if row[-1] <= as_of]
+
+        ids = [pk for pk, *_ in rows]
+        updated = Equipment.objects.filter(pk__in=ids, updated_at__lte=as_of).update(**changes) if ids else 0
+        if updated != len(ids):
+            # строку изменили между чтением и UPDATE - ее updated_at не наш
+            done = set(Equipment.objects.filter(pk__in=ids, updated_at=now).values_list('id', flat=True))
+            conflicts += [(pk, mc_number) for pk, mc_number, *_ in rows if pk not in done]
+            rows = [row for row in rows if row[0] in done]
+
+        if rows:
+            department_ids = {row[3] for row in rows} - {None}
+            employee_ids = {row[2] for row in rows} - {None}
+            departments = dict(Department.objects.filter(pk__in=department_ids).values_list('id', 'name'))
+            employees = {
+                pk: f"{last_name} {first_name}"
+                for pk, last_name, first_name in Employee.objects.filter(pk__in=employee_ids)
+                .values_list('id', 'last_name', 'first_name')
+            }
+            target = f"отдел «{department.name}»" if department else 'без отдела'
+            if employee is not None:
+                target += f", {employee.last_name} {employee.first_name}"
+            today = timezone.localdate()
+            history = []
+            for pk, _, employee_id, department_id, _ in rows:
+                source = f"отдел «{departments.get(department_id, department_id)}»" if department_id else 'без отдела'
+                if employee_id:
+                    source += f", {employees.get(employee_id, employee_id)}"
+                history.append(EquipmentHistory(
+                    equipment_id=pk, employee_id=employee.pk if employee else employee_id,
+                    action='transfer', date=today, created_by=created_by,
+                    notes=f"{source} → {target}" + (f"; {notes}" if notes else ''),
+                ))
+            EquipmentHistory.objects.bulk_create(history)
+
+    if rows:
+        bump_data_version(Equipment, EquipmentHistory)
+        INDEX.invalidate()
+    return TransferResult(len(rows), len(rows), sorted(conflicts))
@@ -0,0 +1,47 @@
+# equipments/facets.py
+"""
+Счетчики для фильтров списка оборудования (фасеты).
+
+Один GROUP BY на фасет; каждый фасет учитывает все остальные активные
+фильтры, кроме своего собственного. Результат кэшируется по ключу
+фильтра и версии данных Equipment, Employee и Department (filter_models):
+фасет отдела сотрудника меняется и при переводе сотрудника в другой
+отдел. Повторные показы страницы запросов к БД не делают.
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+from .filters import filter_models
+from .versioning import versioned_key
+
+# фасет (параметр фильтра) -> поле группировки
+FACET_FIELDS = {
+    'status': 'status',
+    'type': 'type',
+    'department': 'assigned_to__department_id',
+    'assigned_department': 'assigned_department_id',
+}
+FACET_CACHE_TIMEOUT = 60 * 60
+
+
+def compute_facets(spec):
+    """{фасет: {значение: количество}} - по одному агрегатному запросу на фасет"""
+    facets = {}
+    for facet, field in FACET_FIELDS.items():
+        rows = (
+            spec.without(facet).queryset(related=())
+            .order_by()
+            .values_list(field)
+            .annotate(count=Count('id'))
+        )
+        facets[facet] = {value: count for value, count in rows if value is not None}
+    return facets
+
+
+def facet_counts(spec, timeout=FACET_CACHE_TIMEOUT, version=None):
+    """
+    Фасеты из кэша; пересчет только после изменения оборудования,
+    сотрудников или отделов. version - уже прочитанная версия filter_models().
+    """
+    key = versioned_key(spec.cache_key('equipment_facets'), *filter_models(), version=version)
+    return cache.get_or_set(key, lambda: compute_facets(spec), timeout)
@@ -0,0 +1,138 @@
+# equipments/filters.py
+"""
+Единый слой фильтрации оборудования.
+
+EquipmentFilter разбирает параметры запроса один раз и строит queryset
+для списка, поиска и обоих экспортов в Excel. JOIN добавляются только
+под активные фильтры, а нормализованный ключ фильтра (cache_key)
+используется для кэширования результатов (количество, фасеты, экспорт).
+"""
+import hashlib
+import json
+
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Equipment
+from . import search
+
+# Связи, нужные для отображения строки оборудования (список, экспорт)
+DISPLAY_RELATED = ('assigned_to', 'assigned_to__department', 'assigned_department')
+
+
+def filter_models():
+    """
+    Модели, от данных которых зависит результат фильтра: отдел сотрудника
+    фильтруется через Employee, закрепления ссылаются на Department.
+    Ключи кэша количества и фасетов версионируются по всем трем.
+    """
+    from employees.models import Department, Employee
+    return Equipment, Employee, Department
+
+
+def _clean_text(value):
+    value = (value or '').strip()
+    return value or None
+
+
+def _clean_id(value):
+    """id из строки запроса; мусор игнорируется, а не приводит к ошибке 500"""
+    try:
+        value = int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class EquipmentFilter:
+    """Спецификация фильтра: статус, тип, отдел сотрудника, отдел закрепления, сотрудник, текст"""
+
+    TEXT_FIELDS = ('status', 'type', 'q')
+    ID_FIELDS = ('department', 'assigned_department', 'employee')
+    FIELDS = ('status', 'type', 'department', 'assigned_department', 'employee', 'q')
+
+    def __init__(self, status=None, type=None, department=None, assigned_department=None,
+                 employee=None, q=None):
+        self.status = _clean_text(status)
+        self.type = _clean_text(type)
+        self.q = _clean_text(q)
+        self.department = _clean_id(department)
+        self.assigned_department = _clean_id(assigned_department)
+        self.employee = _clean_id(employee)
+
+    @classmethod
+    def from_request(cls, request, fields=None):
+        """Фильтр из request.GET (fields - ограничить набор учитываемых параметров)"""
+        fields = fields or cls.FIELDS
+        return cls(**{field: request.GET.get(field) for field in fields})
+
+    def as_dict(self):
+        """Только активные фильтры в каноническом виде"""
+        return {
+            field: getattr(self, field)
+            for field in self.FIELDS
+            if getattr(self, field) is not None
+        }
+
+    @property
+    def is_active(self):
+        return bool(self.as_dict())
+
+    def without(self, *fields):
+        """Копия фильтра без указанных полей (например, для фасетов)"""
+        values = self.as_dict()
+        for field in fields:
+            values.pop(field, None)
+        return EquipmentFilter(**values)
+
+    def cache_key(self, prefix='equipment'):
+        """Ключ кэша, одинаковый для одинаковых фильтров независимо от порядка и мусора в URL"""
+        payload = json.dumps(sorted(self.as_dict().items()), ensure_ascii=False)
+        return f'{prefix}:{hashlib.md5(payload.encode("utf-8")).hexdigest()}'
+
+    def text_condition(self):
+        """
+        Текстовый поиск: подзапрос к FTS5 на SQLite (без JOIN), иначе - а
+        также если индекса нет или он поврежден - icontains через ORM.
+        """
+        if not search.fts_enabled():
+            return search.orm_condition(self.q)
+        match = search.build_match_query(self.q)
+        if match is None:
+            # в запросе нет ни одного слова - совпадений нет
+            return Q(pk__in=[])
+        if not search.fts_usable(match):
+            return search.orm_condition(self.q)
+        condition = Q(id__in=RawSQL(
+            f'SELECT rowid FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH %s',
+            (match,),
+        ))
+        mc_number = search.mc_number_condition(self.q)
+        if mc_number is not None:
+            # FTS ищет по началу слова - хвост МЦ номера ищем подстрокой
+            condition |= mc_number
+        return condition
+
+    def apply(self, queryset):
+        """Применяет активные фильтры к queryset"""
+        if self.status:
+            queryset = queryset.filter(status=self.status)
+        if self.type:
+            queryset = queryset.filter(type=self.type)
+        if self.department:
+            # единственный фильтр, которому нужен JOIN на сотрудника
+            queryset = queryset.filter(assigned_to__department_id=self.department)
+        if self.assigned_department:
+            queryset = queryset.filter(assigned_department_id=self.assigned_department)
+        if self.employee:
+            queryset = queryset.filter(assigned_to_id=self.employee)
+        if self.q:
+            queryset = queryset.filter(self.text_condition())
+        return queryset
+
+    def queryset(self, related=DISPLAY_RELATED):
+        """Отфильтрованное оборудование с select_related для отображения"""
+        queryset = Equipment.objects.all()
+        if related:
+            queryset = queryset.select_related(*related)
+        return self.apply(queryset)
@@ -0,0 +1,34 @@
+# equipments/import_workers.py
+"""
+Задачи для процессов разбора листов книги (см. importer.import_workbook).
+
+Модуль импортируется в дочернем процессе (spawn) до настройки Django,
+поэтому на верхнем уровне здесь нет импортов моделей: init_worker
+настраивает Django, а parse_sheet импортирует importer уже после этого.
+"""
+import os
+
+
+def init_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+
+    django.setup()
+
+
+def parse_sheet(path, sheet, lookups, batch_size):
+    """
+    Читает и проверяет один лист, к БД не обращается.
+    Возвращает (лист, [(строка, {поле: значение})], [(строка, ошибка)], обработано строк).
+    """
+    from .importer import iter_xlsx_frames, parse_frame
+
+    rows = []
+    failed = []
+    processed = 0
+    for df in iter_xlsx_frames(path, batch_size, sheet=sheet):
+        frame_rows, frame_failed = parse_frame(df, lookups)
+        rows.extend(frame_rows)
+        failed.extend(frame_failed)
+        processed += len(df)
+    return sheet, rows, failed, processed
@@ -0,0 +1,588 @@
+# equipments/importer.py
+"""
+Импорт оборудования из Excel и CSV.
+
+Файл читается потоково, пачками по IMPORT_BATCH_SIZE строк (openpyxl в
+режиме read-only для xlsx, чанками pandas для csv), поэтому память
+ограничена размером пачки, а не файла. Колонки пачки разбираются
+векторно (pandas), сотрудники и отделы ищутся по словарям, загруженным
+один раз на весь импорт, а запись идет bulk_create, каждая пачка в своей
+транзакции. Ошибки собираются построчно в прежнем формате "Строка N: ...".
+
+Режим upsert сопоставляет строки с существующим оборудованием по
+нормализованному номеру МЦ (все записи загружаются в словарь одним
+запросом), обновляет только изменившиеся поля через bulk_update и
+создает новые; dry_run считает изменения, ничего не записывая.
+
+Обновляются только поля, колонки которых есть в файле (шаблон импорта
+без колонки 'Отдел' не снимает закрепления за отделами); пустые ячейки
+'Тип' и 'Статус' поле не меняют. Сотрудник или отдел, которого нет в
+справочнике, - ошибка строки, а не очистка закрепления. Файл экспорта
+оборудования импортируется обратно без изменений: 'Закреплено за
+отделом' читается как 'Отдел'.
+"""
+import csv
+import os
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .autocomplete import INDEX, normalize
+from .models import Equipment
+from .versioning import bump_data_version
+
+IMPORT_BATCH_SIZE = 500
+
+# Номер строки в Excel = индекс DataFrame + 2 (заголовок и нумерация с 1)
+FIRST_DATA_ROW = 2
+
+TYPE_MAPPING = {
+    'ноутбук': 'laptop',
+    'компьютер': 'pc',
+    'монитор': 'monitor',
+    'клавиатура': 'keyboard',
+    'мышь': 'mouse',
+    'принтер': 'printer',
+    'сканер': 'scanner',
+    'наушники': 'headphones',
+    'телефон': 'phone',
+    'веб-камера': 'webcam',
+    'калькулятор': 'calculator',
+    'другое': 'other',
+}
+
+STATUS_MAPPING = {
+    'на складе': 'available',
+    'выдано': 'issued',
+    'сломан': 'broken',
+    'в ремонте': 'repair',
+    'списан': 'written_off',
+}
+
+# Коды тоже принимаются: выгрузка пишет код, если у типа нет подписи (calculator)
+TYPE_VALUES = {**{code: code for code, _ in Equipment.TYPE_CHOICES}, 'calculator': 'calculator', **TYPE_MAPPING}
+STATUS_VALUES = {**{code: code for code, _ in Equipment.STATUS_CHOICES}, **STATUS_MAPPING}
+
+COLUMNS = ('МЦ номер', 'Тип', 'Марка', 'Модель', 'Сотрудник', 'Отдел', 'Статус', 'Примечания')
+
+# Колонка выгрузки оборудования -> колонка импорта (если той в файле нет)
+COLUMN_ALIASES = {'Закреплено за отделом': 'Отдел'}
+
+# Поле модели -> колонка файла; поля без колонки в файле не меняются
+FIELD_COLUMNS = {
+    'type': 'Тип',
+    'brand': 'Марка',
+    'model': 'Модель',
+    'assigned_to_id': 'Сотрудник',
+    'assigned_department_id': 'Отдел',
+    'status': 'Статус',
+    'notes': 'Примечания',
+}
+
+# Значения для новых записей, если колонки нет или ячейка пустая
+CREATE_DEFAULTS = {'type': 'other', 'status': 'issued'}
+
+# Колонка файла -> поле модели, длина которого проверяется до записи
+LENGTH_CHECKS = {'МЦ номер': 'mc_number', 'Марка': 'brand', 'Модель': 'model'}
+
+# Поля, которые upsert сравнивает и обновляет
+UPSERT_FIELDS = ('type', 'brand', 'model', 'assigned_to_id', 'assigned_department_id', 'status', 'notes')
+
+# Изменение для отчета: kind - 'create', 'update' или 'missing' (нет в файле);
+# fields - {подпись поля: (было, стало)} для 'update'; sheet - лист книги
+Change = namedtuple('Change', 'kind row_number mc_number fields sheet', defaults=(None,))
+
+
+def normalize_mc(value):
+    """Номер МЦ для сопоставления: без пробелов, в верхнем регистре"""
+    return ''.join(str(value or '').split()).upper()
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed = 0
+        self.imported = 0     # создано (в dry_run - будет создано)
+        self.updated = 0      # обновлено (в dry_run - будет обновлено)
+        self.unchanged = 0
+        self.missing = 0      # есть в базе, нет в файле (flag_missing)
+        self.changes = []     # [Change] - для режима upsert; создания - только в dry_run
+        self.failed = []      # [(лист, номер строки, сообщение)]
+        self.sheets = []      # листы в порядке обработки (импорт всей книги)
+        self.sheet = None     # текущий лист - к нему относятся новые ошибки
+
+    def add_error(self, row_number, message):
+        self.failed.append((self.sheet, row_number, message))
+
+    @property
+    def errors(self):
+        """Отчет об ошибках в порядке листов и строк файла"""
+        order = {sheet: position for position, sheet in enumerate(self.sheets)}
+        report = []
+        for sheet, row_number, message in sorted(self.failed, key=lambda e: (order.get(e[0], -1), e[1])):
+            if sheet is None:
+                report.append(f"Строка {row_number}: {message}")
+            else:
+                report.append(f"Лист «{sheet}», строка {row_number}: {message}")
+        return report
+
+
+class Lookups:
+    """
+    Сотрудники и отделы в памяти: два запроса на весь импорт.
+
+    Как и раньше, сотрудник ищется по фамилии (первое слово ФИО), отдел -
+    по вхождению названия; сначала точное совпадение, затем вхождение.
+    """
+
+    def __init__(self, employees=None, employee_names=None, departments=None, department_names=None):
+        # только словари - объект передается в процессы разбора листов (pickle)
+        self.employees = employees or {}
+        self.employee_names = employee_names or {}
+        self.departments = departments or {}
+        self.department_names = department_names or {}
+
+    @classmethod
+    def load(cls):
+        from employees.models import Department, Employee
+
+        lookups = cls()
+        for pk, last_name, first_name in Employee.objects.values_list('id', 'last_name', 'first_name'):
+            # порядок Employee.Meta.ordering - первый найденный, как .first()
+            lookups.employees.setdefault(normalize(last_name), pk)
+            lookups.employee_names[pk] = f"{last_name} {first_name}".strip()
+        for pk, name in Department.objects.order_by('id').values_list('id', 'name'):
+            lookups.departments.setdefault(normalize(name), pk)
+            lookups.department_names[pk] = name
+        return lookups
+
+    @staticmethod
+    def _find(index, value):
+        key = normalize(value)
+        if not key:
+            return None
+        if key in index:
+            return index[key]
+        for name, pk in index.items():
+            if key in name:
+                return pk
+        return None
+
+    def employee(self, name):
+        parts = str(name).split()
+        return self._find(self.employees, parts[0]) if parts else None
+
+    def department(self, name):
+        return self._find(self.departments, name)
+
+    def display(self, field_name, value):
+        """Значение поля для отчета об изменениях"""
+        if value is None or value == '':
+            return '—'
+        if field_name == 'assigned_to_id':
+            return self.employee_names.get(value, value)
+        if field_name == 'assigned_department_id':
+            return self.department_names.get(value, value)
+        choices = dict(Equipment._meta.get_field(field_name).choices or ())
+        return choices.get(value, value)
+
+
+class ExistingEquipment:
+    """
+    Существующее оборудование в памяти: нормализованный МЦ -> (id, МЦ, {поле: значение}).
+    Один запрос на весь импорт; при дублях МЦ в базе сопоставляется запись
+    с меньшим id.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.seen = set()
+        rows = (
+            Equipment.objects.exclude(mc_number__isnull=True).exclude(mc_number='')
+            .order_by('id').values_list('id', 'mc_number', *UPSERT_FIELDS)
+        )
+        for pk, mc_number, *values in rows.iterator():
+            self.records.setdefault(normalize_mc(mc_number), (pk, mc_number, dict(zip(UPSERT_FIELDS, values))))
+
+    def missing(self):
+        """Записи базы, которых не было в файле"""
+        return [(pk, mc_number) for key, (pk, mc_number, _) in self.records.items() if key not in self.seen]
+
+
+def read_import_file(file):
+    """Excel в DataFrame целиком; все ячейки читаются как текст"""
+    return pd.read_excel(file, dtype=str)
+
+
+def _cell_text(value):
+    """Значение ячейки openpyxl как текст (как при dtype=str в pandas)"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def iter_xlsx_frames(file, batch_size=IMPORT_BATCH_SIZE, sheet=None):
+    """Лист xlsx (по умолчанию первый) пачками DataFrame; индекс сквозной по всему листу"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_cell_text(name) or f'column_{i}' for i, name in enumerate(header)]
+        offset = 0
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            data, index = [], []
+            for position, row in enumerate(chunk, start=offset):
+                values = [_cell_text(value) for value in row[:len(columns)]]
+                if any(value is not None for value in values):
+                    # пустые строки пропускаются, нумерация строк не сдвигается
+                    data.append(values + [None] * (len(columns) - len(values)))
+                    index.append(position)
+            offset += len(chunk)
+            if data:
+                yield pd.DataFrame(data, columns=columns, dtype=object, index=index)
+    finally:
+        workbook.close()
+
+
+def _csv_delimiter(file):
+    """Разделитель по первой строке (Excel в русской локали сохраняет CSV через ';')"""
+    sample = file.read(4096)
+    file.seek(0)
+    if isinstance(sample, bytes):
+        sample = sample.decode('utf-8-sig', errors='ignore')
+    try:
+        return csv.Sniffer().sniff(sample.splitlines()[0] if sample else '', delimiters=';,\t').delimiter
+    except (csv.Error, IndexError):
+        return ','
+
+
+def iter_csv_frames(file, batch_size=IMPORT_BATCH_SIZE):
+    """CSV пачками DataFrame (pandas chunksize); индекс сквозной по всему файлу"""
+    reader = pd.read_csv(file, dtype=str, sep=_csv_delimiter(file), encoding='utf-8-sig',
+                         chunksize=batch_size, skip_blank_lines=True)
+    with reader:
+        yield from reader
+
+
+def iter_import_frames(file, filename=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Пачки строк файла по расширению: .csv и .xlsx - потоково,
+    старый .xls (openpyxl его не читает) - целиком через pandas.
+    """
+    name = (filename or getattr(file, 'name', '') or '').lower()
+    if name.endswith('.csv'):
+        return iter_csv_frames(file, batch_size)
+    if name.endswith('.xls'):
+        return iter([read_import_file(file)])
+    return iter_xlsx_frames(file, batch_size)
+
+
+def _text_column(df, column):
+    """Колонка как очищенные строки; пустые ячейки и 'nan'/'None' -> ''"""
+    if column not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    values = df[column].fillna('').astype(str).str.strip()
+    return values.mask(values.str.lower().isin(('nan', 'none')), '')
+
+
+def _map_unique(values, resolver):
+    """Применяет resolver один раз на каждое уникальное значение колонки"""
+    mapping = {value: resolver(value) for value in values.unique() if value}
+    return values.map(mapping)
+
+
+def parse_frame(df, lookups):
+    """
+    DataFrame -> ([(номер строки, {поле: значение})], [(номер строки, ошибка)]).
+
+    В словаре строки только поля, которые файл задает (см. FIELD_COLUMNS).
+    Все преобразования выполняются над колонками целиком; поиск
+    сотрудников и отделов - по уникальным значениям, а не по строкам.
+    К БД не обращается, поэтому выполняется и в процессах разбора листов.
+    """
+    aliases = {alias: column for alias, column in COLUMN_ALIASES.items()
+               if alias in df.columns and column not in df.columns}
+    if aliases:
+        df = df.rename(columns=aliases)
+    fields = [field_name for field_name, column in FIELD_COLUMNS.items() if column in df.columns]
+    columns = {column: _text_column(df, column) for column in COLUMNS}
+
+    # пустая ячейка типа или статуса - значение не задано
+    types = columns['Тип'].str.lower().map(TYPE_VALUES)
+    types = types.mask((columns['Тип'] != '') & types.isna(), 'other')
+    statuses = columns['Статус'].str.lower().map(STATUS_VALUES)
+    statuses = statuses.mask((columns['Статус'] != '') & statuses.isna(), 'issued')
+    employees = _map_unique(columns['Сотрудник'], lookups.employee)
+    departments = _map_unique(columns['Отдел'], lookups.department)
+
+    errors = pd.Series('', index=df.index, dtype=object)
+    # имя, которого нет в справочнике, - ошибка строки: закрепление не должно молча сниматься
+    for column, ids, label in ((columns['Сотрудник'], employees, 'сотрудник'),
+                               (columns['Отдел'], departments, 'отдел')):
+        unknown = (column != '') & ids.isna()
+        errors = errors.mask(unknown & (errors == ''), f'{label} «' + column + '» не найден')
+    for column, field_name in LENGTH_CHECKS.items():
+        max_length = Equipment._meta.get_field(field_name).max_length
+        too_long = columns[column].str.len() > max_length
+        errors = errors.mask(
+            too_long & (errors == ''),
+            f"{column}: длина больше {max_length} символов",
+        )
+
+    rows = []
+    failed = []
+    records = zip(
+        df.index, errors, columns['МЦ номер'], types, columns['Марка'], columns['Модель'],
+        employees, departments, statuses, columns['Примечания'],
+    )
+    for index, error, mc_number, type_, brand, model, employee_id, department_id, status, notes in records:
+        row_number = index + FIRST_DATA_ROW
+        if error:
+            failed.append((row_number, error))
+            continue
+        values = {
+            'type': type_,
+            'brand': brand,
+            'model': model,
+            'assigned_to_id': None if pd.isna(employee_id) else int(employee_id),
+            'assigned_department_id': None if pd.isna(department_id) else int(department_id),
+            'status': status,
+            'notes': notes,
+        }
+        row = {'mc_number': mc_number or None}
+        for field_name in fields:
+            if field_name in CREATE_DEFAULTS and pd.isna(values[field_name]):
+                continue
+            row[field_name] = values[field_name]
+        rows.append((row_number, row))
+    return rows, failed
+
+
+def new_equipment(values):
+    """Новая запись из разобранной строки; незаданные тип и статус - по умолчанию"""
+    return Equipment(**{**CREATE_DEFAULTS, **values})
+
+
+def write_rows(rows, result, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Пишет строки пачками bulk_create, каждую пачку в транзакции.
+    Если пачка не записалась целиком, ее строки пишутся по одной, чтобы
+    в отчет попали конкретные строки с ошибками.
+    """
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            with transaction.atomic():
+                Equipment.objects.bulk_create([equipment for _, equipment in batch])
+            result.imported += len(batch)
+        except Exception:
+            for row_number, equipment in batch:
+                try:
+                    with transaction.atomic():
+                        equipment.save()
+                    result.imported += 1
+                except Exception as e:
+                    result.add_error(row_number, str(e))
+
+
+def upsert_rows(rows, result, existing, lookups, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """
+    Сопоставляет строки с базой по нормализованному МЦ: новые создаются,
+    у найденных обновляются только изменившиеся поля из тех, что заданы
+    в файле (bulk_update).
+    """
+    to_create = []
+    to_update = []
+    changed_fields = set()
+    for row_number, values in rows:
+        key = normalize_mc(values['mc_number'])
+        if not key:
+            result.add_error(row_number, 'нет номера МЦ - строку не с чем сопоставить')
+            continue
+        if key in existing.seen:
+            result.add_error(row_number, f"номер МЦ {values['mc_number']} повторяется в файле")
+            continue
+        existing.seen.add(key)
+
+        record = existing.records.get(key)
+        if record is None:
+            to_create.append((row_number, new_equipment(values)))
+            if dry_run:
+                # при записи хватает счетчика imported, список рос бы с размером файла
+                result.changes.append(Change('create', row_number, values['mc_number'], {}, result.sheet))
+            continue
+
+        pk, mc_number, old = record
+        diff = {
+            field_name: (old[field_name], values[field_name])
+            for field_name in UPSERT_FIELDS
+            if field_name in values and old[field_name] != values[field_name]
+        }
+        if not diff:
+            result.unchanged += 1
+            continue
+        equipment = Equipment(pk=pk, mc_number=mc_number, **{field_name: after for field_name, (_, after) in diff.items()})
+        to_update.append(equipment)
+        changed_fields.update(diff)
+        result.changes.append(Change('update', row_number, mc_number, {
+            str(Equipment._meta.get_field(field_name).verbose_name):
+                (lookups.display(field_name, before), lookups.display(field_name, after))
+            for field_name, (before, after) in diff.items()
+        }, result.sheet))
+
+    if dry_run:
+        result.imported += len(to_create)
+        result.updated += len(to_update)
+        return
+
+    write_rows(to_create, result, batch_size)
+    if to_update:
+        now = timezone.now()
+        for equipment in to_update:
+            equipment.updated_at = now
+        with transaction.atomic():
+            Equipment.objects.bulk_update(to_update, [*sorted(changed_fields), 'updated_at'], batch_size=batch_size)
+        result.updated += len(to_update)
+
+
+def import_frames(frames, batch_size=IMPORT_BATCH_SIZE, progress=None,
+                  upsert=False, dry_run=False, flag_missing=False):
+    """
+    Импорт последовательности DataFrame (пачек) в Equipment.
+    progress(result) вызывается после каждой пачки.
+
+    upsert - сопоставлять строки по МЦ вместо простого создания;
+    dry_run - только посчитать изменения (result.changes), без записи;
+    flag_missing - отметить в отчете записи базы, которых нет в файле.
+    """
+    result = ImportResult()
+    lookups = Lookups.load()
+    existing = ExistingEquipment() if upsert else None
+    for df in frames:
+        rows, failed = parse_frame(df, lookups)
+        apply_rows(rows, failed, result, existing, lookups, batch_size, dry_run)
+        result.processed += len(df)
+        if progress:
+            progress(result)
+
+    return finish_import(result, existing, flag_missing, dry_run)
+
+
+def apply_rows(rows, failed, result, existing, lookups, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """Запись одной пачки разобранных строк (existing задан - режим upsert)"""
+    for row_number, message in failed:
+        result.add_error(row_number, message)
+    if existing is not None:
+        upsert_rows(rows, result, existing, lookups, batch_size, dry_run)
+    elif dry_run:
+        result.imported += len(rows)
+    else:
+        write_rows([(row_number, new_equipment(values)) for row_number, values in rows], result, batch_size)
+
+
+def finish_import(result, existing, flag_missing=False, dry_run=False):
+    """Записи базы, которых нет в файле, и сброс кэшей после записи"""
+    result.sheet = None
+    if existing is not None and flag_missing:
+        for pk, mc_number in existing.missing():
+            result.changes.append(Change('missing', None, mc_number, {}))
+            result.missing += 1
+
+    if not dry_run and (result.imported or result.updated):
+        # bulk_create/bulk_update не посылают сигналов - сбрасываем кэши явно
+        bump_data_version(Equipment)
+        INDEX.invalidate()
+    return result
+
+
+def workbook_sheets(path):
+    """Имена листов книги xlsx (без чтения данных)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def import_workbook(path, batch_size=IMPORT_BATCH_SIZE, progress=None, workers=None,
+                    upsert=False, dry_run=False, flag_missing=False):
+    """
+    Импорт всех листов книги xlsx (лист на площадку).
+
+    Разбор и проверка листов - CPU-задача, она идет параллельно в пуле
+    процессов (по листу на задачу); запись выполняет один писатель в этом
+    процессе, по листам в порядке книги, теми же пачками bulk_create /
+    bulk_update, что и обычный импорт. Ошибки - с именем листа и строкой.
+    workers=0 - разбирать листы в этом же процессе.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    from .import_workers import init_worker, parse_sheet
+
+    sheets = workbook_sheets(path)
+    result = ImportResult()
+    result.sheets = sheets
+    lookups = Lookups.load()
+    existing = ExistingEquipment() if upsert else None
+
+    def apply_sheet(sheet, rows, failed, processed):
+        result.sheet = sheet
+        for row_number, message in failed:
+            result.add_error(row_number, message)
+        for start in range(0, len(rows), batch_size):
+            apply_rows(rows[start:start + batch_size], [], result, existing, lookups, batch_size, dry_run)
+        result.processed += processed
+        if progress:
+            progress(result)
+
+    if workers is None:
+        workers = min(len(sheets), os.cpu_count() or 1)
+    if workers <= 1 or len(sheets) <= 1:
+        for sheet in sheets:
+            apply_sheet(*parse_sheet(path, sheet, lookups, batch_size))
+    else:
+        # spawn, а не fork: импорт идет в потоке-воркере, fork многопоточного процесса небезопасен
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                 initializer=init_worker) as pool:
+            futures = [pool.submit(parse_sheet, path, sheet, lookups, batch_size) for sheet in sheets]
+            # результаты забираются в порядке листов: разбор параллельный, запись последовательная
+            for future in futures:
+                apply_sheet(*future.result())
+
+    return finish_import(result, existing, flag_missing, dry_run)
+
+
+def import_equipment(df, batch_size=IMPORT_BATCH_SIZE, **options):
+    """Импорт одного DataFrame в Equipment; возвращает ImportResult"""
+    return import_frames([df], batch_size, **options)
+
+
+def import_equipment_file(file, filename=None, batch_size=IMPORT_BATCH_SIZE, progress=None, **options):
+    """Потоковый импорт xlsx/csv: в памяти не больше одной пачки строк"""
+    return import_frames(iter_import_frames(file, filename, batch_size), batch_size, progress, **options)
+
+
+def write_error_report(errors, prefix='errors'):
+    """Сохраняет ошибки импорта в EXCEL_FOLDER, возвращает путь к файлу"""
+    os.makedirs(settings.EXCEL_FOLDER, exist_ok=True)
+    error_file = os.path.join(settings.EXCEL_FOLDER, f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt')
+    with open(error_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(errors))
+    return error_file
@@ -0,0 +1,60 @@
+# equipments/management/commands/import_equipment.py
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from equipments.importer import IMPORT_BATCH_SIZE, import_equipment_file, import_workbook, write_error_report
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт оборудования из большого файла xlsx/csv'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .xlsx, .xls или .csv')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Строк в пачке')
+        parser.add_argument('--upsert', action='store_true', help='Обновлять существующие записи по номеру МЦ')
+        parser.add_argument('--flag-missing', action='store_true', help='Показать записи базы, которых нет в файле')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать изменения, без записи')
+        parser.add_argument('--all-sheets', action='store_true', help='Импортировать все листы книги xlsx')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Процессов для разбора листов (по умолчанию - по числу ядер)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+
+        def progress(result):
+            self.stdout.write(
+                f"⏳ Обработано: {result.processed}, импортировано: {result.imported}, "
+                f"ошибок: {len(result.failed)}"
+            )
+
+        import_options = {
+            'upsert': options['upsert'], 'dry_run': options['dry_run'], 'flag_missing': options['flag_missing'],
+        }
+        if options['all_sheets']:
+            if not path.lower().endswith('.xlsx'):
+                raise CommandError('--all-sheets поддерживается только для .xlsx')
+            result = import_workbook(path, options['batch_size'], progress, options['workers'], **import_options)
+        else:
+            with open(path, 'rb') as file:
+                result = import_equipment_file(file, path, options['batch_size'], progress, **import_options)
+
+        if options['dry_run']:
+            for change in result.changes:
+                fields = '; '.join(f"{label}: {before} → {after}" for label, (before, after) in change.fields.items())
+                sheet = f"лист {change.sheet}, " if change.sheet else ''
+                self.stdout.write(f"  [{change.kind}] {sheet}строка {change.row_number or '—'}, МЦ {change.mc_number} {fields}".rstrip())
+            self.stdout.write("ℹ️ Проверка без записи в базу")
+
+        self.stdout.write(f"✅ Импортировано: {result.imported} из {result.processed}")
+        if options['upsert']:
+            self.stdout.write(f"🔄 Обновлено: {result.updated}, без изменений: {result.unchanged}")
+        if result.missing:
+            self.stdout.write(f"⚠️ Нет в файле: {result.missing}")
+        if result.errors:
+            error_file = write_error_report(result.errors)
+            self.stdout.write(f"⚠️ Ошибок: {len(result.errors)}, отчет: {error_file}")
@@ -0,0 +1,16 @@
+# equipments/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from equipments.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс оборудования (FTS5, только SQLite)'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write("ℹ️ СУБД без FTS5 - поиск работает через ORM, индекс не нужен")
+            return
+
+        count = rebuild_index()
+        self.stdout.write(f"✅ Проиндексировано: {count} единиц оборудования")
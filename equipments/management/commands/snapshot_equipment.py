@@ -0,0 +1,42 @@
+# equipments/management/commands/snapshot_equipment.py
+from datetime import date
+
+import pandas as pd
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from equipments.snapshots import require_pyarrow, trend, write_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Записывает снимок оборудования с закреплениями для отчетов по динамике (запускать раз в сутки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Дата снимка ГГГГ-ММ-ДД (по умолчанию - сегодня)')
+        parser.add_argument('--report', metavar='ТИП',
+                            help='Вместо снимка показать выданное оборудование этого типа по отделам помесячно')
+
+    def handle(self, *args, **options):
+        try:
+            require_pyarrow()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        if options['report']:
+            counts = trend(['department'], type=options['report'], status='issued')
+            if counts.empty:
+                self.stdout.write("ℹ️ Нет данных в снимках")
+                return
+            for row in counts.itertuples(index=False):
+                # отдел пустой - в таблице NaN, а не None (NaN в bool - True)
+                department = 'Без отдела' if pd.isna(row.department) else row.department
+                self.stdout.write(f"{row.period}  {department}: {row.count}")
+            return
+
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError(f"Неверная дата: {options['date']}")
+
+        path, rows = write_snapshot(day)
+        self.stdout.write(f"✅ Снимок: {rows} единиц оборудования: {path}")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='hostname',
+            field=models.CharField(blank=True, help_text='DNS имя сетевого принтера (например: prn-buh-01.corp.local)', max_length=253, verbose_name='Имя хоста'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Полнотекстовый индекс FTS5 для поиска оборудования (только SQLite)
+#
+# SQL зафиксирован здесь, а не берется из equipments.search: миграция
+# должна создавать ту схему, которая была на момент ее написания, и
+# выполняться на соединении schema_editor.
+
+from django.db import migrations
+
+FTS_TABLE = 'equipments_equipment_fts'
+
+
+def _normalized(expr):
+    return f"replace(replace(coalesce({expr}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _insert_sql(where):
+    return f"""
+        INSERT INTO {FTS_TABLE}(rowid, mc_number, brand, model, notes, employee, department)
+        SELECT e.id,
+               {_normalized('e.mc_number')},
+               {_normalized('e.brand')},
+               {_normalized('e.model')},
+               {_normalized('e.notes')},
+               (SELECT {_normalized("emp.last_name || ' ' || emp.first_name || ' ' || emp.middle_name")}
+                  FROM employees_employee emp WHERE emp.id = e.assigned_to_id),
+               (SELECT {_normalized('d.name')}
+                  FROM employees_department d WHERE d.id = e.assigned_department_id)
+          FROM equipments_equipment e
+         WHERE {where};
+    """
+
+
+CREATE_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        mc_number, brand, model, notes, employee, department,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );""",
+    f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_ai AFTER INSERT ON equipments_equipment BEGIN
+        {_insert_sql('e.id = NEW.id')}
+    END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_au AFTER UPDATE ON equipments_equipment BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+        {_insert_sql('e.id = NEW.id')}
+    END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_ad AFTER DELETE ON equipments_equipment BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+    END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_employee_au
+        AFTER UPDATE OF last_name, first_name, middle_name ON employees_employee BEGIN
+        DELETE FROM {FTS_TABLE}
+         WHERE rowid IN (SELECT id FROM equipments_equipment WHERE assigned_to_id = NEW.id);
+        {_insert_sql('e.assigned_to_id = NEW.id')}
+    END;""",
+    f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_department_au
+        AFTER UPDATE OF name ON employees_department BEGIN
+        DELETE FROM {FTS_TABLE}
+         WHERE rowid IN (SELECT id FROM equipments_equipment WHERE assigned_department_id = NEW.id);
+        {_insert_sql('e.assigned_department_id = NEW.id')}
+    END;""",
+    # заполнение индекса уже существующим оборудованием
+    f'DELETE FROM {FTS_TABLE};',
+    _insert_sql('1 = 1'),
+]
+
+DROP_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS equipments_fts_department_au;',
+    'DROP TRIGGER IF EXISTS equipments_fts_employee_au;',
+    'DROP TRIGGER IF EXISTS equipments_fts_ad;',
+    'DROP TRIGGER IF EXISTS equipments_fts_au;',
+    'DROP TRIGGER IF EXISTS equipments_fts_ai;',
+    f'DROP TABLE IF EXISTS {FTS_TABLE};',
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_STATEMENTS:
+        schema_editor.execute(statement, params=None)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_STATEMENTS:
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('equipments', '0002_equipment_hostname'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+# Модели, за версиями которых следят кэши (equipments.versioning.track_models)
+TRACKED_LABELS = [
+    'equipments.equipment', 'employees.employee', 'employees.department',
+    'history.equipmenthistory', 'network.networkequipment', 'network.location',
+]
+
+
+def create_versions(apps, schema_editor):
+    DataVersion = apps.get_model('equipments', 'DataVersion')
+    DataVersion.objects.bulk_create([DataVersion(label=label) for label in TRACKED_LABELS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipments', '0003_equipment_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=100, unique=True, verbose_name='Модель')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия данных',
+                'verbose_name_plural': 'Версии данных',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
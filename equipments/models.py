@@ -1,10 +1,13 @@
 # equipments/models.py
 import ipaddress
+import re
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.urls import reverse
 from employees.models import Employee, Department  # добавляем импорт Department
 
+HOSTNAME_RE = re.compile(r'^(?=.{1,253}$)([a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?)(\.[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?)*\.?$', re.IGNORECASE)
+
 class Equipment(models.Model):
     TYPE_CHOICES = [
         ('laptop', 'Ноутбук'),
@@ -42,6 +45,14 @@ class Equipment(models.Model):
         help_text='IPv4 адрес для сетевых принтеров (например: 192.168.1.100)'
     )
     
+    # Имя хоста для принтеров с DHCP: при проверке имеет приоритет над IP
+    hostname = models.CharField(
+        'Имя хоста',
+        max_length=253,
+        blank=True,
+        help_text='DNS имя сетевого принтера (например: prn-buh-01.corp.local)'
+    )
+    
     # Закрепление за сотрудником
     assigned_to = models.ForeignKey(
         Employee, 
@@ -72,8 +83,13 @@ class Equipment(models.Model):
     # НОВЫЙ МЕТОД: Проверка является ли принтер сетевым
     @property
     def is_network_printer(self):
-        """Возвращает True если это принтер и у него есть IP адрес"""
-        return self.type == 'printer' and bool(self.ip_address)
+        """Возвращает True если это принтер и у него есть IP адрес или имя хоста"""
+        return self.type == 'printer' and bool(self.ip_address or self.hostname)
+    
+    @property
+    def network_address(self):
+        """Адрес для опроса принтера: имя хоста, если указано, иначе IP"""
+        return (self.hostname or self.ip_address or '').strip()
     
     # НОВЫЙ МЕТОД: Валидация IP адреса (опционально)
     def clean(self):
@@ -90,13 +106,22 @@ class Equipment(models.Model):
                 ipaddress.IPv4Address(self.ip_address)
             except ipaddress.AddressValueError:
                 raise ValidationError({'ip_address': 'Введите корректный IPv4 адрес'})
+        
+        if self.hostname:
+            if self.type != 'printer':
+                raise ValidationError({'hostname': 'Имя хоста можно указывать только для принтеров'})
+            
+            if not HOSTNAME_RE.match(self.hostname):
+                raise ValidationError({'hostname': 'Введите корректное DNS имя'})
     
     # НОВЫЙ МЕТОД: Отображение информации о сетевом принтере
     @property
     def network_info(self):
         """Информация о сетевом подключении"""
         if self.type == 'printer':
-            if self.ip_address:
+            if self.hostname:
+                return f"🖨️ Сетевой принтер ({self.hostname})"
+            elif self.ip_address:
                 return f"🖨️ Сетевой принтер ({self.ip_address})"
             else:
                 return f"🖨️ Локальный принтер (USB)"
@@ -186,4 +211,20 @@ class Equipment(models.Model):
     @property
     def display_mc(self):
         """Отображение МЦ номера (или текста если нет)"""
-        return self.mc_number if self.mc_number else "Без МЦ"
\ No newline at end of file
+        return self.mc_number if self.mc_number else "Без МЦ"
+
+
+class DataVersion(models.Model):
+    """
+    Счетчик изменений модели в БД (см. versioning.data_version): переживает
+    перезапуск и общий для всех процессов.
+    """
+    label = models.CharField('Модель', max_length=100, unique=True)
+    version = models.PositiveBigIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f"{self.label}: {self.version}"
@@ -0,0 +1,171 @@
+# equipments/pagination.py
+"""
+Keyset (курсорная) пагинация для больших списков.
+
+В отличие от OFFSET страница выбирается условием по ключу сортировки
+(например, (mc_number, id)), поэтому время выборки не зависит от номера
+страницы и размера таблицы. Полное количество строк считается отдельно
+и кэшируется - COUNT(*) по всей выборке не выполняется на каждый запрос.
+"""
+import base64
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+COUNT_CACHE_TIMEOUT = 60
+# Целые в курсоре - не шире 64-битного INTEGER (иначе OverflowError в драйвере)
+CURSOR_INT_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+
+def encode_cursor(values):
+    # даты и Decimal - строками ISO, обратно их разбирает поле модели
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':'), cls=DjangoJSONEncoder).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Значения ключа из курсора или None, если курсор пустой/поврежденный"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def page_size_from_request(request, default=DEFAULT_PAGE_SIZE):
+    """Размер страницы из ?limit= с ограничением сверху"""
+    try:
+        size = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def cached_count(queryset, key, timeout=COUNT_CACHE_TIMEOUT):
+    """
+    COUNT(*) с кэшированием. key - нормализованный ключ фильтров
+    (см. EquipmentFilter.cache_key), одинаковые фильтры дают один ключ.
+    """
+    return cache.get_or_set(f'count:{key}', queryset.count, timeout)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Пагинация по составному ключу. NULL в ключевых полях сортируются
+    первыми (как в SQLite по умолчанию); последнее поле должно быть
+    уникальным и NOT NULL (обычно id).
+    """
+
+    def __init__(self, queryset, keys=('mc_number', 'id'), per_page=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.keys = tuple(keys)
+        self.per_page = per_page
+
+    def _after(self, values):
+        """Условие "ключ строго больше values" (NULL меньше любого значения)"""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.keys, values):
+            if value is None:
+                condition |= equal & Q(**{f'{field}__isnull': False})
+                equal &= Q(**{f'{field}__isnull': True})
+            else:
+                condition |= equal & Q(**{f'{field}__gt': value})
+                equal &= Q(**{field: value})
+        return condition
+
+    def _before(self, values):
+        """Условие "ключ строго меньше values\""""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.keys, values):
+            if value is None:
+                equal &= Q(**{f'{field}__isnull': True})
+            else:
+                condition |= equal & (Q(**{f'{field}__lt': value}) | Q(**{f'{field}__isnull': True}))
+                equal &= Q(**{field: value})
+        return condition
+
+    def _cursor_values(self, token):
+        """
+        Значения ключа из курсора, приведенные к типам полей сортировки,
+        или None, если курсор пустой или подделан (первая страница).
+        """
+        values = decode_cursor(token)
+        if values is None or len(values) != len(self.keys):
+            return None
+        fields = [self.queryset.model._meta.get_field(key) for key in self.keys]
+        cleaned = []
+        for field, value in zip(fields, values):
+            if value is None:
+                if not field.null:
+                    return None
+                cleaned.append(None)
+                continue
+            if isinstance(value, (dict, list)):
+                return None
+            try:
+                value = field.to_python(value)
+                field.run_validators(value)
+            except ValidationError:
+                return None
+            if isinstance(value, int) and not CURSOR_INT_RANGE[0] <= value <= CURSOR_INT_RANGE[1]:
+                return None
+            cleaned.append(value)
+        return cleaned
+
+    def _cursor(self, obj):
+        return encode_cursor(getattr(obj, field) for field in self.keys)
+
+    def page(self, after=None, before=None):
+        after_values = self._cursor_values(after)
+        before_values = self._cursor_values(before)
+
+        if before_values is not None:
+            ordering = [F(field).desc(nulls_last=True) for field in self.keys]
+            rows = list(self.queryset.filter(self._before(before_values)).order_by(*ordering)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = list(reversed(rows[:self.per_page]))
+            previous_cursor = self._cursor(rows[0]) if has_more and rows else None
+            next_cursor = self._cursor(rows[-1]) if rows else None
+            return KeysetPage(rows, next_cursor, previous_cursor)
+
+        queryset = self.queryset
+        if after_values is not None:
+            queryset = queryset.filter(self._after(after_values))
+        ordering = [F(field).asc(nulls_first=True) for field in self.keys]
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self._cursor(rows[-1]) if has_more else None
+        previous_cursor = self._cursor(rows[0]) if after_values is not None and rows else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,214 @@
+# equipments/search.py
+"""
+Полнотекстовый поиск оборудования.
+
+На SQLite используется виртуальная таблица FTS5 equipments_equipment_fts
+(МЦ, марка, модель, примечания, ФИО сотрудника, название отдела).
+Индекс поддерживается триггерами: изменения через save(), update() и
+bulk_create() попадают в него автоматически, как и переименование
+сотрудника или отдела. Результаты ранжируются bm25. На других СУБД,
+а также если таблицы нет, поиск идет через ORM (icontains).
+
+FTS находит слова только по началу, а МЦ номера ищут и по хвосту
+("12345" для "00012345"), поэтому запрос с цифрами дополнительно
+сравнивается с МЦ номером по подстроке (mc_number_condition); такие
+совпадения идут после ранжированных.
+"""
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+from .models import Equipment
+
+FTS_TABLE = 'equipments_equipment_fts'
+FTS_COLUMNS = ('mc_number', 'brand', 'model', 'notes', 'employee', 'department')
+
+# Веса bm25 по колонкам: совпадение по МЦ важнее совпадения в примечаниях
+FTS_WEIGHTS = (10.0, 4.0, 4.0, 1.0, 6.0, 3.0)
+
+
+def _normalized(expression):
+    """SQL: NULL -> '', ё -> е (unicode61 не приравнивает их друг к другу)"""
+    return f"replace(replace(coalesce({expression}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _insert_sql(where):
+    """INSERT строк оборудования в индекс по условию на equipments_equipment e"""
+    return f"""
+        INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)})
+        SELECT e.id,
+               {_normalized('e.mc_number')},
+               {_normalized('e.brand')},
+               {_normalized('e.model')},
+               {_normalized('e.notes')},
+               (SELECT {_normalized("emp.last_name || ' ' || emp.first_name || ' ' || emp.middle_name")}
+                  FROM employees_employee emp WHERE emp.id = e.assigned_to_id),
+               (SELECT {_normalized('d.name')}
+                  FROM employees_department d WHERE d.id = e.assigned_department_id)
+          FROM equipments_equipment e
+         WHERE {where};
+    """
+
+
+def create_statements():
+    """DDL таблицы FTS5 и триггеров синхронизации"""
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                {', '.join(FTS_COLUMNS)},
+                tokenize = 'unicode61 remove_diacritics 2'
+            );""",
+        f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_ai AFTER INSERT ON equipments_equipment BEGIN
+                {_insert_sql('e.id = NEW.id')}
+            END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_au AFTER UPDATE ON equipments_equipment BEGIN
+                DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+                {_insert_sql('e.id = NEW.id')}
+            END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_ad AFTER DELETE ON equipments_equipment BEGIN
+                DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id;
+            END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_employee_au
+                AFTER UPDATE OF last_name, first_name, middle_name ON employees_employee BEGIN
+                DELETE FROM {FTS_TABLE}
+                 WHERE rowid IN (SELECT id FROM equipments_equipment WHERE assigned_to_id = NEW.id);
+                {_insert_sql('e.assigned_to_id = NEW.id')}
+            END;""",
+        f"""CREATE TRIGGER IF NOT EXISTS equipments_fts_department_au
+                AFTER UPDATE OF name ON employees_department BEGIN
+                DELETE FROM {FTS_TABLE}
+                 WHERE rowid IN (SELECT id FROM equipments_equipment WHERE assigned_department_id = NEW.id);
+                {_insert_sql('e.assigned_department_id = NEW.id')}
+            END;""",
+    ]
+
+
+def drop_statements():
+    return [
+        'DROP TRIGGER IF EXISTS equipments_fts_department_au;',
+        'DROP TRIGGER IF EXISTS equipments_fts_employee_au;',
+        'DROP TRIGGER IF EXISTS equipments_fts_ad;',
+        'DROP TRIGGER IF EXISTS equipments_fts_au;',
+        'DROP TRIGGER IF EXISTS equipments_fts_ai;',
+        f'DROP TABLE IF EXISTS {FTS_TABLE};',
+    ]
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def rebuild_index():
+    """Полная перестройка индекса (после загрузки фикстур с отключенными триггерами и т.п.)"""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        for statement in create_statements():
+            cursor.execute(statement)
+        cursor.execute(f'DELETE FROM {FTS_TABLE};')
+        cursor.execute(_insert_sql('1 = 1'))
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE};')
+        return cursor.fetchone()[0]
+
+
+def build_match_query(query):
+    """
+    Строка запроса -> выражение MATCH: каждое слово как префикс,
+    слова объединяются через AND. None, если слов нет.
+    """
+    query = query.replace('ё', 'е').replace('Ё', 'Е')
+    terms = [term for term in re.split(r'[^\w]+', query) if term]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def mc_number_condition(query):
+    """Q поиска по подстроке МЦ номера - только для запросов с цифрами, иначе None"""
+    query = query.strip()
+    if not any(char.isdigit() for char in query):
+        return None
+    return Q(mc_number__icontains=query)
+
+
+def orm_condition(query):
+    """Условие поиска через ORM (icontains) - для СУБД без FTS5 или без индекса"""
+    return (
+        Q(mc_number__icontains=query) |
+        Q(brand__icontains=query) |
+        Q(model__icontains=query) |
+        Q(notes__icontains=query) |
+        Q(assigned_to__last_name__icontains=query) |
+        Q(assigned_to__first_name__icontains=query) |
+        Q(assigned_to__middle_name__icontains=query) |
+        Q(assigned_department__name__icontains=query)
+    )
+
+
+def orm_search(queryset, query):
+    """Поиск через ORM - для СУБД без FTS5"""
+    return queryset.filter(orm_condition(query))
+
+
+def fts_usable(match):
+    """
+    Проверка индекса перед подзапросом MATCH в фильтре: подзапрос
+    выполняется внутри основного запроса, и ошибку нельзя поймать там.
+    False - таблицы нет или индекс поврежден, поиск идет через ORM.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT 1', [match])
+            cursor.fetchall()
+    except DatabaseError:
+        return False
+    return True
+
+
+def ranked_ids(query, limit=None):
+    """id оборудования по убыванию релевантности (bm25). None - FTS недоступен"""
+    if not fts_enabled():
+        return None
+    match = build_match_query(query)
+    if match is None:
+        return []
+
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, {weights})'
+    params = [match]
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [row[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        # Таблицы нет (миграция не применена) - откатываемся на ORM
+        return None
+
+    condition = mc_number_condition(query)
+    if condition is not None and not (limit and len(ids) >= limit):
+        found = set(ids)
+        extra = Equipment.objects.filter(condition).order_by('mc_number').values_list('id', flat=True)
+        ids += [pk for pk in extra if pk not in found]
+        if limit:
+            ids = ids[:limit]
+    return ids
+
+
+def search_equipment(query, queryset=None, limit=None):
+    """
+    Поиск оборудования: список объектов в порядке релевантности.
+    queryset задает select_related и дополнительные фильтры.
+    """
+    if queryset is None:
+        queryset = Equipment.objects.all()
+
+    ids = ranked_ids(query, limit=limit)
+    if ids is None:
+        results = orm_search(queryset, query)
+        return list(results[:limit] if limit else results)
+
+    by_id = queryset.in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id]
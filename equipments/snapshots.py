@@ -0,0 +1,196 @@
+# equipments/snapshots.py
+"""
+Ежедневные снимки оборудования для отчетов по динамике.
+
+В базе есть только текущее состояние, поэтому раз в сутки (команда
+snapshot_equipment по cron) состояние оборудования с закреплениями
+записывается в EXCEL_FOLDER/snapshots: один файл Parquet (zstd) на
+дату. Отчет читает с диска только нужные ему колонки и только нужные
+снимки, к рабочей базе не обращается.
+
+Для Parquet нужен pyarrow (есть в requirements.txt); без него снимки не
+пишутся и не читаются - ImproperlyConfigured с понятным сообщением.
+Других форматов нет: в EXCEL_FOLDER лежат и загруженные пользователями
+файлы, поэтому формат, допускающий выполнение кода при чтении (pickle),
+здесь недопустим.
+"""
+import os
+import tempfile
+from datetime import date
+
+import pandas as pd
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import pyarrow  # noqa: F401 - нужен pandas для Parquet
+except ImportError:
+    pyarrow = None
+
+SNAPSHOT_PREFIX = 'equipment_'
+PARQUET_EXTENSION = '.parquet'
+
+# Колонки снимка. department - отдел, за которым числится оборудование:
+# закрепление за отделом, а если его нет - отдел сотрудника.
+SNAPSHOT_COLUMNS = [
+    'id', 'mc_number', 'type', 'brand', 'model', 'status',
+    'employee_id', 'employee', 'department_id', 'department', 'purchase_date',
+]
+
+# Группировка снимков по периодам для trend()
+PERIOD_FORMATS = {
+    'day': '%Y-%m-%d',
+    'month': '%Y-%m',
+    'year': '%Y',
+}
+
+
+def snapshot_folder():
+    folder = os.path.join(settings.EXCEL_FOLDER, 'snapshots')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def build_frame():
+    """
+    Текущее состояние оборудования: один проход values_list() по каждой
+    таблице, названия отделов и ФИО - из словарей, без JOIN.
+    """
+    from employees.models import Department, Employee
+
+    from .models import Equipment
+
+    departments = dict(Department.objects.values_list('id', 'name'))
+    employees = {
+        pk: (f"{last_name} {first_name} {middle_name or ''}".strip(), department_id)
+        for pk, last_name, first_name, middle_name, department_id in Employee.objects.values_list(
+            'id', 'last_name', 'first_name', 'middle_name', 'department_id',
+        ).iterator(chunk_size=2000)
+    }
+
+    data = {column: [] for column in SNAPSHOT_COLUMNS}
+    rows = Equipment.objects.order_by('id').values_list(
+        'id', 'mc_number', 'type', 'brand', 'model', 'status',
+        'assigned_to_id', 'assigned_department_id', 'purchase_date',
+    ).iterator(chunk_size=2000)
+    for pk, mc_number, type_, brand, model, status, employee_id, department_id, purchase_date in rows:
+        employee, employee_department = employees.get(employee_id, (None, None))
+        department_id = department_id or employee_department
+        for column, value in zip(SNAPSHOT_COLUMNS, (
+            pk, mc_number, type_, brand, model, status,
+            employee_id, employee, department_id, departments.get(department_id), purchase_date,
+        )):
+            data[column].append(value)
+
+    frame = pd.DataFrame(data, columns=SNAPSHOT_COLUMNS)
+    for column in ('id', 'employee_id', 'department_id'):
+        frame[column] = frame[column].astype('Int64')
+    for column in ('type', 'status', 'department'):
+        # мало разных значений: category хранится в Parquet словарем
+        frame[column] = frame[column].astype('category')
+    frame['purchase_date'] = pd.to_datetime(frame['purchase_date'])
+    return frame
+
+
+def require_pyarrow():
+    if pyarrow is None:
+        raise ImproperlyConfigured(
+            'Для снимков оборудования нужен pyarrow (Parquet): установите его - pip install -r requirements.txt'
+        )
+
+
+def write_snapshot(day=None, frame=None):
+    """
+    Записывает снимок на дату day (по умолчанию - сегодня), повторный
+    запуск за ту же дату перезаписывает файл. Возвращает (путь, строк).
+    """
+    require_pyarrow()
+    day = day or date.today()
+    frame = build_frame() if frame is None else frame
+    folder = snapshot_folder()
+    path = os.path.join(folder, f'{SNAPSHOT_PREFIX}{day.isoformat()}{PARQUET_EXTENSION}')
+
+    descriptor, temp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            frame.to_parquet(file, compression='zstd', index=False)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path, len(frame)
+
+
+def list_snapshots(start=None, end=None):
+    """[(дата, путь)] снимков в диапазоне дат (включительно), по возрастанию даты"""
+    folder = snapshot_folder()
+    snapshots = []
+    for name in os.listdir(folder):
+        if not (name.startswith(SNAPSHOT_PREFIX) and name.endswith(PARQUET_EXTENSION)):
+            continue
+        try:
+            day = date.fromisoformat(name[len(SNAPSHOT_PREFIX):-len(PARQUET_EXTENSION)])
+        except ValueError:
+            continue
+        if (start is None or day >= start) and (end is None or day <= end):
+            snapshots.append((day, os.path.join(folder, name)))
+    return sorted(snapshots)
+
+
+def read_snapshot(path, columns=None):
+    """Снимок из файла: только колонки columns (None - все)"""
+    require_pyarrow()
+    return pd.read_parquet(path, columns=columns)
+
+
+def load_snapshots(columns, start=None, end=None, snapshots=None):
+    """
+    Колонки columns из всех снимков за период одной таблицей с колонкой
+    snapshot_date. Остальные колонки с диска не читаются.
+    """
+    columns = list(columns)
+    unknown = set(columns) - set(SNAPSHOT_COLUMNS)
+    if unknown:
+        raise ValueError(f"неизвестные колонки снимка: {', '.join(sorted(unknown))}")
+
+    snapshots = list_snapshots(start, end) if snapshots is None else snapshots
+    frames = []
+    for day, path in snapshots:
+        frame = read_snapshot(path, columns)
+        frame.insert(0, 'snapshot_date', pd.Timestamp(day))
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame({
+            'snapshot_date': pd.Series(dtype='datetime64[ns]'),
+            **{column: pd.Series(dtype=object) for column in columns},
+        })
+    return pd.concat(frames, ignore_index=True)
+
+
+def trend(by=(), start=None, end=None, period='month', **filters):
+    """
+    Количество оборудования по периодам: на каждый период берется
+    последний снимок в нем. by - колонки группировки, filters - отбор по
+    равенству (например type='laptop', status='issued'). Возвращает
+    таблицу period, *by, count.
+
+    Пример: ноутбуки на руках по отделам помесячно за 2024 год -
+    trend(['department'], date(2024, 1, 1), date(2024, 12, 31), type='laptop', status='issued').
+    """
+    by = list(by)
+    period_format = PERIOD_FORMATS[period]
+    latest = {}
+    for day, path in list_snapshots(start, end):
+        latest[day.strftime(period_format)] = (day, path)
+
+    columns = list(dict.fromkeys([*by, *filters])) or ['id']  # для подсчета строк хватит одной колонки
+    frame = load_snapshots(columns, snapshots=list(latest.values()))
+    for column, value in filters.items():
+        frame = frame[frame[column] == value]
+    frame = frame.assign(period=frame['snapshot_date'].dt.strftime(period_format))
+    return (
+        frame.groupby(['period', *by], observed=True, dropna=False)
+        .size()
+        .reset_index(name='count')
+    )
@@ -1,3 +1,951 @@
+import unittest
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from employees.models import Department
+from excel_export.jobs import run_job
+from excel_export.models import ExcelJob
+from . import snapshots
+from .models import Equipment
+from .pagination import KeysetPaginator, encode_cursor
+
+
+class KeysetPaginationTest(TestCase):
+    """Курсорная пагинация списка оборудования"""
+
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Склад')
+        for i in range(7):
+            Equipment.objects.create(mc_number=f'MC{i:03d}', type='laptop', status='available',
+                                     assigned_department=self.department)
+        # Оборудование без МЦ (NULL) должно попадать в выдачу
+        for _ in range(3):
+            Equipment.objects.create(mc_number=None, type='mouse', status='issued')
+
+    def _walk(self, paginator):
+        seen = []
+        page = paginator.page()
+        seen.extend(page.object_list)
+        while page.has_next:
+            page = paginator.page(after=page.next_cursor)
+            seen.extend(page.object_list)
+        return seen, page
+
+    def test_walk_all_pages_forward_and_back(self):
+        """Проход вперед отдает каждую запись ровно один раз, назад - ту же страницу"""
+        paginator = KeysetPaginator(Equipment.objects.all(), per_page=3)
+        seen, last_page = self._walk(paginator)
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len({item.pk for item in seen}), 10)
+        self.assertEqual([item.mc_number for item in seen[:3]], [None, None, None])
+
+        previous = paginator.page(before=last_page.previous_cursor)
+        self.assertEqual([item.pk for item in previous], [item.pk for item in seen[-4:-1]])
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Equipment.objects.all(), per_page=3)
+        self.assertEqual(
+            [item.pk for item in paginator.page(after='not-a-cursor')],
+            [item.pk for item in paginator.page()],
+        )
+
+    def test_tampered_cursor_returns_first_page(self):
+        """Курсор с чужими типами значений не доходит до запроса"""
+        paginator = KeysetPaginator(Equipment.objects.all(), per_page=3)
+        first_page = [item.pk for item in paginator.page()]
+        for values in ([{'a': 1}, 2], ['MC001', 'abc'], ['MC001', [1]], ['MC001', None], ['MC001', 10 ** 30]):
+            with self.subTest(values=values):
+                cursor = encode_cursor(values)
+                self.assertEqual([item.pk for item in paginator.page(after=cursor)], first_page)
+                self.assertEqual([item.pk for item in paginator.page(before=cursor)], first_page)
+
+        response = self.client.get('/equipment/', {'after': encode_cursor([{'a': 1}, 2])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_view_keeps_filters(self):
+        """Фильтры сохраняются в ссылках, количество берется из кэша"""
+        response = self.client.get('/equipment/', {'status': 'available', 'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_count'], 7)
+        self.assertEqual(len(response.context['equipments']), 5)
+        self.assertIn('status=available', response.context['filter_query'])
+
+        next_cursor = response.context['page'].next_cursor
+        response = self.client.get('/equipment/', {'status': 'available', 'limit': 5, 'after': next_cursor})
+        self.assertEqual(len(response.context['equipments']), 2)
+        self.assertFalse(response.context['page'].has_next)
+
+    def test_list_view_query_count_constant(self):
+        """Число запросов не зависит от количества оборудования"""
+        self.client.get('/equipment/')  # прогрев кэша количества
+        with self.assertNumQueries(3):  # версия данных, страница, отделы
+            self.client.get('/equipment/')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(50):
+                Equipment.objects.create(mc_number=f'EXTRA{i:03d}', type='pc')
+        self.client.get('/equipment/')  # версия данных изменилась - кэш пересчитывается
+        with self.assertNumQueries(3):
+            self.client.get('/equipment/')
+
+
+class EquipmentSearchTest(TestCase):
+    """Полнотекстовый поиск (FTS5 на SQLite)"""
+
+    def setUp(self):
+        from employees.models import Employee
+
+        self.department = Department.objects.create(name='Бухгалтерия')
+        self.employee = Employee.objects.create(last_name='Ёлкин', first_name='Пётр', department=self.department)
+        self.laptop = Equipment.objects.create(mc_number='MC100', type='laptop', brand='Dell',
+                                               model='Latitude 5420', assigned_to=self.employee)
+        self.printer = Equipment.objects.create(mc_number='MC200', type='printer', brand='HP',
+                                                model='LaserJet', notes='Dell совместимый картридж',
+                                                assigned_department=self.department)
+
+    def _search(self, query):
+        from .search import search_equipment
+        return [item.pk for item in search_equipment(query)]
+
+    def test_prefix_and_yo_normalisation(self):
+        """Префиксный поиск, регистр и ё/е не важны"""
+        self.assertEqual(self._search('елкин'), [self.laptop.pk])
+        self.assertEqual(self._search('ПЕТ'), [self.laptop.pk])
+        self.assertEqual(self._search('latit 54'), [self.laptop.pk])
+
+    def test_bm25_ranking(self):
+        """Совпадение в марке выше совпадения в примечаниях"""
+        self.assertEqual(self._search('dell'), [self.laptop.pk, self.printer.pk])
+
+    def test_index_follows_related_renames(self):
+        """Триггеры обновляют индекс при переименовании сотрудника и отдела, update() и удалении"""
+        self.employee.last_name = 'Смирнов'
+        self.employee.save()
+        self.assertEqual(self._search('смирнов'), [self.laptop.pk])
+        self.assertEqual(self._search('елкин'), [])
+
+        Department.objects.filter(pk=self.department.pk).update(name='Финансы')
+        self.assertEqual(self._search('финансы'), [self.printer.pk])
+
+        Equipment.objects.filter(pk=self.printer.pk).update(model='OfficeJet')
+        self.assertEqual(self._search('officejet'), [self.printer.pk])
+
+        self.printer.delete()
+        self.assertEqual(self._search('officejet'), [])
+
+    def test_mc_number_substring(self):
+        """Номер МЦ находится и по части из середины или конца"""
+        tail = Equipment.objects.create(mc_number='00012345', type='mouse')
+        self.assertEqual(self._search('12345'), [tail.pk])
+        self.assertEqual(self._search('MC1'), [self.laptop.pk])
+
+        from .filters import EquipmentFilter
+        self.assertEqual(list(EquipmentFilter(q='2345').queryset().values_list('pk', flat=True)), [tail.pk])
+        response = self.client.get('/equipment/', {'q': '12345'})
+        self.assertEqual(response.context['total_count'], 1)
+
+    def test_filter_falls_back_without_index(self):
+        """Нет таблицы FTS - список с поиском работает через ORM, а не падает"""
+        from django.db import connection
+
+        from . import search
+        from .filters import EquipmentFilter
+
+        with connection.cursor() as cursor:
+            for statement in search.drop_statements():
+                cursor.execute(statement)
+        self.assertEqual(list(EquipmentFilter(q='Latitude').queryset()), [self.laptop])
+        response = self.client.get('/equipment/', {'q': 'LaserJet'})
+        self.assertEqual(response.context['total_count'], 1)
+
+    def test_orm_fallback(self):
+        """Без FTS поиск идет через ORM"""
+        from unittest import mock
+        from . import search
+
+        with mock.patch.object(search, 'fts_enabled', return_value=False):
+            self.assertEqual(self._search('Latitude'), [self.laptop.pk])
+
+    def test_search_view(self):
+        response = self.client.get('/equipment/search/', {'q': 'laserjet'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['results_count'], 1)
+        self.assertContains(response, 'MC200')
+
+
+class AutocompleteTest(TestCase):
+    """Подсказки поиска из индекса в памяти"""
+
+    def setUp(self):
+        from employees.models import Employee
+        from .autocomplete import INDEX
+
+        self.index = INDEX
+        self.department = Department.objects.create(name='Отдел продаж', short_name='ОП')
+        self.employee = Employee.objects.create(last_name='Ёжиков', first_name='Иван', department=self.department)
+        self.laptop = Equipment.objects.create(mc_number='00451', type='laptop', brand='Lenovo')
+        self.index.rebuild()
+
+    def _labels(self, query):
+        return [item['label'] for item in self.index.search(query)]
+
+    def test_prefix_search_with_normalisation(self):
+        self.assertEqual(self._labels('ЕЖИ'), ['Ёжиков Иван'])
+        self.assertEqual(self._labels('иван'), ['Ёжиков Иван'])
+        self.assertEqual(self._labels('004'), ['00451 — Ноутбук Lenovo'])
+        self.assertEqual(self._labels('оп'), ['Отдел продаж'])
+
+    def test_incremental_updates_from_signals(self):
+        """Сохранение и удаление обновляют индекс без перестройки и запросов к БД"""
+        printer = Equipment.objects.create(mc_number='00452', type='printer', brand='HP')
+        self.employee.is_active = False
+        self.employee.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.index.search('0045')), 2)
+            self.assertEqual(self._labels('ежи'), [])
+
+        printer.delete()
+        self.assertEqual(self._labels('0045'), ['00451 — Ноутбук Lenovo'])
+
+    def test_rebuild_does_not_block_search(self):
+        """Пока загрузка идет, поиск отдает прежний индекс, а изменения из сигналов не теряются"""
+        import threading
+
+        from .autocomplete import PrefixIndex
+
+        loading, release = threading.Event(), threading.Event()
+        rows = [('equipment', 1, 'A1', '/1/', ['A1'])]
+        calls = []
+
+        def loader():
+            calls.append(1)
+            if len(calls) > 1:  # первое построение - без задержки
+                loading.set()
+                release.wait(5)
+            return list(rows)
+
+        index = PrefixIndex(loader)
+        self.assertEqual(len(index.search('a')), 1)
+
+        index.invalidate()
+        rows.append(('equipment', 2, 'A2', '/2/', ['A2']))
+        worker = threading.Thread(target=index.search, args=('a',))
+        worker.start()
+        self.assertTrue(loading.wait(5))
+        # перестройка занята загрузкой: поиск не ждет ее и видит прежние данные
+        self.assertEqual([item['label'] for item in index.search('a')], ['A1'])
+        index.add('equipment', 3, 'A3', '/3/', ['A3'])
+        release.set()
+        worker.join(5)
+
+        self.assertEqual([item['label'] for item in index.search('a')], ['A1', 'A2', 'A3'])
+
+    def test_endpoint(self):
+        response = self.client.get('/equipment/autocomplete/', {'q': 'ёжик'})
+        self.assertEqual(response.status_code, 200)
+        result = response.json()['results'][0]
+        self.assertEqual(result['type'], 'employee')
+        self.assertEqual(result['url'], f'/employees/{self.employee.pk}/')
+
+
+class EquipmentFilterTest(TestCase):
+    """Общий фильтр списка, поиска и экспортов"""
+
+    def setUp(self):
+        from employees.models import Employee
+
+        self.it = Department.objects.create(name='ИТ-отдел')
+        self.employee = Employee.objects.create(last_name='Петров', first_name='Олег',
+                                                middle_name='Игоревич', department=self.it)
+        self.laptop = Equipment.objects.create(mc_number='F001', type='laptop', status='issued',
+                                               assigned_to=self.employee)
+        self.monitor = Equipment.objects.create(mc_number='F002', type='monitor', status='available',
+                                                assigned_department=self.it)
+
+    def _ids(self, **params):
+        from .filters import EquipmentFilter
+        return sorted(EquipmentFilter(**params).queryset().values_list('pk', flat=True))
+
+    def test_filters(self):
+        self.assertEqual(self._ids(status='issued'), [self.laptop.pk])
+        self.assertEqual(self._ids(department=str(self.it.pk)), [self.laptop.pk])
+        self.assertEqual(self._ids(assigned_department=self.it.pk, type='monitor'), [self.monitor.pk])
+        # поиск по отчеству есть во всех местах, где используется фильтр
+        self.assertEqual(self._ids(q='Игоревич'), [self.laptop.pk])
+
+    def test_invalid_ids_ignored(self):
+        self.assertEqual(self._ids(department='abc', employee='-1'), [self.laptop.pk, self.monitor.pk])
+
+    def test_cache_key_normalised(self):
+        from .filters import EquipmentFilter
+
+        self.assertEqual(
+            EquipmentFilter(status=' issued ', department='5', type='').cache_key(),
+            EquipmentFilter(department=5, status='issued').cache_key(),
+        )
+        self.assertNotEqual(EquipmentFilter(status='issued').cache_key(), EquipmentFilter().cache_key())
+
+    def test_only_needed_joins(self):
+        """Фильтр по статусу не добавляет JOIN, фильтр по отделу сотрудника - добавляет"""
+        from .filters import EquipmentFilter
+
+        plain = str(EquipmentFilter(status='issued', q='Петров').queryset(related=()).query)
+        self.assertNotIn('JOIN', plain)
+        joined = str(EquipmentFilter(department=self.it.pk).queryset(related=()).query)
+        self.assertIn('JOIN', joined)
+
+
+class FacetCountsTest(TestCase):
+    """Счетчики фильтров и их инвалидация по версии данных"""
+
+    def setUp(self):
+        cache.clear()
+        self.it = Department.objects.create(name='ИТ')
+        self.stock = Department.objects.create(name='Склад')
+        Equipment.objects.create(mc_number='A1', type='laptop', status='issued', assigned_department=self.it)
+        Equipment.objects.create(mc_number='A2', type='laptop', status='available', assigned_department=self.stock)
+        Equipment.objects.create(mc_number='A3', type='monitor', status='available', assigned_department=self.stock)
+
+    def test_facets_ignore_own_filter(self):
+        """Фасет статуса учитывает фильтр по типу, но не собственный фильтр по статусу"""
+        from .facets import facet_counts
+        from .filters import EquipmentFilter
+
+        facets = facet_counts(EquipmentFilter(type='laptop', status='issued'))
+        self.assertEqual(facets['status'], {'issued': 1, 'available': 1})
+        self.assertEqual(facets['type'], {'laptop': 1})
+        self.assertEqual(facets['assigned_department'], {self.it.pk: 1})
+
+    def test_cached_until_equipment_changes(self):
+        from .facets import facet_counts
+        from .filters import EquipmentFilter
+
+        spec = EquipmentFilter()
+        facet_counts(spec)
+        with self.assertNumQueries(1):  # только версия данных
+            self.assertEqual(facet_counts(spec)['type'], {'laptop': 2, 'monitor': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(mc_number='A4', type='monitor')
+        self.assertEqual(facet_counts(spec)['type'], {'laptop': 2, 'monitor': 2})
+
+    def test_version_bumped_after_commit(self):
+        """Новая версия видна только после коммита - иначе под ней закэшируются старые данные"""
+        from .versioning import data_version
+
+        version = data_version(Equipment)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Equipment.objects.create(mc_number='A4', type='monitor')
+            self.assertEqual(data_version(Equipment), version)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(data_version(Equipment), version)
+
+    def test_cache_follows_employee_department(self):
+        from employees.models import Employee
+
+        employee = Employee.objects.create(last_name='Орлов', first_name='Иван', department=self.it)
+        Equipment.objects.create(mc_number='A5', type='mouse', assigned_to=employee)
+
+        def counts():
+            response = self.client.get('/equipment/', {'department': self.it.pk})
+            departments = {department.pk: department.employee_equipment_count
+                           for department in response.context['departments']}
+            return response.context['total_count'], departments
+
+        self.assertEqual(counts(), (1, {self.it.pk: 1, self.stock.pk: 0}))
+        # перевод сотрудника меняет только Employee - кэш все равно пересчитывается
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.department = self.stock
+            employee.save()
+        self.assertEqual(counts(), (0, {self.it.pk: 0, self.stock.pk: 1}))
+
+    def test_list_renders_counts(self):
+        response = self.client.get('/equipment/', {'type': 'laptop'})
+        self.assertContains(response, 'На складе (1)')
+        self.assertContains(response, 'Монитор (1)')
+
+
+class EquipmentImportTest(TestCase):
+    """Пакетный импорт оборудования из Excel"""
+
+    def setUp(self):
+        from employees.models import Employee
+
+        cache.clear()
+        self.department = Department.objects.create(name='Бухгалтерия')
+        self.employee = Employee.objects.create(last_name='Петров', first_name='Петр', department=self.department)
+
+    def _frame(self, rows):
+        import pandas as pd
+        return pd.DataFrame(rows, dtype=str)
+
+    def test_columns_mapped_and_looked_up(self):
+        from .importer import import_equipment
+
+        result = import_equipment(self._frame([
+            {'МЦ номер': '100', 'Тип': 'Ноутбук', 'Марка': 'Dell', 'Сотрудник': 'Петров Петр',
+             'Отдел': 'бухгалтерия', 'Статус': 'на складе'},
+            {'МЦ номер': None, 'Тип': 'что-то', 'Сотрудник': None, 'Статус': None},
+            {'МЦ номер': '101', 'Тип': 'мышь', 'Сотрудник': 'Неизвестный'},
+        ]))
+        self.assertEqual((result.imported, result.errors), (2, ['Строка 4: сотрудник «Неизвестный» не найден']))
+
+        laptop = Equipment.objects.get(mc_number='100')
+        self.assertEqual((laptop.type, laptop.status, laptop.brand, laptop.model), ('laptop', 'available', 'Dell', ''))
+        self.assertEqual(laptop.assigned_to, self.employee)
+        self.assertEqual(laptop.assigned_department, self.department)
+
+        other = Equipment.objects.get(mc_number__isnull=True)
+        self.assertEqual((other.type, other.status, other.assigned_to), ('other', 'issued', None))
+
+    def test_row_errors_reported(self):
+        from .importer import import_equipment
+
+        result = import_equipment(self._frame([
+            {'МЦ номер': '1', 'Тип': 'мышь'},
+            {'МЦ номер': 'X' * 30, 'Тип': 'мышь'},
+        ]))
+        self.assertEqual(result.imported, 1)
+        self.assertEqual(result.errors, ['Строка 3: МЦ номер: длина больше 20 символов'])
+
+    def test_query_count_independent_of_rows(self):
+        from .importer import import_equipment
+
+        rows = [{'МЦ номер': f'{i}', 'Тип': 'монитор', 'Сотрудник': 'Петров', 'Отдел': 'Бухгалтерия'}
+                for i in range(120)]
+        # 2 справочника + по пачке (savepoint, INSERT, release) на каждые 50 строк + версия данных
+        with self.assertNumQueries(2 + 3 * 3 + 1):
+            result = import_equipment(self._frame(rows), batch_size=50)
+        self.assertEqual(result.imported, 120)
+        self.assertEqual(Equipment.objects.filter(assigned_to=self.employee).count(), 120)
+
+    def test_import_view(self):
+        import io
+        import tempfile
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+
+        buffer = io.BytesIO()
+        self._frame([{'МЦ номер': '200', 'Тип': 'принтер', 'Статус': 'выдано'}]).to_excel(buffer, index=False)
+        upload = SimpleUploadedFile('import.xlsx', buffer.getvalue())
+        with tempfile.TemporaryDirectory() as folder, override_settings(EXCEL_FOLDER=folder):
+            # воркер не запускаем (execute=False) - задачу выполняем здесь же
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = self.client.post('/equipment/import/', {'excel_file': upload})
+            job = ExcelJob.objects.get()
+            self.assertRedirects(response, f'/export/jobs/{job.pk}/')
+            self.assertEqual((job.status, len(callbacks)), ('queued', 1))
+            run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.inserted), ('done', 1, 1))
+        self.assertTrue(Equipment.objects.filter(mc_number='200', type='printer').exists())
+
+
+class StreamingImportTest(TestCase):
+    """Потоковый импорт xlsx/csv пачками"""
+
+    def test_xlsx_batches_keep_row_numbers(self):
+        import io
+
+        from openpyxl import Workbook
+
+        from .importer import import_equipment_file, iter_xlsx_frames
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['МЦ номер', 'Тип', 'Статус'])
+        for i in range(5):
+            sheet.append([1000 + i, 'монитор', 'на складе'])
+        sheet.append([None, None, None])
+        sheet.append(['X' * 30, 'мышь', None])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        buffer.seek(0)
+        self.assertEqual([len(frame) for frame in iter_xlsx_frames(buffer, batch_size=2)], [2, 2, 1, 1])
+
+        buffer.seek(0)
+        snapshots = []
+        result = import_equipment_file(buffer, 'audit.xlsx', batch_size=2,
+                                       progress=lambda r: snapshots.append(r.processed))
+        self.assertEqual(snapshots, [2, 4, 5, 6])
+        self.assertEqual(result.imported, 5)
+        self.assertEqual(result.errors, ['Строка 8: МЦ номер: длина больше 20 символов'])
+        self.assertTrue(Equipment.objects.filter(mc_number='1004', status='available').exists())
+
+    def test_csv_semicolon(self):
+        import io
+
+        from .importer import import_equipment_file
+
+        data = 'МЦ номер;Тип;Марка\n1;ноутбук;Lenovo\n2;мышь;\n3;сканер;Canon\n'.encode('utf-8-sig')
+        result = import_equipment_file(io.BytesIO(data), 'audit.csv', batch_size=2)
+        self.assertEqual((result.processed, result.imported), (3, 3))
+        self.assertEqual(
+            list(Equipment.objects.order_by('mc_number').values_list('type', 'brand')),
+            [('laptop', 'Lenovo'), ('mouse', ''), ('scanner', 'Canon')],
+        )
+
+
+class UpsertImportTest(TestCase):
+    """Повторный импорт с сопоставлением по номеру МЦ"""
+
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Склад')
+        self.laptop = Equipment.objects.create(mc_number='MC 001', type='laptop', brand='Dell', status='issued')
+        self.mouse = Equipment.objects.create(mc_number='MC002', type='mouse', status='available')
+
+    def _import(self, rows, **options):
+        import pandas as pd
+
+        from .importer import import_equipment
+        return import_equipment(pd.DataFrame(rows, dtype=str), upsert=True, **options)
+
+    def test_updates_only_changed_and_is_idempotent(self):
+        rows = [
+            {'МЦ номер': 'mc001', 'Тип': 'ноутбук', 'Марка': 'Dell', 'Статус': 'на складе', 'Отдел': 'Склад'},
+            {'МЦ номер': 'MC002', 'Тип': 'мышь', 'Статус': 'на складе'},
+            {'МЦ номер': 'MC003', 'Тип': 'монитор'},
+        ]
+        result = self._import(rows)
+        self.assertEqual((result.imported, result.updated, result.unchanged), (1, 1, 1))
+        self.laptop.refresh_from_db()
+        self.assertEqual((self.laptop.mc_number, self.laptop.status), ('MC 001', 'available'))
+        self.assertEqual(self.laptop.assigned_department, self.department)
+
+        again = self._import(rows)
+        self.assertEqual((again.imported, again.updated, again.unchanged), (0, 0, 3))
+        self.assertEqual(Equipment.objects.count(), 3)
+
+    def _state(self):
+        return list(Equipment.objects.order_by('id').values_list(
+            'mc_number', 'type', 'brand', 'model', 'status', 'assigned_to_id', 'assigned_department_id', 'notes',
+        ))
+
+    def _import_file(self, content, filename):
+        import io
+
+        from .importer import import_equipment_file
+        return import_equipment_file(io.BytesIO(content), filename, upsert=True)
+
+    def test_template_layout_keeps_unlisted_fields(self):
+        """В шаблоне нет колонки 'Отдел' - закрепления за отделами не снимаются"""
+        from employees.models import Employee
+
+        employee = Employee.objects.create(last_name='Иванов', first_name='Иван')
+        Equipment.objects.create(mc_number='123456', type='laptop', brand='Dell', model='Latitude 5420',
+                                 assigned_to=employee, assigned_department=self.department,
+                                 status='issued', notes='Пример записи')
+        Equipment.objects.create(mc_number='123457', type='monitor', brand='Samsung', model='S24F350',
+                                 assigned_department=self.department, status='available')
+        before = self._state()
+
+        result = self._import_file(b''.join(self.client.get('/equipment/export-template/')), 'template.xlsx')
+        self.assertEqual((result.updated, result.unchanged, result.errors), (0, 2, []))
+        self.assertEqual(self._state(), before)
+
+    def test_export_layout_round_trip(self):
+        """Выгрузка оборудования импортируется обратно без изменений"""
+        import tempfile
+
+        from django.test import override_settings
+
+        from employees.models import Employee
+
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        override = override_settings(EXCEL_FOLDER=folder.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        employee = Employee.objects.create(last_name='Сидоров', first_name='Петр', middle_name='Ильич',
+                                           department=Department.objects.create(name='ИТ'))
+        Equipment.objects.create(mc_number='MC003', type='calculator', assigned_to=employee,
+                                 assigned_department=self.department, notes='на столе')
+        Equipment.objects.filter(pk=self.mouse.pk).update(assigned_department=self.department)
+        before = self._state()
+
+        response = self.client.get('/export/export/', {'model': 'equipment'})
+        result = self._import_file(b''.join(response.streaming_content), 'export.xlsx')
+        response.close()
+        self.assertEqual((result.updated, result.unchanged, result.errors), (0, 3, []))
+        self.assertEqual(self._state(), before)
+
+    def test_unknown_employee_or_department_keeps_assignment(self):
+        from employees.models import Employee
+
+        employee = Employee.objects.create(last_name='Орлов', first_name='Иван')
+        Equipment.objects.filter(pk=self.laptop.pk).update(assigned_to=employee, assigned_department=self.department)
+        result = self._import([
+            {'МЦ номер': 'MC001', 'Сотрудник': 'Неизвестный', 'Отдел': 'Склад', 'Марка': 'HP'},
+            {'МЦ номер': 'MC002', 'Сотрудник': 'Орлов', 'Отдел': 'Нет такого'},
+        ])
+        self.assertEqual(result.errors, ['Строка 2: сотрудник «Неизвестный» не найден',
+                                         'Строка 3: отдел «Нет такого» не найден'])
+        self.laptop.refresh_from_db()
+        self.assertEqual((self.laptop.brand, self.laptop.assigned_to, self.laptop.assigned_department),
+                         ('Dell', employee, self.department))
+
+    def test_dry_run_diff_without_writes(self):
+        result = self._import([
+            {'МЦ номер': 'MC001', 'Тип': 'ноутбук', 'Марка': 'HP', 'Статус': 'выдано'},
+            {'МЦ номер': 'MC009', 'Тип': 'сканер'},
+        ], dry_run=True, flag_missing=True)
+
+        self.assertEqual((result.imported, result.updated, result.missing), (1, 1, 1))
+        kinds = {change.kind: change for change in result.changes}
+        self.assertEqual(kinds['create'].mc_number, 'MC009')
+        self.assertEqual(kinds['update'].fields, {'Марка': ('Dell', 'HP')})
+        self.assertEqual(kinds['missing'].mc_number, 'MC002')
+        self.assertEqual(Equipment.objects.count(), 2)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.brand, 'Dell')
+
+    def test_rows_without_or_with_repeated_mc_rejected(self):
+        result = self._import([
+            {'МЦ номер': '', 'Тип': 'мышь'},
+            {'МЦ номер': 'MC010', 'Тип': 'мышь'},
+            {'МЦ номер': 'mc 010', 'Тип': 'мышь'},
+        ])
+        self.assertEqual(result.imported, 1)
+        self.assertEqual([error.split(':')[0] for error in result.errors], ['Строка 2', 'Строка 4'])
+        # без dry_run созданные строки только считаются
+        self.assertEqual(result.changes, [])
+
+    def test_preview_view(self):
+        import io
+        import tempfile
+
+        import pandas as pd
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+
+        buffer = io.BytesIO()
+        pd.DataFrame([{'МЦ номер': 'MC002', 'Тип': 'мышь', 'Статус': 'сломан'}]).to_excel(buffer, index=False)
+        with tempfile.TemporaryDirectory() as folder, override_settings(EXCEL_FOLDER=folder):
+            with self.captureOnCommitCallbacks(execute=False):
+                self.client.post('/equipment/import/', {
+                    'excel_file': SimpleUploadedFile('inventory.xlsx', buffer.getvalue()),
+                    'mode': 'upsert', 'dry_run': '1',
+                })
+            job = run_job(ExcelJob.objects.get().pk)
+
+        response = self.client.get(f'/export/jobs/{job.pk}/')
+        self.assertContains(response, 'Статус: На складе → Сломан')
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.status, 'available')
+
+
+class WorkbookImportTest(TestCase):
+    """Импорт книги с листом на площадку: разбор листов в пуле процессов"""
+
+    def setUp(self):
+        import os
+        import tempfile
+
+        from openpyxl import Workbook
+
+        cache.clear()
+        Department.objects.create(name='Филиал Север')
+        workbook = Workbook()
+        north = workbook.active
+        north.title = 'Север'
+        north.append(['МЦ номер', 'Тип', 'Отдел'])
+        for i in range(3):
+            north.append([f'N{i}', 'ноутбук', 'Филиал Север'])
+        south = workbook.create_sheet('Юг')
+        south.append(['МЦ номер', 'Тип'])
+        south.append(['S1', 'мышь'])
+        south.append(['X' * 30, 'мышь'])
+        south.append(['N0', 'монитор'])
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.path = os.path.join(self.folder.name, 'regions.xlsx')
+        workbook.save(self.path)
+
+    def _check(self, result):
+        self.assertEqual((result.processed, result.imported), (6, 4))
+        self.assertEqual(result.errors, [
+            'Лист «Юг», строка 3: МЦ номер: длина больше 20 символов',
+            'Лист «Юг», строка 4: номер МЦ N0 повторяется в файле',
+        ])
+        self.assertEqual(Equipment.objects.filter(assigned_department__name='Филиал Север').count(), 3)
+
+    def test_inline(self):
+        from .importer import import_workbook
+
+        self._check(import_workbook(self.path, upsert=True, workers=0))
+
+    def test_process_pool(self):
+        from .importer import import_workbook
+
+        sheets = []
+        result = import_workbook(self.path, upsert=True, workers=2,
+                                 progress=lambda r: sheets.append(r.processed))
+        self.assertEqual(sheets, [3, 6])
+        self._check(result)
+
+
+class SnapshotTest(TestCase):
+    """Ежедневные снимки оборудования и отчеты по ним без обращения к базе"""
+
+    def setUp(self):
+        import tempfile
+
+        from django.test import override_settings
+
+        from employees.models import Employee
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        override = override_settings(EXCEL_FOLDER=self.folder.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.it = Department.objects.create(name='ИТ')
+        self.sales = Department.objects.create(name='Продажи')
+        self.employee = Employee.objects.create(last_name='Козлов', first_name='Олег', department=self.it)
+
+    @unittest.skipIf(snapshots.pyarrow is None, 'pyarrow не установлен')
+    def test_snapshot_reads_only_requested_columns(self):
+        from datetime import date
+
+        from .snapshots import build_frame, load_snapshots, write_snapshot
+
+        Equipment.objects.create(mc_number='S1', type='laptop', status='issued', assigned_to=self.employee)
+        Equipment.objects.create(mc_number='S2', type='laptop', status='issued', assigned_to=self.employee,
+                                 assigned_department=self.sales)
+        with self.assertNumQueries(3):
+            frame = build_frame()
+        self.assertEqual(list(frame['department']), ['ИТ', 'Продажи'])
+        self.assertEqual(list(frame['employee']), ['Козлов Олег', 'Козлов Олег'])
+
+        write_snapshot(date(2024, 1, 31), frame)
+        with self.assertNumQueries(0):
+            loaded = load_snapshots(['mc_number'])
+        self.assertEqual(list(loaded.columns), ['snapshot_date', 'mc_number'])
+        self.assertEqual(list(loaded['mc_number']), ['S1', 'S2'])
+        with self.assertRaises(ValueError):
+            load_snapshots(['notes'])
+
+    @unittest.skipIf(snapshots.pyarrow is None, 'pyarrow не установлен')
+    def test_monthly_trend_uses_last_snapshot_of_month(self):
+        from datetime import date
+
+        from .snapshots import trend, write_snapshot
+
+        laptop = Equipment.objects.create(mc_number='T1', type='laptop', status='available')
+        write_snapshot(date(2024, 1, 10))
+        laptop.status, laptop.assigned_to = 'issued', self.employee
+        laptop.save()
+        write_snapshot(date(2024, 1, 31))
+        Equipment.objects.create(mc_number='T2', type='laptop', status='issued', assigned_department=self.sales)
+        Equipment.objects.create(mc_number='T3', type='mouse', status='issued', assigned_department=self.sales)
+        write_snapshot(date(2024, 2, 29))
+        write_snapshot(date(2024, 3, 1))
+
+        with self.assertNumQueries(0):
+            counts = trend(['department'], date(2024, 1, 1), date(2024, 2, 29), type='laptop', status='issued')
+        self.assertEqual(
+            [tuple(row) for row in counts.itertuples(index=False)],
+            [('2024-01', 'ИТ', 1), ('2024-02', 'ИТ', 1), ('2024-02', 'Продажи', 1)],
+        )
+        self.assertEqual(list(trend(period='year')['count']), [3])
+
+
+    @unittest.skipIf(snapshots.pyarrow is None, 'pyarrow не установлен')
+    def test_report_without_department(self):
+        from datetime import date
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        Equipment.objects.create(mc_number='R1', type='laptop', status='issued', assigned_to=self.employee)
+        Equipment.objects.create(mc_number='R2', type='laptop', status='issued')
+        snapshots.write_snapshot(date(2024, 1, 31))
+
+        out = StringIO()
+        call_command('snapshot_equipment', report='laptop', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['2024-01  ИТ: 1', '2024-01  Без отдела: 1'])
+
+    def test_pyarrow_required(self):
+        import os
+        from datetime import date
+        from unittest import mock
+
+        from django.core.exceptions import ImproperlyConfigured
+        from django.core.management import CommandError, call_command
+
+        with mock.patch.object(snapshots, 'pyarrow', None):
+            with self.assertRaises(ImproperlyConfigured):
+                snapshots.write_snapshot(date(2024, 1, 31))
+            with self.assertRaisesMessage(CommandError, 'pyarrow'):
+                call_command('snapshot_equipment')
+        self.assertEqual(os.listdir(snapshots.snapshot_folder()), [])
+
+    @unittest.skipIf(snapshots.pyarrow is None, 'pyarrow не установлен')
+    def test_only_parquet_files_are_read(self):
+        import os
+
+        # файл другого формата в папке снимков (например, загруженный пользователем) не читается
+        open(os.path.join(snapshots.snapshot_folder(), 'equipment_2024-01-31.columns.zip'), 'wb').close()
+        self.assertEqual(snapshots.list_snapshots(), [])
+
+
+class EquipmentDetailTest(TestCase):
+    """Страница оборудования: история страницей и общее количество одним запросом"""
+
+    def test_query_count_does_not_grow_with_history(self):
+        from datetime import date, timedelta
+
+        from employees.models import Employee
+        from history.models import EquipmentHistory
+
+        department = Department.objects.create(name='Склад')
+        employee = Employee.objects.create(last_name='Орлов', first_name='Иван', department=department)
+        laptop = Equipment.objects.create(mc_number='D1', type='laptop', assigned_to=employee,
+                                          assigned_department=department)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/equipment/{laptop.pk}/')
+        self.assertEqual(response.context['history_total'], 0)
+        self.assertContains(response, 'История отсутствует')
+
+        EquipmentHistory.objects.bulk_create(
+            EquipmentHistory(equipment=laptop, employee=employee, date=date(2024, 1, 1) + timedelta(days=i))
+            for i in range(12)
+        )
+        with self.assertNumQueries(2):  # оборудование со связями, страница истории с количеством
+            response = self.client.get(f'/equipment/{laptop.pk}/')
+            [str(record) for record in response.context['history']]
+        self.assertEqual([record.date for record in response.context['history']][:2],
+                         [date(2024, 1, 12), date(2024, 1, 11)])
+        self.assertContains(response, 'Вся история (12)')
+
+
+class OffboardingTest(TestCase):
+    """Массовое увольнение: оборудование и история без запросов на каждую единицу"""
+
+    def setUp(self):
+        from employees.models import Employee
+
+        cache.clear()
+        self.warehouse = Department.objects.create(name='Склад')
+        self.employees = []
+        for i in range(50):
+            employee = Employee.objects.create(last_name=f'Уходящий{i:02d}', first_name='Тест')
+            Equipment.objects.create(mc_number=f'O{i}-1', type='laptop', status='issued', assigned_to=employee)
+            Equipment.objects.create(mc_number=f'O{i}-2', type='mouse', status='broken', assigned_to=employee)
+            self.employees.append(employee)
+        self.stays = Employee.objects.create(last_name='Остается', first_name='Тест')
+        Equipment.objects.create(mc_number='KEEP', type='laptop', status='issued', assigned_to=self.stays)
+
+    def test_return_to_stock(self):
+        from history.models import EquipmentHistory
+        from .bulk import offboard_employees
+
+        # выборка, UPDATE оборудования, bulk_create истории, UPDATE сотрудников (+ savepoint), версия данных
+        with self.assertNumQueries(7):
+            result = offboard_employees(self.employees, created_by='admin')
+        self.assertEqual(result, (50, 100, 100))
+
+        returned = Equipment.objects.filter(mc_number__startswith='O')
+        self.assertFalse(returned.filter(assigned_to__isnull=False).exists())
+        self.assertEqual(set(returned.values_list('status', flat=True)), {'available', 'broken'})
+        self.assertEqual(Equipment.objects.get(mc_number='KEEP').assigned_to, self.stays)
+
+        record = EquipmentHistory.objects.get(equipment__mc_number='O7-1')
+        self.assertEqual((record.action, record.employee, record.created_by), ('return', self.employees[7], 'admin'))
+        self.assertEqual(EquipmentHistory.objects.count(), 100)
+        self.assertEqual(
+            sorted(type(self.stays).objects.filter(is_active=True).values_list('last_name', flat=True)),
+            ['Остается'],
+        )
+
+    def test_admin_action_moves_to_department(self):
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        response = self.client.post('/admin/employees/employee/', {
+            'action': 'offboard',
+            'department': self.warehouse.pk,
+            '_selected_action': [employee.pk for employee in self.employees[:2]],
+        }, follow=True)
+        self.assertContains(response, 'Уволено сотрудников: 2; оборудования в отдел «Склад»: 4')
+        moved = Equipment.objects.filter(assigned_department=self.warehouse)
+        self.assertEqual(sorted(moved.values_list('mc_number', 'status')),
+                         [('O0-1', 'issued'), ('O0-2', 'broken'), ('O1-1', 'issued'), ('O1-2', 'broken')])
+
+
+class TransferTest(TestCase):
+    """Передача оборудования между отделами: один UPDATE, история, конфликты по updated_at"""
+
+    def setUp(self):
+        from employees.models import Employee
+
+        cache.clear()
+        self.old = Department.objects.create(name='Старый отдел')
+        self.new = Department.objects.create(name='Новый отдел')
+        self.holder = Employee.objects.create(last_name='Белов', first_name='Петр', department=self.old)
+        for i in range(30):
+            Equipment.objects.create(mc_number=f'T{i:02d}', type='monitor', status='issued',
+                                     assigned_department=self.old, assigned_to=self.holder if i == 0 else None)
+        Equipment.objects.create(mc_number='OTHER', type='monitor', status='issued')
+
+    def test_transfer_by_filter_spec(self):
+        from history.models import EquipmentHistory
+        from .bulk import transfer_equipment
+        from .filters import EquipmentFilter
+
+        # выборка, UPDATE, имена отделов и сотрудников для истории, bulk_create (+ savepoint), версия данных
+        with self.assertNumQueries(8):
+            result = transfer_equipment(EquipmentFilter(assigned_department=self.old.pk), self.new, created_by='admin')
+        self.assertEqual((result.equipment, result.history, result.conflicts), (30, 30, []))
+        self.assertEqual(Equipment.objects.filter(assigned_department=self.new, assigned_to=None).count(), 30)
+        self.assertIsNone(Equipment.objects.get(mc_number='OTHER').assigned_department)
+
+        record = EquipmentHistory.objects.get(equipment__mc_number='T00')
+        self.assertEqual((record.action, record.employee), ('transfer', self.holder))
+        self.assertEqual(record.notes, 'отдел «Старый отдел», Белов Петр → отдел «Новый отдел»')
+        self.assertIsNone(EquipmentHistory.objects.get(equipment__mc_number='T05').employee)
+
+    def test_rows_changed_after_as_of_are_conflicts(self):
+        from .bulk import transfer_equipment
+
+        as_of = timezone.now()
+        changed = Equipment.objects.get(mc_number='T03')
+        changed.notes = 'изменено другим пользователем'
+        changed.save()
+
+        ids = Equipment.objects.filter(mc_number__in=['T01', 'T02', 'T03']).values_list('pk', flat=True)
+        result = transfer_equipment(list(ids), self.new, as_of=as_of)
+        self.assertEqual(result.equipment, 2)
+        self.assertEqual(result.conflicts, [(changed.pk, 'T03')])
+        changed.refresh_from_db()
+        self.assertEqual(changed.assigned_department, self.old)
+
+    def test_admin_action(self):
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        page = self.client.get('/admin/equipments/equipment/')
+        self.assertContains(page, 'name="as_of"')
 
-# Create your tests here.
+        items = Equipment.objects.filter(mc_number__in=['T01', 'T02'])
+        response = self.client.post('/admin/equipments/equipment/', {
+            'action': 'transfer',
+            'department': self.new.pk,
+            'employee': self.holder.pk,
+            'as_of': timezone.now().isoformat(),
+            '_selected_action': [item.pk for item in items],
+        }, follow=True)
+        self.assertContains(response, 'Передано единиц оборудования: 2')
+        self.assertEqual(
+            sorted(items.values_list('mc_number', 'assigned_department', 'assigned_to')),
+            [('T01', self.new.pk, self.holder.pk), ('T02', self.new.pk, self.holder.pk)],
+        )
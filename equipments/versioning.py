@@ -0,0 +1,75 @@
+# equipments/versioning.py
+"""
+Версии данных моделей для инвалидации кэша.
+
+Каждая модель имеет счетчик в БД (DataVersion), который увеличивается
+после коммита save/delete (сигналы) и явно после массовых операций
+(update(), bulk_create()), которые сигналов не посылают. Версия входит в
+ключи кэша: после записи старые записи кэша просто перестают читаться.
+
+Счетчик хранится в БД, а не в кэше Django: он общий для всех процессов
+сервера (кэш по умолчанию - LocMem, свой в каждом процессе) и переживает
+перезапуск, поэтому годится и для кэша в памяти, и для файлов экспорта
+на диске. Версии всех нужных моделей читаются одним запросом.
+
+Из сигналов версия увеличивается в transaction.on_commit: пока
+транзакция не закоммичена, параллельный запрос не должен получить новую
+версию и закэшировать под ней старые данные.
+"""
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+
+def data_version(*models):
+    """Текущая версия данных одной или нескольких моделей ("3.1.7") - одним запросом"""
+    from .models import DataVersion
+
+    labels = [model._meta.label_lower for model in models]
+    values = dict(DataVersion.objects.filter(label__in=labels).values_list('label', 'version'))
+    return '.'.join(str(values.get(label, 0)) for label in labels)
+
+
+def bump_data_version(*models):
+    """
+    Увеличивает версии одним UPDATE; недостающие строки создаются.
+    Вызывать после массовых изменений без сигналов (после их транзакции).
+    """
+    from .models import DataVersion
+
+    labels = [model._meta.label_lower for model in models]
+    rows = DataVersion.objects.filter(label__in=labels)
+    if rows.update(version=F('version') + 1) == len(labels):
+        return
+    existing = set(rows.values_list('label', flat=True))
+    try:
+        with transaction.atomic():
+            DataVersion.objects.bulk_create([DataVersion(label=label, version=1) for label in labels if label not in existing])
+    except IntegrityError:
+        # строку создал параллельный запрос - увеличиваем ее
+        DataVersion.objects.filter(label__in=labels).exclude(label__in=existing).update(version=F('version') + 1)
+
+
+def versioned_key(key, *models, version=None):
+    """
+    Ключ кэша, привязанный к версии данных моделей. version - уже
+    прочитанная data_version(*models), чтобы не читать ее повторно.
+    """
+    if version is None:
+        version = data_version(*models)
+    return f'{key}:v{version}'
+
+
+def _bump_on_signal(sender, **kwargs):
+    transaction.on_commit(partial(bump_data_version, sender))
+
+
+def track_models(*models):
+    """Подключает увеличение версии к post_save/post_delete моделей"""
+    from django.db.models.signals import post_delete, post_save
+
+    for model in models:
+        uid = f'data_version_{model._meta.label_lower}'
+        post_save.connect(_bump_on_signal, sender=model, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_bump_on_signal, sender=model, dispatch_uid=f'{uid}_delete')
@@ -1,3 +1,10 @@
+# excel_export/admin.py
 from django.contrib import admin
+from .models import ExcelJob
 
-# Register your models here.
+@admin.register(ExcelJob)
+class ExcelJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'target', 'status', 'original_name', 'processed', 'inserted', 'updated', 'failed', 'created_at']
+    list_filter = ['kind', 'target', 'status']
+    search_fields = ['original_name', 'message']
+    date_hierarchy = 'created_at'
@@ -1,5 +1,14 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 
 
 class ExcelExportConfig(AppConfig):
     name = 'excel_export'
+
+    def ready(self):
+        from equipments.versioning import track_models
+        # Версии данных для файла полной инвентаризации (см. export_cache.export_models)
+        track_models(
+            apps.get_model('history', 'EquipmentHistory'),
+            apps.get_model('network', 'NetworkEquipment'),
+            apps.get_model('network', 'Location'),
+        )
@@ -0,0 +1,110 @@
+# excel_export/export_cache.py
+"""
+Дисковый кэш готовых файлов экспорта.
+
+Файл кладется в EXCEL_FOLDER/export_cache под именем из ключа фильтра и
+версии данных Equipment, Employee и Department в БД
+(equipments.versioning.data_version): любая запись в эти модели меняет
+версию, и старые файлы просто перестают находиться. Версия хранится в
+БД, а не в кэше Django, поэтому после перезапуска и в других процессах
+сервера старый файл не будет отдан вместо нового. Попадание отдается FileResponse без запроса к БД. Размер
+кэша ограничен EXPORT_CACHE_MAX_BYTES: при превышении удаляются файлы,
+которые дольше всех не отдавались (LRU по mtime, он обновляется при
+каждом попадании).
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse
+
+EXPORT_CACHE_MAX_BYTES = getattr(settings, 'EXPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+def cache_folder():
+    folder = os.path.join(settings.EXCEL_FOLDER, 'export_cache')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def export_models():
+    """Модели, от данных которых зависят файлы экспорта (версия - одним запросом на все)"""
+    from employees.models import Department, Employee
+    from equipments.models import Equipment
+    from history.models import EquipmentHistory
+    from network.models import Location, NetworkEquipment
+    return Equipment, Employee, Department, EquipmentHistory, NetworkEquipment, Location
+
+
+def cache_path(key, extension='xlsx'):
+    """Путь файла для ключа фильтра с учетом текущей версии данных в БД"""
+    from equipments.versioning import versioned_key
+
+    digest = hashlib.md5(versioned_key(key, *export_models()).encode('utf-8')).hexdigest()
+    return os.path.join(cache_folder(), f'{digest}.{extension}')
+
+
+def get_or_create(key, write, extension='xlsx'):
+    """
+    Путь к готовому файлу: из кэша или созданному write(file).
+    Файл пишется во временный и переименовывается атомарно - параллельный
+    запрос никогда не увидит недописанный файл.
+    """
+    path = cache_path(key, extension)
+    if os.path.exists(path):
+        try:
+            os.utime(path)  # отметка последнего использования для LRU
+            return path
+        except FileNotFoundError:
+            pass  # файл вытеснен между проверкой и utime
+
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            write(file)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    evict(keep=path)
+    return path
+
+
+def evict(max_bytes=None, keep=None):
+    """Удаляет давно не использованные файлы, пока кэш больше max_bytes"""
+    max_bytes = EXPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    folder = cache_folder()
+    entries = []
+    for name in os.listdir(folder):
+        if name.endswith('.tmp'):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cached_file_response(key, write, filename, content_type, extension='xlsx'):
+    """FileResponse с файлом из кэша (или только что созданным)"""
+    try:
+        file = open(get_or_create(key, write, extension), 'rb')
+    except FileNotFoundError:
+        # файл вытеснен другим запросом между созданием и открытием
+        file = open(get_or_create(key, write, extension), 'rb')
+    return FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
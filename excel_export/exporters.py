@@ -0,0 +1,345 @@
+# excel_export/exporters.py
+"""
+Экспорт оборудования, сотрудников и полной инвентаризации с постоянным
+расходом памяти.
+
+Строки читаются через values_list().iterator(chunk_size=...) - без
+создания моделей и без загрузки всей выборки в память, и сразу пишутся
+в книгу openpyxl в режиме write-only (строки уходят в файл на диске,
+а не копятся в памяти). Готовый файл кладется в дисковый кэш
+(export_cache) и отдается FileResponse (StreamingHttpResponse) кусками.
+CSV и JSON Lines отдаются построчно прямо из того же курсора, без
+книги. Колонки экспорта описаны здесь один раз для всех мест, откуда
+запускается экспорт.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+
+from .export_cache import cached_file_response
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Строк за одно обращение к курсору БД
+EXPORT_CHUNK_SIZE = 2000
+
+EQUIPMENT_HEADER = [
+    'МЦ номер', 'Тип', 'Марка', 'Модель', 'Статус', 'Сотрудник',
+    'Отдел (сотрудника)', 'Закреплено за отделом', 'Дата добавления', 'Примечания',
+]
+
+EQUIPMENT_FIELDS = (
+    'mc_number', 'type', 'brand', 'model', 'status',
+    'assigned_to__last_name', 'assigned_to__first_name', 'assigned_to__middle_name',
+    'assigned_to__department__name', 'assigned_department__name', 'created_at', 'notes',
+)
+
+# Листы полной инвентаризации (model=inventory), в порядке записи
+INVENTORY_HEADERS = {
+    'departments': ['ID', 'Название', 'Короткое название'],
+    'employees': ['ID', 'Фамилия', 'Имя', 'Отчество', 'Отдел', 'Должность', 'Статус'],
+    'equipment': [
+        'ID', 'МЦ номер', 'Тип', 'Марка', 'Модель', 'Статус', 'Сотрудник',
+        'Отдел (сотрудника)', 'Закреплено за отделом', 'Дата добавления', 'Примечания',
+    ],
+    'history': ['ID', 'Дата', 'Оборудование', 'Действие', 'Сотрудник', 'Примечания', 'Кем внесено'],
+    'network': [
+        'ID', 'Название', 'Тип', 'Модель', 'Серийный номер', 'Инвентарный номер', 'Местонахождение',
+        'Стойка', 'Юнит', 'IP-адрес', 'MAC-адрес', 'Статус', 'Примечания',
+    ],
+}
+
+EMPLOYEE_HEADER = ['Фамилия', 'Имя', 'Отчество', 'Отдел', 'Должность', 'Количество оборудования', 'Статус']
+
+
+def _status_choices():
+    from equipments.models import Equipment
+    return Equipment.STATUS_CHOICES
+
+
+def employee_header():
+    """Заголовок экспорта сотрудников: после общего количества - по колонке на статус оборудования"""
+    return EMPLOYEE_HEADER[:6] + [f'Оборудование: {label}' for _, label in _status_choices()] + EMPLOYEE_HEADER[6:]
+
+
+def equipment_rows(queryset):
+    """Строки экспорта оборудования (одним запросом, пачками по EXPORT_CHUNK_SIZE)"""
+    from equipments.models import Equipment
+
+    type_labels = dict(Equipment.TYPE_CHOICES)
+    status_labels = dict(Equipment.STATUS_CHOICES)
+    rows = queryset.values_list(*EQUIPMENT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for (mc_number, type_, brand, model, status, last_name, first_name, middle_name,
+         employee_department, assigned_department, created_at, notes) in rows:
+        yield [
+            mc_number or 'Без МЦ',
+            type_labels.get(type_, type_),
+            brand or '',
+            model or '',
+            status_labels.get(status, status),
+            f"{last_name} {first_name} {middle_name}".strip() if last_name is not None else '',
+            employee_department or '',
+            assigned_department or '',
+            created_at.strftime('%d.%m.%Y') if created_at else '',
+            notes or '',
+        ]
+
+
+def employee_queryset(department=None):
+    """Работающие сотрудники с тем же фильтром по отделу, что и в employee_list"""
+    from employees.models import Employee
+
+    employees = Employee.objects.filter(is_active=True)
+    if department:
+        employees = employees.filter(department_id=department)
+    return employees
+
+
+def employee_rows(queryset):
+    """
+    Строки экспорта сотрудников одним запросом: количество оборудования
+    (всего и по статусам) считается через annotate, а не запросом на сотрудника.
+    """
+    from django.db.models import Count, Q
+
+    statuses = [value for value, _ in _status_choices()]
+    annotations = {'equipment_count': Count('assigned_equipment')}
+    for value in statuses:
+        annotations[f'equipment_{value}'] = Count('assigned_equipment', filter=Q(assigned_equipment__status=value))
+
+    rows = queryset.annotate(**annotations).values_list(
+        'last_name', 'first_name', 'middle_name', 'department__name', 'position', 'is_active',
+        'equipment_count', *(f'equipment_{value}' for value in statuses),
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for last_name, first_name, middle_name, department, position, is_active, equipment_count, *by_status in rows:
+        yield [
+            last_name,
+            first_name,
+            middle_name or '',
+            department or '',
+            position or '',
+            equipment_count,
+            *by_status,
+            'Работает' if is_active else 'Уволен',
+        ]
+
+
+def write_xlsx(file, sheets, progress=None):
+    """
+    Пишет книгу в режиме write-only: sheets - [(название листа, заголовок, строки)],
+    строки могут быть генератором - в памяти держится только текущая строка.
+    progress(записано строк) вызывается каждые EXPORT_CHUNK_SIZE строк.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    written = 0
+    for title, header, rows in sheets:
+        worksheet = workbook.create_sheet(title=title)
+        worksheet.append(header)
+        for row in rows:
+            worksheet.append(row)
+            written += 1
+            if progress and written % EXPORT_CHUNK_SIZE == 0:
+                progress(written)
+    workbook.save(file)
+    if progress:
+        progress(written)
+
+
+def export_filename(prefix, extension='xlsx'):
+    return f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+
+def equipment_sheets(spec):
+    return [('Оборудование', EQUIPMENT_HEADER, equipment_rows(spec.queryset(related=())))]
+
+
+def employee_sheets(department=None):
+    return [('Сотрудники', employee_header(), employee_rows(employee_queryset(department)))]
+
+
+def _date(value, fmt='%d.%m.%Y'):
+    return value.strftime(fmt) if value else ''
+
+
+def inventory_sheets():
+    """
+    Полная инвентаризация: лист на модель, по одному проходу
+    values_list().iterator() на таблицу и без JOIN. Названия связанных
+    записей берутся из словарей id -> название: отделы и места загружаются
+    заранее, сотрудники и оборудование запоминаются при записи своих
+    листов (листы пишутся по порядку, поэтому к листам истории словари
+    уже заполнены). В памяти - только эти словари, не строки.
+    """
+    from employees.models import Department, Employee
+    from equipments.models import Equipment
+    from history.models import EquipmentHistory
+    from network.models import Location, NetworkEquipment
+
+    departments = {}
+    employees = {}  # id -> (ФИО, id отдела)
+    equipment = {}
+
+    def department_rows():
+        rows = Department.objects.order_by('name').values_list('id', 'name', 'short_name')
+        for pk, name, short_name in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            departments[pk] = name
+            yield [pk, name, short_name or '']
+
+    def employee_rows():
+        rows = Employee.objects.order_by('last_name', 'first_name').values_list(
+            'id', 'last_name', 'first_name', 'middle_name', 'department_id', 'position', 'is_active',
+        )
+        for pk, last_name, first_name, middle_name, department_id, position, is_active in rows.iterator(
+                chunk_size=EXPORT_CHUNK_SIZE):
+            employees[pk] = (f"{last_name} {first_name} {middle_name or ''}".strip(), department_id)
+            yield [
+                pk, last_name, first_name, middle_name or '', departments.get(department_id, ''),
+                position or '', 'Работает' if is_active else 'Уволен',
+            ]
+
+    def equipment_rows():
+        type_labels = dict(Equipment.TYPE_CHOICES)
+        status_labels = dict(Equipment.STATUS_CHOICES)
+        rows = Equipment.objects.order_by('id').values_list(
+            'id', 'mc_number', 'type', 'brand', 'model', 'status', 'assigned_to_id',
+            'assigned_department_id', 'created_at', 'notes',
+        )
+        for (pk, mc_number, type_, brand, model, status, employee_id, department_id,
+             created_at, notes) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            equipment[pk] = mc_number or 'Без МЦ'
+            employee, employee_department = employees.get(employee_id, ('', None))
+            yield [
+                pk, equipment[pk], type_labels.get(type_, type_), brand or '', model or '',
+                status_labels.get(status, status), employee, departments.get(employee_department, ''),
+                departments.get(department_id, ''), _date(created_at), notes or '',
+            ]
+
+    def history_rows():
+        action_labels = dict(EquipmentHistory.ACTION_CHOICES)
+        rows = EquipmentHistory.objects.order_by('date', 'id').values_list(
+            'id', 'date', 'equipment_id', 'action', 'employee_id', 'notes', 'created_by',
+        )
+        for pk, date, equipment_id, action, employee_id, notes, created_by in rows.iterator(
+                chunk_size=EXPORT_CHUNK_SIZE):
+            yield [
+                pk, _date(date), equipment.get(equipment_id, ''), action_labels.get(action, action),
+                employees.get(employee_id, ('',))[0], notes or '', created_by or '',
+            ]
+
+    def network_rows():
+        locations = dict(Location.objects.values_list('id', 'name'))
+        type_labels = dict(NetworkEquipment.TYPE_CHOICES)
+        status_labels = dict(NetworkEquipment.STATUS_CHOICES)
+        rows = NetworkEquipment.objects.order_by('name', 'id').values_list(
+            'id', 'name', 'type', 'model', 'serial_number', 'inventory_number', 'location_id',
+            'rack', 'unit', 'ip_address', 'mac_address', 'status', 'notes',
+        )
+        for (pk, name, type_, model, serial_number, inventory_number, location_id, rack, unit,
+             ip_address, mac_address, status, notes) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [
+                pk, name, type_labels.get(type_, type_), model or '', serial_number or '',
+                inventory_number or '', locations.get(location_id, ''), rack, unit, ip_address or '',
+                mac_address or '', status_labels.get(status, status), notes or '',
+            ]
+
+    return [
+        ('Отделы', INVENTORY_HEADERS['departments'], department_rows()),
+        ('Сотрудники', INVENTORY_HEADERS['employees'], employee_rows()),
+        ('Оборудование', INVENTORY_HEADERS['equipment'], equipment_rows()),
+        ('История', INVENTORY_HEADERS['history'], history_rows()),
+        ('Сетевое оборудование', INVENTORY_HEADERS['network'], network_rows()),
+    ]
+
+
+def export_params(model, request):
+    """Параметры фильтра экспорта из запроса в каноническом виде (для ключа и фоновой задачи)"""
+    if model == 'equipment':
+        from equipments.filters import EquipmentFilter
+        return EquipmentFilter.from_request(request).as_dict()
+    if model == 'employee':
+        return {'department': str(request.GET.get('department') or '').strip()}
+    if model == 'inventory':
+        return {}
+    raise ValueError(f"неизвестный тип модели '{model}'")
+
+
+def export_spec(model, params):
+    """
+    Экспорт model по параметрам фильтра: (ключ кэша, sheets() -> [(лист,
+    заголовок, строки)], префикс имени файла). Одно описание для xlsx,
+    csv/jsonl и фоновых задач - фильтры и колонки везде одинаковые.
+    """
+    if model == 'equipment':
+        from equipments.filters import EquipmentFilter
+
+        spec = EquipmentFilter(**params)
+        return spec.cache_key('equipment_export'), lambda: equipment_sheets(spec), 'equipment_export'
+    if model == 'employee':
+        department = params.get('department') or None
+        return f'employee_export:{department or ""}', lambda: employee_sheets(department), 'employees_export'
+    if model == 'inventory':
+        return 'inventory_export', inventory_sheets, 'inventory_export'
+    raise ValueError(f"неизвестный тип модели '{model}'")
+
+
+def xlsx_writer(sheets):
+    """write(file, progress=None) для дискового кэша и фоновых задач"""
+    return lambda file, progress=None: write_xlsx(file, sheets(), progress)
+
+
+def export_response(model, params):
+    """Файл экспорта из дискового кэша (или созданный сейчас) в FileResponse"""
+    key, sheets, prefix = export_spec(model, params)
+    return cached_file_response(key, xlsx_writer(sheets), export_filename(prefix), XLSX_CONTENT_TYPE)
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: writerow() возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), ensure_ascii=False) + '\n'
+
+
+# формат -> (генератор строк, content type)
+STREAM_FORMATS = {
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def stream_response(model, params, fmt):
+    """
+    CSV/JSON Lines построчно прямо из курсора БД: без книги openpyxl,
+    без pandas и без промежуточных списков.
+    """
+    _, sheets, prefix = export_spec(model, params)
+    (_, header, rows), = sheets()
+    lines, content_type = STREAM_FORMATS[fmt]
+    response = StreamingHttpResponse(lines(header, rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(prefix, fmt)}"'
+    return response
+
+
+def equipment_xlsx_response(spec):
+    """Экспорт оборудования по EquipmentFilter"""
+    return export_response('equipment', spec.as_dict())
+
+
+def employee_xlsx_response(department=None):
+    """Экспорт сотрудников (фильтр по отделу)"""
+    return export_response('employee', {'department': str(department or '').strip()})
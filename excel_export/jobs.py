@@ -0,0 +1,308 @@
+# excel_export/jobs.py
+"""
+Фоновые задачи импорта/экспорта Excel.
+
+Задача - запись ExcelJob; выполняет ее поток-воркер внутри процесса
+веб-сервера (отдельного брокера очередей в проекте нет), а страница
+задачи опрашивает прогресс из БД. На каждую пару (вид, target) - импорт
+или экспорт целевой модели - в процессе один воркер, поэтому такие
+задачи идут строго по очереди, а экспорт не ждет долгого импорта; между
+процессами очередность обеспечивает проверка в БД: задача не стартует,
+пока у той же пары есть выполняющаяся задача с живым heartbeat
+(зависшие дольше JOB_STALE_AFTER секунд не учитываются).
+
+Очереди воркеров живут в памяти процесса, поэтому после перезапуска
+сервера recover_jobs() (start_recovery() из config/wsgi.py) снова ставит в
+очередь задачи, оставшиеся в статусе queued, и задачи running, у которых
+heartbeat устарел, - их процесс умер. Ожидающая своей очереди задача
+обновляет heartbeat, так что живой считается задача running с heartbeat
+не старше JOB_STALE_AFTER и задача queued с heartbeat (или временем
+создания) не старше JOB_QUEUED_ALIVE.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import ExcelJob
+
+JOB_STALE_AFTER = getattr(settings, 'EXCEL_JOB_STALE_AFTER', 600)
+JOB_WAIT_INTERVAL = 1.0
+# Сколько секунд задача queued без признаков жизни считается ожидающей в воркере
+JOB_QUEUED_ALIVE = getattr(settings, 'EXCEL_JOB_QUEUED_ALIVE', 60)
+# Восстанавливать задачи после перезапуска (выключается в настройках)
+JOB_RECOVERY = getattr(settings, 'EXCEL_JOB_RECOVERY', True)
+JOB_RECOVERY_DELAY = 5.0
+
+logger = logging.getLogger(__name__)
+# Сколько изменений dry-run сохраняется в задаче для предпросмотра
+PREVIEW_LIMIT = 500
+
+_queues = {}
+_queues_lock = threading.Lock()
+_export_jobs_lock = threading.Lock()
+_recovery_started = False
+
+
+def save_upload(uploaded_file, prefix='upload'):
+    """Сохраняет загруженный файл в EXCEL_FOLDER/uploads, возвращает путь"""
+    folder = os.path.join(settings.EXCEL_FOLDER, 'uploads')
+    os.makedirs(folder, exist_ok=True)
+    name = get_valid_filename(os.path.basename(uploaded_file.name)) or 'file'
+    path = os.path.join(
+        folder, f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{uuid.uuid4().hex[:8]}_{name}'
+    )
+    with open(path, 'wb') as f:
+        for chunk in uploaded_file.chunks():
+            f.write(chunk)
+    return path
+
+
+def enqueue(job):
+    """Ставит задачу в очередь воркера ее (вид, target) после коммита транзакции"""
+    transaction.on_commit(lambda: _queue_for(job.kind, job.target).put(job.pk))
+    return job
+
+
+def alive_jobs():
+    """Задачи, которые выполняются или ждут очереди в живом процессе"""
+    now = timezone.now()
+    return ExcelJob.objects.alias(last_seen=Coalesce('heartbeat_at', 'created_at')).filter(
+        Q(status='running', heartbeat_at__gte=now - timedelta(seconds=JOB_STALE_AFTER))
+        | Q(status='queued', last_seen__gte=now - timedelta(seconds=JOB_QUEUED_ALIVE))
+    )
+
+
+def export_job(target, params):
+    """
+    Задача экспорта target с параметрами фильтра. Пока такая же задача
+    (те же фильтры и версия данных) жива (alive_jobs), новые одинаковые
+    запросы получают ее же. Возвращает (задача, создана ли).
+    """
+    from .export_cache import cache_path
+    from .exporters import export_spec
+
+    key = os.path.splitext(os.path.basename(cache_path(export_spec(target, params)[0])))[0]
+    with _export_jobs_lock:
+        job = alive_jobs().filter(kind='export', target=target, key=key).first()
+        if job is not None:
+            return job, False
+        job = ExcelJob.objects.create(kind='export', target=target, key=key, options={'params': params})
+    enqueue(job)
+    return job, True
+
+
+def _queue_for(kind, target):
+    with _queues_lock:
+        if (kind, target) not in _queues:
+            _queues[kind, target] = queue.Queue()
+            threading.Thread(
+                target=_worker, args=(_queues[kind, target],), name=f'excel-jobs-{kind}-{target}', daemon=True,
+            ).start()
+        return _queues[kind, target]
+
+
+def _worker(jobs):
+    while True:
+        pk = jobs.get()
+        try:
+            run_job(pk)
+        except Exception:
+            # ошибки обработчика run_job сам записывает в задачу; сюда попадают
+            # сбои самого воркера (БД недоступна и т.п.) - воркер должен жить дальше
+            logger.exception('Сбой воркера фоновых задач Excel на задаче %s', pk)
+        finally:
+            close_old_connections()
+
+
+def recover_jobs():
+    """
+    Ставит в очередь задачи, потерянные с перезапуском процесса: все
+    queued и running с устаревшим heartbeat (они снова становятся queued).
+    Возвращает число поставленных задач. Задачу, попавшую в очереди
+    нескольких процессов, выполнит один - тот, чей claim_job успеет первым.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=JOB_STALE_AFTER)
+    jobs = list(ExcelJob.objects.filter(status='queued').order_by('id'))
+    ExcelJob.objects.filter(pk__in=[job.pk for job in jobs]).update(heartbeat_at=now)
+    for job in ExcelJob.objects.filter(status='running', heartbeat_at__lt=stale).order_by('id'):
+        # условие по heartbeat - чтобы из нескольких процессов задачу вернул в очередь один
+        if ExcelJob.objects.filter(pk=job.pk, status='running', heartbeat_at__lt=stale).update(
+            status='queued', heartbeat_at=now,
+        ):
+            job.status = 'queued'
+            jobs.append(job)
+    for job in jobs:
+        enqueue(job)
+    return len(jobs)
+
+
+def _recover_in_background():
+    try:
+        count = recover_jobs()
+    except DatabaseError:
+        # таблицы еще нет (сервер запущен до migrate) - восстанавливать нечего
+        logger.exception('Не удалось восстановить фоновые задачи Excel')
+        return
+    finally:
+        close_old_connections()
+    if count:
+        logger.info('Восстановлено фоновых задач Excel: %s', count)
+
+
+def start_recovery():
+    """
+    Восстановление задач после запуска сервера: сразу и еще раз через
+    JOB_STALE_AFTER - задачи running, heartbeat которых на момент запуска
+    еще не устарел, тоже могли потерять процесс.
+
+    Вызывается из точки входа веб-сервера (config/wsgi.py, config/asgi.py),
+    а не из AppConfig.ready(): Django настраивают и команды manage.py, и
+    тесты, и процессы разбора листов импорта - им восстанавливать и
+    выполнять чужие задачи нельзя. Повторный вызов в процессе ничего не делает.
+    """
+    global _recovery_started
+    with _queues_lock:
+        if _recovery_started or not JOB_RECOVERY:
+            return
+        _recovery_started = True
+    for delay in (JOB_RECOVERY_DELAY, JOB_RECOVERY_DELAY + JOB_STALE_AFTER):
+        timer = threading.Timer(delay, _recover_in_background)
+        timer.daemon = True
+        timer.start()
+
+
+def update_progress(job, **fields):
+    """Сохраняет счетчики задачи одним UPDATE (без перезаписи остальных полей)"""
+    fields['heartbeat_at'] = timezone.now()
+    ExcelJob.objects.filter(pk=job.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def claim_job(job):
+    """
+    Переводит задачу в running, если у ее вида и target нет другой
+    выполняющейся задачи. True - задачу можно выполнять.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        busy = ExcelJob.objects.filter(
+            kind=job.kind, target=job.target, status='running', heartbeat_at__gte=now - timedelta(seconds=JOB_STALE_AFTER),
+        ).exclude(pk=job.pk).exists()
+        if busy:
+            return False
+        claimed = ExcelJob.objects.filter(pk=job.pk, status='queued').update(
+            status='running', started_at=now, heartbeat_at=now,
+        )
+    if claimed:
+        job.status, job.started_at, job.heartbeat_at = 'running', now, now
+    return bool(claimed)
+
+
+def run_job(pk):
+    """Выполняет задачу (в потоке-воркере), дождавшись своей очереди по (вид, target)"""
+    job = ExcelJob.objects.get(pk=pk)
+    claimed = False
+    while job.status == 'queued':
+        claimed = claim_job(job)
+        if claimed:
+            break
+        time.sleep(JOB_WAIT_INTERVAL)
+        # задача ждет очереди - отмечаем, что она жива (см. alive_jobs)
+        ExcelJob.objects.filter(pk=job.pk, status='queued').update(heartbeat_at=timezone.now())
+        job.refresh_from_db(fields=['status'])
+    if not claimed:
+        # задачу уже выполнил или выполняет другой воркер
+        return job
+
+    handler = HANDLERS.get((job.kind, job.target))
+    try:
+        if handler is None:
+            raise ValueError(f'Нет обработчика для задачи {job.kind}:{job.target}')
+        handler(job)
+    except Exception as e:
+        update_progress(job, status='failed', message=str(e), finished_at=timezone.now())
+    else:
+        update_progress(job, status='done', finished_at=timezone.now())
+    return job
+
+
+# --- обработчики ---
+
+def _change_as_dict(change):
+    return {
+        'kind': change.kind,
+        'row_number': change.row_number,
+        'mc_number': change.mc_number,
+        'sheet': change.sheet,
+        'fields': [[label, str(before), str(after)] for label, (before, after) in change.fields.items()],
+    }
+
+
+def run_equipment_import(job):
+    from equipments.importer import import_equipment_file, import_workbook, write_error_report
+
+    def progress(result):
+        update_progress(
+            job,
+            processed=result.processed,
+            inserted=result.imported,
+            updated=result.updated,
+            failed=len(result.failed),
+        )
+
+    options = dict(job.options)
+    if options.pop('all_sheets', False) and job.source_file.lower().endswith('.xlsx'):
+        # книга с листом на площадку: листы разбираются параллельно
+        result = import_workbook(job.source_file, progress=progress, **options)
+    else:
+        with open(job.source_file, 'rb') as file:
+            result = import_equipment_file(file, job.source_file, progress=progress, **options)
+
+    error_file = write_error_report(result.errors, prefix=f'errors_job{job.pk}') if result.errors else ''
+    update_progress(
+        job,
+        processed=result.processed,
+        inserted=result.imported,
+        updated=result.updated,
+        failed=len(result.failed),
+        error_file=error_file,
+        result={
+            'unchanged': result.unchanged,
+            'missing': result.missing,
+            'changes_total': len(result.changes),
+            'changes': [_change_as_dict(change) for change in result.changes[:PREVIEW_LIMIT]],
+        },
+    )
+
+
+def run_export(job):
+    """Пишет файл экспорта в дисковый кэш EXCEL_FOLDER/export_cache"""
+    from .export_cache import get_or_create
+    from .exporters import export_filename, export_spec, xlsx_writer
+
+    key, sheets, prefix = export_spec(job.target, job.options.get('params', {}))
+    write = xlsx_writer(sheets)
+    path = get_or_create(key, lambda file: write(file, progress=lambda written: update_progress(job, processed=written)))
+    update_progress(job, result_file=path, original_name=export_filename(prefix))
+
+
+# (вид, target) -> обработчик(job)
+HANDLERS = {
+    ('import', 'equipment'): run_equipment_import,
+    ('export', 'equipment'): run_export,
+    ('export', 'employee'): run_export,
+    ('export', 'inventory'): run_export,
+}
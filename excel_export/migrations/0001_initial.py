@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcelJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('import', 'Импорт'), ('export', 'Экспорт')], max_length=20, verbose_name='Вид')),
+                ('target', models.CharField(max_length=50, verbose_name='Данные')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка')], db_index=True, default='queued', max_length=20, verbose_name='Статус')),
+                ('source_file', models.CharField(blank=True, max_length=500, verbose_name='Исходный файл')),
+                ('original_name', models.CharField(blank=True, max_length=255, verbose_name='Имя файла')),
+                ('options', models.JSONField(blank=True, default=dict, verbose_name='Параметры')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('inserted', models.PositiveIntegerField(default=0, verbose_name='Создано')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Обновлено')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('error_file', models.CharField(blank=True, max_length=500, verbose_name='Файл ошибок')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='Итог')),
+                ('message', models.TextField(blank=True, verbose_name='Сообщение')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')),
+            ],
+            options={
+                'verbose_name': 'Задача Excel',
+                'verbose_name_plural': 'Задачи Excel',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['target', 'status'], name='excel_expor_target_f7e761_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel_export', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exceljob',
+            name='key',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Ключ'),
+        ),
+        migrations.AddField(
+            model_name='exceljob',
+            name='result_file',
+            field=models.CharField(blank=True, max_length=500, verbose_name='Файл результата'),
+        ),
+    ]
@@ -1,3 +1,59 @@
+# excel_export/models.py
 from django.db import models
 
-# Create your models here.
+
+class ExcelJob(models.Model):
+    """Фоновая задача импорта/экспорта Excel и ее прогресс"""
+
+    KIND_CHOICES = [
+        ('import', 'Импорт'),
+        ('export', 'Экспорт'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Завершена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    kind = models.CharField('Вид', max_length=20, choices=KIND_CHOICES)
+    # Целевая модель: задачи с одним target выполняются строго по очереди
+    target = models.CharField('Данные', max_length=50)
+    status = models.CharField('Статус', max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    source_file = models.CharField('Исходный файл', max_length=500, blank=True)
+    original_name = models.CharField('Имя файла', max_length=255, blank=True)
+    options = models.JSONField('Параметры', default=dict, blank=True)
+
+    processed = models.PositiveIntegerField('Обработано строк', default=0)
+    inserted = models.PositiveIntegerField('Создано', default=0)
+    updated = models.PositiveIntegerField('Обновлено', default=0)
+    failed = models.PositiveIntegerField('Ошибок', default=0)
+
+    error_file = models.CharField('Файл ошибок', max_length=500, blank=True)
+    result_file = models.CharField('Файл результата', max_length=500, blank=True)
+    # Одинаковые задачи экспорта (те же фильтры и версия данных) получают один ключ
+    key = models.CharField('Ключ', max_length=64, blank=True, db_index=True)
+    result = models.JSONField('Итог', default=dict, blank=True)
+    message = models.TextField('Сообщение', blank=True)
+
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    started_at = models.DateTimeField('Начата', null=True, blank=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+    # Обновляется вместе с прогрессом: по нему видно зависшие задачи
+    heartbeat_at = models.DateTimeField('Последняя активность', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Задача Excel'
+        verbose_name_plural = 'Задачи Excel'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['target', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.target} #{self.pk} - {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
@@ -1,3 +1,429 @@
-from django.test import TestCase
+# excel_export/tests.py
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from equipments.models import Equipment
+from .jobs import HANDLERS, claim_job, recover_jobs, run_job
+from .models import ExcelJob
+
+
+class ExcelJobTest(TestCase):
+    """Фоновые задачи импорта: очередность, прогресс, файл ошибок"""
+
+    def setUp(self):
+        cache.clear()
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        override = override_settings(EXCEL_FOLDER=self.folder.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _csv_job(self, content, **options):
+        path = os.path.join(self.folder.name, 'import.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return ExcelJob.objects.create(kind='import', target='equipment', source_file=path,
+                                       original_name='import.csv', options=options)
+
+    def test_import_progress_and_error_file(self):
+        job = self._csv_job('МЦ номер,Тип\n1,мышь\n' + 'X' * 30 + ',мышь\n')
+        run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.inserted, job.failed), ('done', 2, 1, 1))
+        self.assertEqual(Equipment.objects.count(), 1)
+
+        status = self.client.get(f'/export/jobs/{job.pk}/status/').json()
+        self.assertEqual((status['finished'], status['inserted'], status['failed']), (True, 1, 1))
+
+        page = self.client.get(f'/export/jobs/{job.pk}/')
+        self.assertContains(page, f'/export/jobs/{job.pk}/errors/')
+        download = self.client.get(f'/export/jobs/{job.pk}/errors/')
+        self.assertIn('Строка 3', b''.join(download.streaming_content).decode('utf-8'))
+
+    def test_same_target_serialised(self):
+        running = ExcelJob.objects.create(kind='import', target='equipment', status='running',
+                                          heartbeat_at=timezone.now())
+        job = self._csv_job('МЦ номер,Тип\n1,мышь\n')
+        other_target = ExcelJob.objects.create(kind='import', target='employee')
+        export = ExcelJob.objects.create(kind='export', target='equipment')
+
+        self.assertFalse(claim_job(job))
+        self.assertTrue(claim_job(other_target))
+        # экспорт той же модели не ждет импорта
+        self.assertTrue(claim_job(export))
+
+        # зависшая задача (нет heartbeat дольше JOB_STALE_AFTER) очередь не держит
+        ExcelJob.objects.filter(pk=running.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertTrue(claim_job(job))
+
+    def test_queued_import_recovered_after_restart(self):
+        job = self._csv_job('МЦ номер,Тип\n1,мышь\n')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            recover_jobs()
+        self.assertEqual(len(callbacks), 1)
+
+        from . import jobs
+
+        # воркер очереди ('import', 'equipment') выполняет задачу
+        with mock.patch.object(jobs, '_queue_for') as queue_for:
+            callbacks[0]()
+        queue_for.assert_called_once_with('import', 'equipment')
+        queue_for.return_value.put.assert_called_once_with(job.pk)
+
+    def test_worker_logs_failures(self):
+        from . import jobs
+
+        tasks = mock.Mock()
+        tasks.get.side_effect = [1, SystemExit]
+        with mock.patch.object(jobs, 'run_job', side_effect=RuntimeError('нет связи с БД')), \
+                self.assertLogs('excel_export.jobs', 'ERROR') as logs, self.assertRaises(SystemExit):
+            jobs._worker(tasks)
+        self.assertIn('нет связи с БД', logs.output[0])
+
+    def test_handler_failure_marks_job_failed(self):
+        job = self._csv_job('')
+        job.source_file = os.path.join(self.folder.name, 'missing.xlsx')
+        job.save()
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.message)
+        self.assertIn(('import', 'equipment'), HANDLERS)
+
+
+class StreamingExportTest(TestCase):
+    """Экспорт в xlsx через write-only книгу и потоковый ответ"""
+
+    def setUp(self):
+        from employees.models import Department, Employee
+
+        cache.clear()
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        override = override_settings(EXCEL_FOLDER=self.folder.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.department = Department.objects.create(name='ИТ')
+        self.employee = Employee.objects.create(last_name='Сидоров', first_name='Иван', middle_name='Петрович',
+                                                department=self.department, position='Инженер')
+        Equipment.objects.create(mc_number='E1', type='laptop', brand='Dell', status='issued',
+                                 assigned_to=self.employee, assigned_department=self.department)
+        Equipment.objects.create(mc_number=None, type='mouse', status='available')
+
+    def _sheet(self, response):
+        import io
+
+        from openpyxl import load_workbook
+
+        self.assertTrue(response.streaming)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        return [list(row) for row in workbook.worksheets[0].iter_rows(values_only=True)]
+
+    def test_equipment_export_single_query(self):
+        with self.assertNumQueries(2):  # версия данных и оборудование
+            response = self.client.get('/export/export/', {'model': 'equipment', 'status': 'issued'})
+        rows = self._sheet(response)
+        self.assertEqual(rows[0][:3], ['МЦ номер', 'Тип', 'Марка'])
+        self.assertEqual(rows[1][:8], ['E1', 'Ноутбук', 'Dell', None, 'Выдано', 'Сидоров Иван Петрович', 'ИТ', 'ИТ'])
+        self.assertEqual(len(rows), 2)
+
+    def test_equipment_export_from_list_page(self):
+        rows = self._sheet(self.client.get('/equipment/export-excel/'))
+        self.assertEqual([row[0] for row in rows[1:]], ['Без МЦ', 'E1'])
+
+    def test_employee_export(self):
+        for url in ('/export/export/?model=employee', '/employees/export-excel/'):
+            rows = self._sheet(self.client.get(url))
+            self.assertEqual(rows[0][5:8], ['Количество оборудования', 'Оборудование: На складе', 'Оборудование: Выдано'])
+            self.assertEqual(rows[1], ['Сидоров', 'Иван', 'Петрович', 'ИТ', 'Инженер', 1, 0, 1, 0, 0, 0, 'Работает'])
+
+    def test_employee_export_query_count_constant(self):
+        """Количество оборудования считается в том же запросе - число запросов не растет с числом сотрудников"""
+        from employees.models import Employee
+
+        for i in range(30):
+            employee = Employee.objects.create(last_name=f'Сотрудник{i:02d}', first_name='Тест')
+            Equipment.objects.create(mc_number=f'B{i}', type='mouse', status='broken', assigned_to=employee)
+
+        with self.assertNumQueries(2):  # версия данных и сотрудники
+            rows = self._sheet(self.client.get('/employees/export-excel/'))
+        self.assertEqual(len(rows), 32)
+        self.assertEqual(rows[2][5:11], [1, 0, 0, 1, 0, 0])
+
+
+class ExportCacheTest(TestCase):
+    """Дисковый кэш файлов экспорта по ключу фильтра и версии данных"""
+
+    def setUp(self):
+        cache.clear()
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        override = override_settings(EXCEL_FOLDER=self.folder.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        Equipment.objects.create(mc_number='C1', type='laptop', status='issued')
+
+    def _download(self, params):
+        response = self.client.get('/export/export/', params)
+        content = b''.join(response.streaming_content)
+        response.close()
+        return content
+
+    def test_hit_served_with_one_query_until_data_changes(self):
+        from employees.models import Department
+
+        first = self._download({'model': 'equipment', 'status': 'issued'})
+        with self.assertNumQueries(1):  # только версия данных
+            # тот же фильтр с другим порядком и мусором в URL - тот же файл
+            second = self._download({'status': 'issued', 'type': '', 'model': 'equipment'})
+        self.assertEqual(first, second)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Department.objects.create(name='Новый отдел')
+        with self.assertNumQueries(2):
+            self._download({'model': 'equipment', 'status': 'issued'})
+        self.assertEqual(len(os.listdir(os.path.join(self.folder.name, 'export_cache'))), 2)
+
+    def test_stale_file_not_served_after_cache_reset(self):
+        from openpyxl import load_workbook
+
+        self._download({'model': 'equipment'})
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(mc_number='C2', type='laptop')
+        cache.clear()  # перезапуск процесса: кэш в памяти пуст, версии в БД остались
+        content = self._download({'model': 'equipment'})
+        rows = load_workbook(io.BytesIO(content)).active.iter_rows(values_only=True)
+        self.assertIn('C2', [cell for row in rows for cell in row])
+
+    def test_lru_eviction(self):
+        from .export_cache import cache_folder, evict, get_or_create
+
+        paths = []
+        for i in range(3):
+            paths.append(get_or_create(f'key{i}', lambda file: file.write(b'x' * 100)))
+            os.utime(paths[-1], (1000 + i, 1000 + i))
+        os.utime(paths[0])  # key0 только что использован
+
+        evict(max_bytes=250)
+        self.assertEqual(sorted(os.listdir(cache_folder())),
+                         sorted(os.path.basename(path) for path in (paths[0], paths[2])))
+
+
+class ExportJobTest(TestCase):
+    """Фоновый экспорт: одинаковые запросы разделяют одну задачу"""
+
+    def setUp(self):
+        cache.clear()
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        override = override_settings(EXCEL_FOLDER=self.folder.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        for i in range(3):
+            Equipment.objects.create(mc_number=f'A{i}', type='laptop', status='issued')
+
+    def test_identical_requests_share_job(self):
+        params = {'model': 'equipment', 'status': 'issued', 'async': '1'}
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            first = self.client.get('/export/export/', params)
+            second = self.client.get('/export/export/', {**params, 'type': ''})
+            other = self.client.get('/export/export/', {**params, 'status': 'broken'})
+
+        jobs = list(ExcelJob.objects.order_by('id'))
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(len(callbacks), 2)
+        self.assertRedirects(first, f'/export/jobs/{jobs[0].pk}/')
+        self.assertRedirects(second, f'/export/jobs/{jobs[0].pk}/')
+        self.assertRedirects(other, f'/export/jobs/{jobs[1].pk}/')
+
+    def test_job_writes_file(self):
+        import io
+
+        from openpyxl import load_workbook
+
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.get('/export/export/', {'model': 'equipment', 'async': '1'})
+        job = run_job(ExcelJob.objects.get().pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), ('done', 3))
+        self.assertTrue(job.result_file.startswith(self.folder.name))
+
+        self.assertContains(self.client.get(f'/export/jobs/{job.pk}/'), f'/export/jobs/{job.pk}/file/')
+        response = self.client.get(f'/export/jobs/{job.pk}/file/')
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(len(list(workbook.worksheets[0].iter_rows())), 4)
+
+        # задача завершена - следующий такой же запрос создает новую (файл уже в кэше)
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.get('/export/export/', {'model': 'equipment', 'async': '1'})
+        self.assertEqual(ExcelJob.objects.count(), 2)
+
+    def test_dead_jobs_not_shared(self):
+        params = {'model': 'equipment', 'async': '1'}
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.get('/export/export/', params)
+        job = ExcelJob.objects.get()
+
+        # задача осталась queued после перезапуска: никто ее не ждет и не выполняет
+        ExcelJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.get('/export/export/', params)
+        second = ExcelJob.objects.latest('id')
+        self.assertNotEqual(second.pk, job.pk)
+        self.assertRedirects(response, f'/export/jobs/{second.pk}/')
+
+        # выполняющаяся задача без heartbeat дольше JOB_STALE_AFTER - тоже
+        ExcelJob.objects.filter(pk=second.pk).update(status='running',
+                                                     heartbeat_at=timezone.now() - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.get('/export/export/', params)
+        self.assertEqual(ExcelJob.objects.count(), 3)
+
+    def test_recovery_started_only_from_server_entry_point(self):
+        from django.apps import apps
+
+        from . import jobs
+
+        with mock.patch.object(jobs.threading, 'Timer') as timer, \
+                mock.patch.object(jobs, '_recovery_started', False):
+            # ready() выполняется и в командах, тестах и процессах разбора листов
+            apps.get_app_config('excel_export').ready()
+            self.assertEqual(timer.call_count, 0)
+
+            jobs.start_recovery()
+            jobs.start_recovery()
+            self.assertEqual(timer.call_count, 2)  # сразу и через JOB_STALE_AFTER, один раз на процесс
+
+    def test_recover_jobs_after_restart(self):
+        old = timezone.now() - timedelta(hours=1)
+        queued = ExcelJob.objects.create(kind='export', target='equipment')
+        orphan = ExcelJob.objects.create(kind='export', target='employee', status='running', heartbeat_at=old)
+        alive = ExcelJob.objects.create(kind='export', target='inventory', status='running',
+                                        heartbeat_at=timezone.now())
+        ExcelJob.objects.create(kind='export', target='equipment', status='done', heartbeat_at=old)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.assertEqual(recover_jobs(), 2)
+        self.assertEqual(len(callbacks), 2)
+        orphan.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((orphan.status, alive.status), ('queued', 'running'))
+
+        # задача в очередях двух процессов выполняется один раз
+        self.assertEqual(run_job(queued.pk).status, 'done')
+        ExcelJob.objects.filter(pk=queued.pk).update(status='running')
+        self.assertEqual(run_job(queued.pk).status, 'running')
+        self.assertEqual(ExcelJob.objects.get(pk=queued.pk).status, 'running')
+
+
+class StreamFormatsTest(TestCase):
+    """Потоковые CSV и JSON Lines с теми же фильтрами и колонками, что у xlsx"""
+
+    def setUp(self):
+        Equipment.objects.create(mc_number='F1', type='laptop', brand='Lenovo', status='issued')
+        Equipment.objects.create(mc_number='F2', type='mouse', status='available')
+
+    def _lines(self, **params):
+        response = self.client.get('/export/export/', {'model': 'equipment', **params})
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+    def test_csv(self):
+        import csv
+
+        from .exporters import EQUIPMENT_HEADER
+
+        rows = list(csv.reader(self._lines(format='csv', status='issued')))
+        self.assertEqual(rows[0], EQUIPMENT_HEADER)
+        self.assertEqual(rows[1][:5], ['F1', 'Ноутбук', 'Lenovo', '', 'Выдано'])
+        self.assertEqual(len(rows), 2)
+
+    def test_jsonl_single_query(self):
+        import json
+
+        with self.assertNumQueries(1):
+            lines = self._lines(format='jsonl')
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['МЦ номер'] for record in records], ['F1', 'F2'])
+        self.assertEqual(records[1]['Статус'], 'На складе')
+
+    def test_employee_csv_and_unknown_format(self):
+        response = self.client.get('/export/export/', {'model': 'employee', 'format': 'csv'})
+        self.assertIn('Количество оборудования', b''.join(response.streaming_content).decode('utf-8'))
+        self.assertEqual(self.client.get('/export/export/', {'model': 'equipment', 'format': 'xml'}).status_code, 400)
+
+
+class InventoryExportTest(TestCase):
+    """Полная инвентаризация: лист на модель, один запрос на таблицу"""
+
+    def setUp(self):
+        from datetime import date
+
+        from employees.models import Department, Employee
+        from history.models import EquipmentHistory
+        from network.models import Location, NetworkEquipment
+
+        cache.clear()
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        override = override_settings(EXCEL_FOLDER=self.folder.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        department = Department.objects.create(name='ИТ', short_name='IT')
+        employee = Employee.objects.create(last_name='Петров', first_name='Петр', department=department)
+        equipment = Equipment.objects.create(mc_number='I1', type='laptop', status='issued',
+                                             assigned_to=employee, assigned_department=department)
+        EquipmentHistory.objects.create(equipment=equipment, employee=employee, action='issue',
+                                        date=date(2024, 3, 1), created_by='admin')
+        location = Location.objects.create(name='Серверная')
+        NetworkEquipment.objects.create(name='sw-1', type='switch', location=location, rack=2, unit=10,
+                                        ip_address='10.0.0.2')
+
+    def _workbook(self, response):
+        import io
+
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in workbook}
+
+    def test_all_sheets_one_query_per_table(self):
+        # версия данных; отделы, сотрудники, оборудование, история, места, сетевое оборудование
+        with self.assertNumQueries(7):
+            sheets = self._workbook(self.client.get('/export/export/', {'model': 'inventory'}))
+
+        self.assertEqual(list(sheets), ['Отделы', 'Сотрудники', 'Оборудование', 'История', 'Сетевое оборудование'])
+        self.assertEqual(sheets['Отделы'][1][1:], ['ИТ', 'IT'])
+        self.assertEqual(sheets['Сотрудники'][1][1:], ['Петров', 'Петр', None, 'ИТ', None, 'Работает'])
+        self.assertEqual(sheets['Оборудование'][1][1:9],
+                         ['I1', 'Ноутбук', None, None, 'Выдано', 'Петров Петр', 'ИТ', 'ИТ'])
+        self.assertEqual(sheets['История'][1][1:], ['01.03.2024', 'I1', 'Выдача', 'Петров Петр', None, 'admin'])
+        self.assertEqual(sheets['Сетевое оборудование'][1][1:10],
+                         ['sw-1', 'Коммутатор', None, None, None, 'Серверная', 2, 10, '10.0.0.2'])
+
+    def test_cache_follows_history_and_network_changes(self):
+        from network.models import NetworkEquipment
+
+        self._workbook(self.client.get('/export/export/', {'model': 'inventory'}))
+        with self.assertNumQueries(1):
+            self._workbook(self.client.get('/export/export/', {'model': 'inventory'}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NetworkEquipment.objects.create(name='sw-2')
+        sheets = self._workbook(self.client.get('/export/export/', {'model': 'inventory'}))
+        self.assertEqual(len(sheets['Сетевое оборудование']), 3)
+
+    def test_async_job_and_stream_formats_rejected(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.get('/export/export/', {'model': 'inventory', 'async': '1'})
+        job = run_job(ExcelJob.objects.get(target='inventory').pk)
+        self.assertEqual((job.status, job.processed), ('done', 5))
+        self.assertEqual(self.client.get('/export/export/', {'model': 'inventory', 'format': 'csv'}).status_code, 400)
@@ -6,4 +6,8 @@ app_name = 'excel_export'
 
 urlpatterns = [
     path('export/', views.export_excel, name='export_excel'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/errors/', views.job_error_file, name='job_error_file'),
+    path('jobs/<int:pk>/file/', views.job_result_file, name='job_result_file'),
 ]
\ No newline at end of file
@@ -1,15 +1,25 @@
 # excel_export/views.py
-import pandas as pd
-from django.http import HttpResponse
-from datetime import datetime
-from django.db.models import Q
+import os
+
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+
+from .exporters import (
+    STREAM_FORMATS, employee_xlsx_response, equipment_xlsx_response, export_params, export_response,
+    stream_response,
+)
+from .jobs import export_job
+from .models import ExcelJob
 
 def export_excel(request):
     """
     Универсальный экспорт данных в Excel.
     
     Параметры:
-    - model: 'equipment' или 'employee' (обязательный)
+    - model: 'equipment', 'employee' или 'inventory' - полная инвентаризация,
+      лист на каждую модель (обязательный)
+    - async=1: выгрузка фоновой задачей со страницей прогресса
+    - format: xlsx (по умолчанию), csv или jsonl (потоковая выгрузка, кроме inventory)
     - Все остальные параметры фильтрации из исходной страницы
     """
     model_type = request.GET.get('model')
@@ -17,128 +27,77 @@ def export_excel(request):
     if not model_type:
         # Можно вернуть ошибку или шаблон для выбора
         return HttpResponse("Ошибка: не указан параметр model", status=400)
+
+    export_format = request.GET.get('format', 'xlsx')
+    if export_format in STREAM_FORMATS and model_type in ('equipment', 'employee'):
+        # CSV / JSON Lines для скриптов: построчно из БД, без книги Excel
+        return stream_response(model_type, export_params(model_type, request), export_format)
+    if export_format != 'xlsx':
+        return HttpResponse(f"Ошибка: неизвестный формат '{export_format}'", status=400)
+
+    if request.GET.get('async') == '1' and model_type in ('equipment', 'employee', 'inventory'):
+        # Большой отчет: файл пишет фоновая задача, пользователь ждет на странице задачи
+        job, _ = export_job(model_type, export_params(model_type, request))
+        return redirect('excel_export:job_detail', pk=job.pk)
     
     if model_type == 'equipment':
         return export_equipment(request)
     elif model_type == 'employee':
         return export_employees(request)
+    elif model_type == 'inventory':
+        return export_response('inventory', {})
     else:
         return HttpResponse(f"Ошибка: неизвестный тип модели '{model_type}'", status=400)
 
 
 def export_equipment(request):
-    """Экспорт оборудования (логика из equipments/views.py)"""
-    from equipments.models import Equipment
-    from employees.models import Department
-    
-    equipments = Equipment.objects.select_related('assigned_to', 'assigned_to__department', 'assigned_department').all()
-    
-    # Фильтрация (ТОЧНО ТАК ЖЕ как в equipment_list)
-    status_filter = request.GET.get('status')
-    type_filter = request.GET.get('type')
-    department_filter = request.GET.get('department')
-    assigned_department_filter = request.GET.get('assigned_department')
-    employee_filter = request.GET.get('employee')
-    search_query = request.GET.get('q')
-    
-    if status_filter:
-        equipments = equipments.filter(status=status_filter)
-    
-    if type_filter:
-        equipments = equipments.filter(type=type_filter)
-    
-    if department_filter:
-        equipments = equipments.filter(assigned_to__department_id=department_filter)
-    
-    if assigned_department_filter:
-        equipments = equipments.filter(assigned_department_id=assigned_department_filter)
-    
-    if employee_filter:
-        equipments = equipments.filter(assigned_to_id=employee_filter)
-    
-    if search_query:
-        equipments = equipments.filter(
-            Q(mc_number__icontains=search_query) |
-            Q(brand__icontains=search_query) |
-            Q(model__icontains=search_query) |
-            Q(notes__icontains=search_query) |
-            Q(assigned_to__last_name__icontains=search_query) |
-            Q(assigned_to__first_name__icontains=search_query) |
-            Q(assigned_department__name__icontains=search_query)
-        )
-    
-    # Создаем DataFrame
-    data = []
-    for eq in equipments:
-        data.append({
-            'МЦ номер': eq.mc_number or 'Без МЦ',
-            'Тип': eq.get_type_display(),
-            'Марка': eq.brand or '',
-            'Модель': eq.model or '',
-            'Статус': eq.get_status_display(),
-            'Сотрудник': eq.assigned_to.full_name if eq.assigned_to else '',
-            'Отдел (сотрудника)': eq.assigned_to.department.name if eq.assigned_to and eq.assigned_to.department else '',
-            'Закреплено за отделом': eq.assigned_department.name if eq.assigned_department else '',
-            'Дата добавления': eq.created_at.strftime('%d.%m.%Y') if eq.created_at else '',
-            'Примечания': eq.notes or '',
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Создаем имя файла
-    filename = f'equipment_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    # Создаем HttpResponse с Excel файлом
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Сохраняем в HttpResponse
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Оборудование')
+    """Экспорт оборудования (те же фильтры, что в equipment_list)"""
+    from equipments.filters import EquipmentFilter
     
-    return response
+    # Фильтрация (ТОЧНО ТАК ЖЕ как в equipment_list - общий EquipmentFilter)
+    return equipment_xlsx_response(EquipmentFilter.from_request(request))
 
 
 def export_employees(request):
-    """Экспорт сотрудников (логика из employees/views.py)"""
-    from employees.models import Employee, Department
-    
-    employees = Employee.objects.select_related('department').filter(is_active=True)
-    
-    # Фильтрация (ТОЧНО ТАК ЖЕ как в employee_list)
-    department_filter = request.GET.get('department')
-    
-    if department_filter:
-        employees = employees.filter(department_id=department_filter)
-    
-    # Создаем DataFrame
-    data = []
-    for emp in employees:
-        # Считаем оборудование сотрудника
-        from equipments.models import Equipment
-        equipment_count = Equipment.objects.filter(assigned_to=emp).count()
-        
-        data.append({
-            'Фамилия': emp.last_name,
-            'Имя': emp.first_name,
-            'Отчество': emp.middle_name or '',
-            'Отдел': emp.department.name if emp.department else '',
-            'Должность': emp.position or '',
-            'Количество оборудования': equipment_count,
-            'Статус': 'Работает' if emp.is_active else 'Уволен',
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Создаем имя файла
-    filename = f'employees_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    # Создаем HttpResponse с Excel файлом
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Сохраняем в HttpResponse
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Сотрудники')
-    
-    return response
+    """Экспорт сотрудников (те же фильтры, что в employee_list)"""
+    return employee_xlsx_response(request.GET.get('department'))
+
+
+def job_detail(request, pk):
+    """Страница фоновой задачи: прогресс опрашивается через job_status"""
+    job = get_object_or_404(ExcelJob, pk=pk)
+    return render(request, 'excel_export/job_detail.html', {'job': job})
+
+
+def job_status(request, pk):
+    """Прогресс задачи в JSON для опроса со страницы задачи"""
+    job = get_object_or_404(ExcelJob, pk=pk)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'processed': job.processed,
+        'inserted': job.inserted,
+        'updated': job.updated,
+        'failed': job.failed,
+        'message': job.message,
+    })
+
+
+def job_error_file(request, pk):
+    """Скачать файл ошибок задачи импорта"""
+    job = get_object_or_404(ExcelJob, pk=pk)
+    if not job.error_file or not os.path.exists(job.error_file):
+        raise Http404('Файл ошибок не найден')
+    return FileResponse(open(job.error_file, 'rb'), as_attachment=True,
+                        filename=os.path.basename(job.error_file))
+
+
+def job_result_file(request, pk):
+    """Скачать файл, подготовленный задачей экспорта"""
+    job = get_object_or_404(ExcelJob, pk=pk)
+    if job.status != 'done' or not job.result_file or not os.path.exists(job.result_file):
+        raise Http404('Файл не найден: задача не завершена или файл устарел')
+    return FileResponse(open(job.result_file, 'rb'), as_attachment=True,
+                        filename=job.original_name or os.path.basename(job.result_file))
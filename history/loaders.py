@@ -0,0 +1,16 @@
+# history/loaders.py
+"""
+Загрузка истории для детальных страниц оборудования и сотрудников.
+
+На странице показываются только последние записи, а общее количество
+нужно для ссылки "Вся история". Оба значения приходят одним запросом:
+COUNT(*) OVER () считается по всей выборке до LIMIT и попадает в каждую
+строку страницы.
+"""
+from django.db.models import Count, Window
+
+
+def history_page(queryset, limit):
+    """(первые limit записей queryset, общее количество записей) - один запрос"""
+    records = list(queryset.annotate(history_total=Window(Count('id')))[:limit])
+    return records, records[0].history_total if records else 0
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_employee_external_id'),
+        ('history', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipmenthistory',
+            name='action',
+            field=models.CharField(choices=[('issue', 'Выдача'), ('return', 'Возврат'), ('repair', 'Отправка в ремонт'), ('write_off', 'Списание'), ('transfer', 'Передача')], default='issue', max_length=20, verbose_name='Действие'),
+        ),
+        migrations.AlterField(
+            model_name='equipmenthistory',
+            name='employee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='employees.employee', verbose_name='Сотрудник'),
+        ),
+    ]
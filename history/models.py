@@ -9,10 +9,12 @@ class EquipmentHistory(models.Model):
         ('return', 'Возврат'),
         ('repair', 'Отправка в ремонт'),
         ('write_off', 'Списание'),
+        ('transfer', 'Передача'),
     ]
     
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='history_records')
-    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, verbose_name='Сотрудник')
+    # Пусто у передачи между отделами, где сотрудника нет ни до, ни после
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Сотрудник')
     action = models.CharField('Действие', max_length=20, choices=ACTION_CHOICES, default='issue')
     date = models.DateField('Дата')
     notes = models.TextField('Примечания', blank=True)
@@ -24,4 +26,5 @@ class EquipmentHistory(models.Model):
         ordering = ['-date', '-id']
     
     def __str__(self):
-        return f"{self.equipment.mc_number} - {self.get_action_display()} - {self.employee.full_name}"
\ No newline at end of file
+        employee = self.employee.full_name if self.employee else 'без сотрудника'
+        return f"{self.equipment.mc_number} - {self.get_action_display()} - {employee}"
\ No newline at end of file
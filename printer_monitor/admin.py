@@ -1,6 +1,6 @@
 # printer_monitor/admin.py
 from django.contrib import admin
-from .models import PrinterCheck, PrinterCurrentStatus
+from .models import PrinterAddressChange, PrinterCheck, PrinterCurrentStatus
 
 @admin.register(PrinterCheck)
 class PrinterCheckAdmin(admin.ModelAdmin):
@@ -11,6 +11,12 @@ class PrinterCheckAdmin(admin.ModelAdmin):
 
 @admin.register(PrinterCurrentStatus)
 class PrinterCurrentStatusAdmin(admin.ModelAdmin):
-    list_display = ['printer', 'status', 'is_online', 'last_seen', 'last_updated']
+    list_display = ['printer', 'status', 'is_online', 'resolved_ip', 'last_seen', 'last_updated']
     list_filter = ['status', 'is_online']
-    search_fields = ['printer__mc_number', 'printer__brand', 'printer__model']
\ No newline at end of file
+    search_fields = ['printer__mc_number', 'printer__brand', 'printer__model']
+
+@admin.register(PrinterAddressChange)
+class PrinterAddressChangeAdmin(admin.ModelAdmin):
+    list_display = ['printer', 'hostname', 'old_ip', 'new_ip', 'changed_at']
+    search_fields = ['hostname', 'old_ip', 'new_ip', 'printer__mc_number']
+    date_hierarchy = 'changed_at'
\ No newline at end of file
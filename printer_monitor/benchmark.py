@@ -0,0 +1,313 @@
+# printer_monitor/benchmark.py - НАГРУЗОЧНЫЙ СТЕНД
+"""
+Симулированная ферма принтеров и замер проверки.
+
+Ферма поднимает на loopback-адресах 127.1.0.0/16 тысячи фиктивных
+принтеров (TCP 9100, HTTP, SNMP/UDP) с настраиваемой задержкой,
+долей недоступных и "мигающих" устройств. run_benchmark() заполняет
+Equipment записями под ферму и замеряет время проверки, количество
+записей в БД, процессорное время и пик памяти.
+"""
+import asyncio
+import contextlib
+import ipaddress
+import json
+import platform
+import random
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from django.db import connection, transaction
+
+from equipments.models import Equipment
+from .models import PrinterCheck, PrinterCurrentStatus
+from .services import PrinterMonitorService
+
+
+BENCH_MC_PREFIX = 'BENCH'
+FARM_NETWORK = '127.1.0.0/16'
+
+# Движки проверки: имя -> функция полной проверки.
+ENGINES: Dict[str, Callable[[], List[Dict]]] = {
+    'sequential': PrinterMonitorService.check_all_printers,
+}
+
+# Режимы записи результатов: имя -> контекстный менеджер вокруг проверки.
+# per_row - как в проде (autocommit на каждую запись), single_transaction -
+# вся проверка в одной транзакции.
+PERSISTENCE_MODES: Dict[str, Callable] = {
+    'per_row': contextlib.nullcontext,
+    'single_transaction': transaction.atomic,
+}
+
+
+class PrinterFarm:
+    """Набор фиктивных сетевых принтеров в отдельном потоке с asyncio"""
+
+    def __init__(self, count: int, latency_ms: float = 0, drop_rate: float = 0.0,
+                 flap_rate: float = 0.0, flap_interval: float = 5.0,
+                 protocols=('tcp', 'http', 'snmp'), tcp_port: int = 9100,
+                 http_port: int = 8080, snmp_port: int = 1161, seed: int = None):
+        self.count = count
+        self.latency = latency_ms / 1000
+        self.flap_interval = flap_interval
+        self.protocols = tuple(protocols)
+        self.ports = {'tcp': tcp_port, 'http': http_port, 'snmp': snmp_port}
+
+        rng = random.Random(seed)
+        hosts = ipaddress.IPv4Network(FARM_NETWORK).hosts()
+        self.printers = []
+        for _ in range(count):
+            roll = rng.random()
+            self.printers.append({
+                'ip': str(next(hosts)),
+                'dropped': roll < drop_rate,
+                'flapping': drop_rate <= roll < drop_rate + flap_rate,
+                'online': roll >= drop_rate,
+            })
+
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._servers = {}  # ip -> список серверов/транспортов
+
+    # --- обработчики протоколов ---
+
+    async def _handle_tcp(self, reader, writer):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(b'@PJL INFO STATUS\r\nCODE=10001\r\n')
+        await writer.drain()
+        writer.close()
+
+    async def _handle_http(self, reader, writer):
+        await reader.readline()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = b'<html><body>Ready</body></html>'
+        writer.write(b'HTTP/1.0 200 OK\r\nContent-Type: text/html\r\nContent-Length: '
+                     + str(len(body)).encode() + b'\r\n\r\n' + body)
+        await writer.drain()
+        writer.close()
+
+    class _SnmpProtocol(asyncio.DatagramProtocol):
+        def __init__(self, farm):
+            self.farm = farm
+            self.transport = None
+
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            # Эхо-ответ: движку важен факт и время ответа, а не содержимое PDU
+            self.farm._loop.call_later(self.farm.latency, self.transport.sendto, data, addr)
+
+    # --- управление фермой ---
+
+    async def _bring_up(self, printer):
+        ip = printer['ip']
+        servers = []
+        if 'tcp' in self.protocols:
+            servers.append(await asyncio.start_server(self._handle_tcp, ip, self.ports['tcp'], backlog=64))
+        if 'http' in self.protocols:
+            servers.append(await asyncio.start_server(self._handle_http, ip, self.ports['http'], backlog=64))
+        if 'snmp' in self.protocols:
+            transport, _ = await self._loop.create_datagram_endpoint(
+                lambda: self._SnmpProtocol(self), local_addr=(ip, self.ports['snmp']))
+            servers.append(transport)
+        self._servers[ip] = servers
+        printer['online'] = True
+
+    async def _bring_down(self, printer):
+        for server in self._servers.pop(printer['ip'], []):
+            server.close()
+        printer['online'] = False
+
+    async def _flap(self):
+        flapping = [p for p in self.printers if p['flapping']]
+        while flapping:
+            await asyncio.sleep(self.flap_interval)
+            for printer in flapping:
+                if printer['online']:
+                    await self._bring_down(printer)
+                else:
+                    await self._bring_up(printer)
+
+    async def _main(self):
+        for printer in self.printers:
+            if not printer['dropped']:
+                await self._bring_up(printer)
+        self._ready.set()
+        await self._flap()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.create_task(self._main())
+        self._loop.run_forever()
+
+    def start(self):
+        _raise_fd_limit()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='printer-farm', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout=60):
+            raise RuntimeError('Ферма принтеров не запустилась за 60 секунд')
+        return self
+
+    def stop(self):
+        if not self._loop:
+            return
+
+        async def shutdown():
+            for printer in self.printers:
+                await self._bring_down(printer)
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=30)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=30)
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def _raise_fd_limit():
+    """Ферме нужно по 2-3 сокета на принтер - поднимаем мягкий лимит до жесткого"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def seed_farm_printers(farm: PrinterFarm) -> int:
+    """Создает записи Equipment под принтеры фермы (старые записи стенда удаляются)"""
+    Equipment.objects.filter(mc_number__startswith=BENCH_MC_PREFIX).delete()
+    Equipment.objects.bulk_create(
+        [
+            Equipment(
+                mc_number=f'{BENCH_MC_PREFIX}{index:05d}',
+                type='printer',
+                brand='Bench',
+                model='Simulated',
+                ip_address=printer['ip'],
+                status='issued',
+            )
+            for index, printer in enumerate(farm.printers, start=1)
+        ],
+        batch_size=500,
+    )
+    return len(farm.printers)
+
+
+class _QueryCounter:
+    """Обертка над cursor.execute, считающая чтения и записи без сохранения SQL"""
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.writes += len(params) if many and params else 1
+        else:
+            self.reads += 1
+        return execute(sql, params, many, context)
+
+
+def _clear_checks():
+    PrinterCheck.objects.all().delete()
+    PrinterCurrentStatus.objects.all().delete()
+
+
+def measure_sweep(engine: str = 'sequential', persistence: str = 'per_row') -> Dict:
+    """
+    Прогон проверки с замером времени, записей в БД, CPU и памяти.
+    tracemalloc замедляет каждое выделение памяти, поэтому время и запросы
+    меряются в первом проходе без трассировки, а пик памяти - во втором,
+    отдельном проходе на той же ферме.
+    """
+    sweep = ENGINES[engine]
+    counter = _QueryCounter()
+
+    _clear_checks()
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    with connection.execute_wrapper(counter), PERSISTENCE_MODES[persistence]():
+        results = sweep()
+    wall_time = time.perf_counter() - wall_started
+    cpu_time = time.process_time() - cpu_started
+
+    _clear_checks()
+    tracemalloc.start()
+    try:
+        with PERSISTENCE_MODES[persistence]():
+            sweep()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    online = sum(1 for r in results if r['result']['online'])
+    return {
+        'engine': engine,
+        'persistence': persistence,
+        'printers': len(results),
+        'online': online,
+        'offline': len(results) - online,
+        'wall_time_s': round(wall_time, 4),
+        'cpu_time_s': round(cpu_time, 4),
+        'peak_memory_mb': round(peak_memory / 1024 / 1024, 2),
+        'db_reads': counter.reads,
+        'db_writes': counter.writes,
+        'printers_per_second': round(len(results) / wall_time, 1) if wall_time else None,
+    }
+
+
+def run_benchmark(farm: PrinterFarm, engines=None, persistence_modes=None, repeat: int = 1) -> Dict:
+    """Прогоняет все сочетания движков и режимов записи на запущенной ферме"""
+    engines = engines or list(ENGINES)
+    persistence_modes = persistence_modes or list(PERSISTENCE_MODES)
+    seed_farm_printers(farm)
+
+    runs = []
+    for engine in engines:
+        for persistence in persistence_modes:
+            for attempt in range(1, repeat + 1):
+                run = measure_sweep(engine, persistence)
+                run['attempt'] = attempt
+                runs.append(run)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': connection.vendor,
+        'farm': {
+            'printers': farm.count,
+            'latency_ms': farm.latency * 1000,
+            'dropped': sum(1 for p in farm.printers if p['dropped']),
+            'flapping': sum(1 for p in farm.printers if p['flapping']),
+            'flap_interval_s': farm.flap_interval,
+            'protocols': list(farm.protocols),
+        },
+        'runs': runs,
+    }
+
+
+def write_results(report: Dict, path) -> None:
+    """Дописывает отчет одной строкой JSON (JSON Lines) - история прогонов для сравнения"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(report, ensure_ascii=False) + '\n')
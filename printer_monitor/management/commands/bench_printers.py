@@ -0,0 +1,65 @@
+# printer_monitor/management/commands/bench_printers.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from printer_monitor.benchmark import (
+    ENGINES, PERSISTENCE_MODES, PrinterFarm, run_benchmark, write_results,
+)
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест проверки принтеров на симулированной ферме'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--printers', type=int, default=1000, help='Количество фиктивных принтеров')
+        parser.add_argument('--latency-ms', type=float, default=0, help='Задержка ответа принтера, мс')
+        parser.add_argument('--drop-rate', type=float, default=0.0, help='Доля недоступных принтеров (0..1)')
+        parser.add_argument('--flap-rate', type=float, default=0.0, help='Доля "мигающих" принтеров (0..1)')
+        parser.add_argument('--flap-interval', type=float, default=5.0, help='Период переключения мигающих, сек')
+        parser.add_argument('--protocols', default='tcp,http,snmp', help='Протоколы фермы через запятую')
+        parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                            help='Движок проверки (можно несколько раз, по умолчанию все)')
+        parser.add_argument('--persistence', action='append', choices=sorted(PERSISTENCE_MODES),
+                            help='Режим записи в БД (можно несколько раз, по умолчанию все)')
+        parser.add_argument('--repeat', type=int, default=1, help='Повторов каждого сочетания')
+        parser.add_argument('--seed', type=int, default=None, help='Seed для воспроизводимой фермы')
+        parser.add_argument('--output', default='bench_printers.jsonl', help='Файл результатов (JSON Lines)')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['drop_rate'] + options['flap_rate'] <= 1:
+            raise CommandError('Сумма --drop-rate и --flap-rate должна быть в пределах 0..1')
+
+        farm = PrinterFarm(
+            count=options['printers'],
+            latency_ms=options['latency_ms'],
+            drop_rate=options['drop_rate'],
+            flap_rate=options['flap_rate'],
+            flap_interval=options['flap_interval'],
+            protocols=[p.strip() for p in options['protocols'].split(',') if p.strip()],
+            seed=options['seed'],
+        )
+
+        # Прогон идет на временной тестовой БД, рабочие данные не трогаем
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"🖨️ Запускаю ферму из {farm.count} принтеров...")
+            with farm:
+                report = run_benchmark(
+                    farm,
+                    engines=options['engine'],
+                    persistence_modes=options['persistence'],
+                    repeat=options['repeat'],
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for run in report['runs']:
+            self.stdout.write(
+                f"✅ {run['engine']}/{run['persistence']} #{run['attempt']}: "
+                f"{run['wall_time_s']} с, CPU {run['cpu_time_s']} с, "
+                f"память {run['peak_memory_mb']} МБ, записей в БД {run['db_writes']}"
+            )
+
+        write_results(report, options['output'])
+        self.stdout.write(f"📊 Результаты дописаны в {options['output']}")
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from printer_monitor import metrics
 from printer_monitor.services import PrinterMonitorService
 
 class Command(BaseCommand):
@@ -7,7 +8,9 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write("🖨️ Начинаю проверку принтеров...")
         
-        results = PrinterMonitorService.check_all_printers()
+        # Метрики сохраняются в снимок, который отдает /metrics веб-процесса
+        with metrics.shared_snapshot():
+            results = PrinterMonitorService.check_all_printers()
         
         online = sum(1 for r in results if r['result']['online'])
         offline = len(results) - online
@@ -0,0 +1,314 @@
+# printer_monitor/metrics.py - МЕТРИКИ МОНИТОРИНГА
+"""
+Метрики проверки принтеров в текстовом формате Prometheus.
+
+Значения обновляются PrinterMonitorService в памяти процесса во время
+проверки. Проверка из cron (manage.py check_printers) идет в отдельном
+процессе, поэтому после проверки значения сохраняются снимком в файл
+settings.PRINTER_METRICS_FILE, а /metrics отдает последний снимок -
+чей бы процесс ни проверял. Перед проверкой снимок загружается, чтобы
+счетчики продолжали расти, а не начинались с нуля в каждом запуске.
+Текущая глубина очереди во время проверки в снимок не попадает.
+
+При запросе /metrics база данных не читается.
+"""
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки по правилам формата Prometheus"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Базовая метрика: набор значений по кортежу меток"""
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    def dump(self) -> list:
+        """Значения для снимка: [[метки...], значение]"""
+        with self._lock:
+            return [[list(key), value] for key, value in sorted(self._values.items())]
+
+    def load(self, items: list):
+        """Заменяет значения значениями из снимка"""
+        values = {tuple(key): float(value) for key, value in items}
+        with self._lock:
+            self._values = values
+
+    def empty_copy(self) -> 'Metric':
+        """Та же метрика без значений"""
+        clone = copy.copy(self)
+        clone._lock = threading.Lock()
+        clone.load([])
+        return clone
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}',
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError('Счетчик не может уменьшаться')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Текущее значение, которое может расти и убывать"""
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def replace(self, values: Dict[str, float]):
+        """
+        Атомарно заменяет все значения метрики с одной меткой.
+        Пропавшие значения меток (например, удаленный отдел) исчезают из вывода.
+        """
+        if len(self.labelnames) != 1:
+            raise ValueError(f'{self.name}: replace() поддерживает только одну метку')
+        with self._lock:
+            self._values = {(str(label),): float(value) for label, value in values.items()}
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами корзин"""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float], labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # ключ меток -> (счетчики по корзинам, сумма, количество)
+        self._observations: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._observations.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get(self, **labels) -> float:
+        """Количество наблюдений"""
+        state = self._observations.get(self._key(labels))
+        return state[2] if state else 0
+
+    def dump(self) -> list:
+        """Значения для снимка: [[метки...], [счетчики корзин], сумма, количество]"""
+        with self._lock:
+            return [[list(key), list(state[0]), state[1], state[2]] for key, state in sorted(self._observations.items())]
+
+    def load(self, items: list):
+        observations = {}
+        for key, bucket_counts, total, count in items:
+            if len(bucket_counts) == len(self.buckets):  # границы корзин не менялись
+                observations[tuple(key)] = [list(bucket_counts), float(total), int(count)]
+        with self._lock:
+            self._observations = observations
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, [list(state[0]), state[1], state[2]]) for key, state in self._observations.items())
+        for key, (bucket_counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                yield f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, bucket_count
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+    def dump(self) -> dict:
+        return {name: metric.dump() for name, metric in self._metrics.items()}
+
+    def load(self, data: dict):
+        """Загружает снимок; метрики, которых нет в снимке, обнуляются"""
+        for name, metric in self._metrics.items():
+            metric.load(data.get(name, []))
+
+    def from_snapshot(self, data: dict) -> 'MetricsRegistry':
+        """Новый реестр с теми же метриками и значениями из снимка (этот реестр не меняется)"""
+        registry = MetricsRegistry()
+        for metric in self._metrics.values():
+            registry.register(metric.empty_copy()).load(data.get(metric.name, []))
+        return registry
+
+
+def _snapshot_path() -> Optional[str]:
+    return getattr(settings, 'PRINTER_METRICS_FILE', None)
+
+
+def read_snapshot(path=None) -> Optional[dict]:
+    """Последний сохраненный снимок или None, если его нет (или файл поврежден)"""
+    path = path or _snapshot_path()
+    if not path:
+        return None
+    try:
+        with open(path, encoding='utf-8') as snapshot:
+            data = json.load(snapshot)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def write_snapshot(registry: 'MetricsRegistry', path=None):
+    """Атомарно сохраняет значения реестра: читатель видит либо старый, либо новый снимок"""
+    path = path or _snapshot_path()
+    if not path:
+        return
+    directory = os.path.dirname(os.fspath(path)) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            json.dump(registry.dump(), tmp, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def shared_snapshot(registry: 'MetricsRegistry' = None, path=None):
+    """
+    Проверка, метрики которой видны всем процессам: перед ней реестр
+    продолжает последний снимок, после нее снимок перезаписывается.
+    """
+    registry = registry or REGISTRY
+    snapshot = read_snapshot(path)
+    if snapshot is not None:
+        registry.load(snapshot)
+    yield registry
+    write_snapshot(registry, path)
+
+
+REGISTRY = MetricsRegistry()
+
+SWEEP_DURATION = REGISTRY.register(Histogram(
+    'printer_monitor_sweep_duration_seconds',
+    'Длительность полной проверки принтеров',
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600),
+))
+SWEEP_LAST_COMPLETED = REGISTRY.register(Gauge(
+    'printer_monitor_sweep_last_completed_timestamp_seconds',
+    'Время окончания последней проверки (unix time)',
+))
+PRINTERS_PROBED = REGISTRY.register(Counter(
+    'printer_monitor_printers_probed_total',
+    'Количество опрошенных принтеров',
+))
+PRINTERS_DEFERRED = REGISTRY.register(Counter(
+    'printer_monitor_printers_deferred_total',
+    'Количество принтеров, пропущенных при проверке',
+))
+PROBE_ERRORS = REGISTRY.register(Counter(
+    'printer_monitor_probe_errors_total',
+    'Ошибки опроса принтеров по типу',
+    labelnames=('type',),
+))
+DB_WRITE_DURATION = REGISTRY.register(Histogram(
+    'printer_monitor_db_write_duration_seconds',
+    'Время записи результата проверки в базу данных',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'printer_monitor_queue_depth',
+    'Количество принтеров, ожидающих опроса в текущей проверке',
+))
+PRINTERS_ONLINE = REGISTRY.register(Gauge(
+    'printer_monitor_printers_online',
+    'Принтеры в сети по отделам (по итогам последней проверки)',
+    labelnames=('department',),
+))
+PRINTERS_OFFLINE = REGISTRY.register(Gauge(
+    'printer_monitor_printers_offline',
+    'Принтеры не в сети по отделам (по итогам последней проверки)',
+    labelnames=('department',),
+))
+DNS_LOOKUPS = REGISTRY.register(Counter(
+    'printer_monitor_dns_lookups_total',
+    'Разрешение имен принтеров: hit - из кэша, miss - запрос к DNS, error - имя не найдено',
+    labelnames=('result',),
+))
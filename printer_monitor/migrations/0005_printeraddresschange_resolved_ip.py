@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipments', '0002_equipment_hostname'),
+        ('printer_monitor', '0004_remove_printeralert_printer_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='printercurrentstatus',
+            name='resolved_ip',
+            field=models.GenericIPAddressField(blank=True, null=True, protocol='IPv4'),
+        ),
+        migrations.CreateModel(
+            name='PrinterAddressChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hostname', models.CharField(max_length=253)),
+                ('old_ip', models.GenericIPAddressField(protocol='IPv4')),
+                ('new_ip', models.GenericIPAddressField(protocol='IPv4')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('printer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='address_changes', to='equipments.equipment')),
+            ],
+            options={
+                'verbose_name': 'Смена IP адреса',
+                'verbose_name_plural': 'Смены IP адресов',
+                'ordering': ['-changed_at'],
+            },
+        ),
+    ]
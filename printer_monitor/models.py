@@ -33,6 +33,8 @@ class PrinterCurrentStatus(models.Model):
     is_online = models.BooleanField(default=False)
     last_seen = models.DateTimeField(null=True, blank=True)
     response_time = models.FloatField(null=True, blank=True)
+    # Последний IP, в который разрешилось имя хоста принтера
+    resolved_ip = models.GenericIPAddressField(protocol='IPv4', null=True, blank=True)
     
     STATUS_CHOICES = [
         ('online', 'В сети'),
@@ -48,4 +50,25 @@ class PrinterCurrentStatus(models.Model):
         return f"{self.printer} - {self.get_status_display()}"
     
     def get_status_display(self):
-        return dict(self.STATUS_CHOICES).get(self.status, 'Неизвестно')
\ No newline at end of file
+        return dict(self.STATUS_CHOICES).get(self.status, 'Неизвестно')
+
+
+class PrinterAddressChange(models.Model):
+    """Смена IP адреса, в который разрешается имя хоста принтера (DHCP)"""
+    printer = models.ForeignKey(
+        Equipment,
+        on_delete=models.CASCADE,
+        related_name='address_changes'
+    )
+    hostname = models.CharField(max_length=253)
+    old_ip = models.GenericIPAddressField(protocol='IPv4')
+    new_ip = models.GenericIPAddressField(protocol='IPv4')
+    changed_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-changed_at']
+        verbose_name = "Смена IP адреса"
+        verbose_name_plural = "Смены IP адресов"
+    
+    def __str__(self):
+        return f"{self.hostname}: {self.old_ip} → {self.new_ip} ({self.changed_at:%d.%m %H:%M})"
@@ -0,0 +1,124 @@
+# printer_monitor/resolver.py - КЭШ DNS ДЛЯ ПРИНТЕРОВ
+"""
+Разрешение имен принтеров с кэшем, ограниченным по TTL.
+
+Проверка разрешает все имена заранее и параллельно, чтобы не платить
+за DNS на каждом опросе и не выполнять запросы последовательно.
+Если установлен dnspython, используется TTL из DNS-ответа, иначе -
+PRINTER_DNS_TTL из настроек (socket.getaddrinfo TTL не сообщает).
+"""
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+from . import metrics
+
+try:
+    import dns.resolver as dns_resolver
+except ImportError:  # dnspython - необязательная зависимость
+    dns_resolver = None
+
+
+def is_ip_literal(address: str) -> bool:
+    try:
+        ipaddress.IPv4Address(address)
+        return True
+    except ValueError:
+        return False
+
+
+class ResolverCache:
+    """Потокобезопасный кэш hostname -> IPv4 с положительным и отрицательным TTL"""
+
+    def __init__(self, default_ttl: float = 300, negative_ttl: float = 60,
+                 max_workers: int = 32, timeout: float = 2.0, clock=time.monotonic):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._clock = clock
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {}  # имя -> (ip, истекает)
+        self._lock = threading.Lock()
+
+    def _lookup(self, hostname: str) -> Tuple[Optional[str], float]:
+        """Запрос к DNS: (ip, ttl). ip=None - имя не разрешилось"""
+        if dns_resolver is not None:
+            try:
+                answer = dns_resolver.resolve(hostname, 'A', lifetime=self.timeout)
+                return answer[0].to_text(), min(answer.rrset.ttl, self.default_ttl)
+            except Exception:
+                return None, self.negative_ttl
+        try:
+            infos = socket.getaddrinfo(hostname, None, socket.AF_INET, socket.SOCK_STREAM)
+            return infos[0][4][0], self.default_ttl
+        except (socket.gaierror, OSError, IndexError):
+            return None, self.negative_ttl
+
+    def _cached(self, hostname: str):
+        """(найдено, ip) для неистекшей записи кэша"""
+        with self._lock:
+            entry = self._entries.get(hostname)
+        if entry and entry[1] > self._clock():
+            return True, entry[0]
+        return False, None
+
+    def _store(self, hostname: str, ip: Optional[str], ttl: float):
+        with self._lock:
+            self._entries[hostname] = (ip, self._clock() + ttl)
+
+    def _resolve_uncached(self, hostname: str) -> Optional[str]:
+        ip, ttl = self._lookup(hostname)
+        self._store(hostname, ip, ttl)
+        metrics.DNS_LOOKUPS.inc(result='miss' if ip else 'error')
+        return ip
+
+    def resolve(self, hostname: str) -> Optional[str]:
+        """IPv4 адрес для имени (IP-адрес возвращается как есть)"""
+        hostname = hostname.strip().lower()
+        if is_ip_literal(hostname):
+            return hostname
+        found, ip = self._cached(hostname)
+        if found:
+            metrics.DNS_LOOKUPS.inc(result='hit')
+            return ip
+        return self._resolve_uncached(hostname)
+
+    def resolve_many(self, hostnames: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Разрешает набор имен: кэш - сразу, промахи - параллельно в пуле потоков"""
+        resolved = {}
+        misses = []
+        for hostname in {h.strip().lower() for h in hostnames if h and h.strip()}:
+            if is_ip_literal(hostname):
+                resolved[hostname] = hostname
+                continue
+            found, ip = self._cached(hostname)
+            if found:
+                metrics.DNS_LOOKUPS.inc(result='hit')
+                resolved[hostname] = ip
+            else:
+                misses.append(hostname)
+
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(misses))) as pool:
+                for hostname, ip in zip(misses, pool.map(self._resolve_uncached, misses)):
+                    resolved[hostname] = ip
+
+        return resolved
+
+    def invalidate(self, hostname: str = None):
+        with self._lock:
+            if hostname is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(hostname.strip().lower(), None)
+
+
+RESOLVER = ResolverCache(
+    default_ttl=getattr(settings, 'PRINTER_DNS_TTL', 300),
+    negative_ttl=getattr(settings, 'PRINTER_DNS_NEGATIVE_TTL', 60),
+)
@@ -8,7 +8,9 @@ from django.db.models import Count, Q
 from django.db import transaction
 
 from equipments.models import Equipment
-from .models import PrinterCheck, PrinterCurrentStatus
+from . import metrics
+from .models import PrinterAddressChange, PrinterCheck, PrinterCurrentStatus
+from .resolver import RESOLVER
 
 
 class PrinterMonitorService:
@@ -36,7 +38,8 @@ class PrinterMonitorService:
                     'online': True,
                     'response_time': response_time,
                     'port': port,
-                    'error': None
+                    'error': None,
+                    'error_type': None
                 }
             
             for test_port in PrinterMonitorService.COMMON_PORTS:
@@ -46,14 +49,16 @@ class PrinterMonitorService:
                         'online': True,
                         'response_time': response_time,
                         'port': test_port,
-                        'error': None
+                        'error': None,
+                        'error_type': None
                     }
             
             return {
                 'online': False,
                 'response_time': (time.time() - start_time) * 1000,
                 'port': None,
-                'error': 'Все порты закрыты'
+                'error': 'Все порты закрыты',
+                'error_type': 'closed'
             }
             
         except socket.timeout:
@@ -61,14 +66,16 @@ class PrinterMonitorService:
                 'online': False,
                 'response_time': timeout * 1000,
                 'port': None,
-                'error': 'Таймаут соединения'
+                'error': 'Таймаут соединения',
+                'error_type': 'timeout'
             }
         except Exception as e:
             return {
                 'online': False,
                 'response_time': 0,
                 'port': None,
-                'error': str(e)
+                'error': str(e),
+                'error_type': type(e).__name__
             }
     
     @staticmethod
@@ -79,12 +86,15 @@ class PrinterMonitorService:
                 defaults={
                     'is_online': check_result['online'],
                     'last_updated': timezone.now(),
-                    'status': 'online' if check_result['online'] else 'offline'
+                    'status': 'online' if check_result['online'] else 'offline',
+                    'resolved_ip': check_result.get('resolved_ip'),
                 }
             )
             
             if not created:
                 current_status.is_online = check_result['online']
+                if check_result.get('resolved_ip'):
+                    current_status.resolved_ip = check_result['resolved_ip']
                 current_status.last_updated = timezone.now()
                 
                 if check_result['online']:
@@ -99,17 +109,92 @@ class PrinterMonitorService:
             return current_status
     
     @staticmethod
-    def check_all_printers() -> List[Dict]:
-        printers = Equipment.objects.filter(
-            type='printer',
-            ip_address__isnull=False
+    def _department_label(printer: Equipment) -> str:
+        """Отдел принтера для метрик: закрепление за отделом, затем отдел сотрудника"""
+        if printer.assigned_department:
+            return printer.assigned_department.name
+        if printer.assigned_to and printer.assigned_to.department:
+            return printer.assigned_to.department.name
+        return 'Без отдела'
+    
+    @staticmethod
+    def network_printers():
+        """Принтеры, которые опрашиваются по сети: с IP адресом или именем хоста"""
+        return Equipment.objects.filter(type='printer').filter(
+            Q(ip_address__isnull=False) | ~Q(hostname='')
         )
+    
+    @staticmethod
+    def record_address_changes(printers: List[Equipment], resolved: Dict[str, str]) -> List[PrinterAddressChange]:
+        """Сохраняет смену IP у принтеров с именем хоста (сравнение с последним известным IP)"""
+        by_pk = {printer.pk: printer for printer in printers if printer.hostname}
+        if not by_pk:
+            return []
+        
+        known_ips = dict(
+            PrinterCurrentStatus.objects.filter(printer_id__in=by_pk).values_list('printer_id', 'resolved_ip')
+        )
+        
+        changes = []
+        for pk, printer in by_pk.items():
+            new_ip = resolved.get(printer.hostname.strip().lower())
+            old_ip = known_ips.get(pk)
+            if new_ip and old_ip and new_ip != old_ip:
+                changes.append(PrinterAddressChange(
+                    printer=printer,
+                    hostname=printer.hostname,
+                    old_ip=old_ip,
+                    new_ip=new_ip,
+                ))
+        
+        return PrinterAddressChange.objects.bulk_create(changes)
+    
+    @staticmethod
+    def check_all_printers() -> List[Dict]:
+        sweep_started = time.monotonic()
+        
+        printers = list(PrinterMonitorService.network_printers().select_related(
+            'assigned_department', 'assigned_to__department'
+        ))
+        
+        # Все имена разрешаем заранее и параллельно, через кэш с TTL
+        resolved = RESOLVER.resolve_many(printer.hostname for printer in printers if printer.hostname)
+        PrinterMonitorService.record_address_changes(printers, resolved)
         
         results = []
+        online_by_department = {}
+        offline_by_department = {}
+        
+        metrics.QUEUE_DEPTH.set(len(printers))
         
         for printer in printers:
-            check_result = PrinterMonitorService.check_printer(printer.ip_address)
+            metrics.QUEUE_DEPTH.dec()
+            
+            # Пустой адрес опрашивать бессмысленно - откладываем до исправления карточки
+            if not printer.network_address:
+                metrics.PRINTERS_DEFERRED.inc()
+                continue
             
+            if printer.hostname:
+                ip = resolved.get(printer.hostname.strip().lower())
+                if ip:
+                    check_result = PrinterMonitorService.check_printer(ip)
+                else:
+                    check_result = {
+                        'online': False,
+                        'response_time': None,
+                        'port': None,
+                        'error': f'Не удалось разрешить имя {printer.hostname}',
+                        'error_type': 'dns'
+                    }
+                check_result['resolved_ip'] = ip
+            else:
+                check_result = PrinterMonitorService.check_printer(printer.ip_address)
+            metrics.PRINTERS_PROBED.inc()
+            if check_result.get('error_type'):
+                metrics.PROBE_ERRORS.inc(type=check_result['error_type'])
+            
+            write_started = time.monotonic()
             PrinterCheck.objects.create(
                 printer=printer,
                 is_online=check_result['online'],
@@ -118,10 +203,25 @@ class PrinterMonitorService:
             )
             
             PrinterMonitorService.update_printer_status(printer, check_result)
+            metrics.DB_WRITE_DURATION.observe(time.monotonic() - write_started)
+            
+            department = PrinterMonitorService._department_label(printer)
+            online_by_department.setdefault(department, 0)
+            offline_by_department.setdefault(department, 0)
+            if check_result['online']:
+                online_by_department[department] += 1
+            else:
+                offline_by_department[department] += 1
             
             results.append({
                 'printer': printer,
                 'result': check_result
             })
         
-        return results
\ No newline at end of file
+        metrics.QUEUE_DEPTH.set(0)
+        metrics.PRINTERS_ONLINE.replace(online_by_department)
+        metrics.PRINTERS_OFFLINE.replace(offline_by_department)
+        metrics.SWEEP_DURATION.observe(time.monotonic() - sweep_started)
+        metrics.SWEEP_LAST_COMPLETED.set(time.time())
+        
+        return results
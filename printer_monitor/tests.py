@@ -1,3 +1,210 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from employees.models import Department
+from equipments.models import Equipment
+from . import metrics
+from .services import PrinterMonitorService
+
+
+class MetricsRegistryTest(TestCase):
+    """Тесты формата метрик"""
+
+    def test_counter_with_labels(self):
+        """Счетчик с метками выводится в формате Prometheus"""
+        registry = metrics.MetricsRegistry()
+        counter = registry.register(metrics.Counter('test_errors_total', 'Ошибки', labelnames=('type',)))
+        counter.inc(type='timeout')
+        counter.inc(2, type='timeout')
+
+        output = registry.render()
+        self.assertIn('# TYPE test_errors_total counter', output)
+        self.assertIn('test_errors_total{type="timeout"} 3', output)
+
+    def test_histogram_buckets(self):
+        """Гистограмма накапливает корзины, сумму и количество"""
+        histogram = metrics.Histogram('test_duration_seconds', 'Длительность', buckets=(1, 5))
+        histogram.observe(0.5)
+        histogram.observe(3)
+
+        output = histogram.render()
+        self.assertIn('test_duration_seconds_bucket{le="1"} 1', output)
+        self.assertIn('test_duration_seconds_bucket{le="5"} 2', output)
+        self.assertIn('test_duration_seconds_bucket{le="+Inf"} 2', output)
+        self.assertIn('test_duration_seconds_count 2', output)
+
+    def test_gauge_replace_drops_old_labels(self):
+        """replace() убирает значения пропавших меток"""
+        gauge = metrics.Gauge('test_online', 'В сети', labelnames=('department',))
+        gauge.replace({'Склад': 2, 'Бухгалтерия': 1})
+        gauge.replace({'Склад': 3})
+
+        output = gauge.render()
+        self.assertIn('test_online{department="Склад"} 3', output)
+        self.assertNotIn('Бухгалтерия', output)
+
+
+class SweepMetricsTest(TestCase):
+    """Метрики обновляются сервисом во время проверки"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.snapshot_path = os.path.join(self.folder.name, 'printer_metrics.json')
+        override = override_settings(PRINTER_METRICS_FILE=self.snapshot_path)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.department = Department.objects.create(name='ИТ-отдел')
+        Equipment.objects.create(mc_number='PRN001', type='printer', ip_address='192.168.1.10',
+                                 assigned_department=self.department)
+        Equipment.objects.create(mc_number='PRN002', type='printer', ip_address='192.168.1.11',
+                                 assigned_department=self.department)
+        Equipment.objects.create(mc_number='PRN003', type='printer', ip_address='')
+
+    def test_sweep_updates_metrics(self):
+        """Проверка обновляет счетчики, очередь и статусы по отделам"""
+        results = iter([
+            {'online': True, 'response_time': 5.0, 'port': 9100, 'error': None, 'error_type': None},
+            {'online': False, 'response_time': 2000.0, 'port': None,
+             'error': 'Таймаут соединения', 'error_type': 'timeout'},
+        ])
+        probed_before = metrics.PRINTERS_PROBED.get()
+        deferred_before = metrics.PRINTERS_DEFERRED.get()
+        timeouts_before = metrics.PROBE_ERRORS.get(type='timeout')
+
+        with mock.patch.object(PrinterMonitorService, 'check_printer', side_effect=lambda ip: next(results)):
+            PrinterMonitorService.check_all_printers()
+
+        self.assertEqual(metrics.PRINTERS_PROBED.get() - probed_before, 2)
+        self.assertEqual(metrics.PRINTERS_DEFERRED.get() - deferred_before, 1)
+        self.assertEqual(metrics.PROBE_ERRORS.get(type='timeout') - timeouts_before, 1)
+        self.assertEqual(metrics.QUEUE_DEPTH.get(), 0)
+        self.assertEqual(metrics.PRINTERS_ONLINE.get(department='ИТ-отдел'), 1)
+        self.assertEqual(metrics.PRINTERS_OFFLINE.get(department='ИТ-отдел'), 1)
+
+    def test_metrics_endpoint(self):
+        """/metrics отдает текст без обращений к базе данных"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('printer_monitor_sweep_duration_seconds', response.content.decode())
+
+    def test_cron_sweep_visible_at_endpoint(self):
+        """Проверка из check_printers продолжает счетчики снимка, а /metrics отдает снимок"""
+        previous = metrics.REGISTRY.from_snapshot({})
+        previous.load({metrics.PRINTERS_PROBED.name: [[[], 5]]})
+        metrics.write_snapshot(previous)
+
+        online = {'online': True, 'response_time': 5.0, 'port': 9100, 'error': None, 'error_type': None}
+        with mock.patch.object(PrinterMonitorService, 'check_printer', return_value=online):
+            call_command('check_printers', stdout=StringIO())
+
+        self.assertEqual(metrics.read_snapshot()[metrics.PRINTERS_PROBED.name], [[[], 7.0]])
+
+        # веб-процесс сам не проверял: значения берутся из снимка, а не из памяти
+        metrics.REGISTRY.load({})
+        with self.assertNumQueries(0):
+            response = self.client.get('/metrics')
+        content = response.content.decode()
+        self.assertIn('printer_monitor_printers_probed_total 7', content)
+        self.assertIn('printer_monitor_printers_online{department="ИТ-отдел"} 2', content)
+
+    def test_metrics_endpoint_restricted(self):
+        """С чужого адреса /metrics доступен только сотрудникам"""
+        response = self.client.get('/metrics', REMOTE_ADDR='10.20.30.40')
+        self.assertEqual(response.status_code, 403)
+
+        staff = User.objects.create_user('admin', password='secret', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/metrics', REMOTE_ADDR='10.20.30.40')
+        self.assertEqual(response.status_code, 200)
+
+
+class PrinterFarmBenchmarkTest(TestCase):
+    """Стенд: ферма отвечает, замер считает записи в БД"""
+
+    def test_small_farm_sweep(self):
+        from .benchmark import PrinterFarm, run_benchmark
+
+        with PrinterFarm(count=5, drop_rate=0.0, protocols=('tcp',), seed=1) as farm:
+            report = run_benchmark(farm, engines=['sequential'], persistence_modes=['per_row'])
+
+        run = report['runs'][0]
+        self.assertEqual(run['printers'], 5)
+        self.assertEqual(run['online'], 5)
+        # PrinterCheck + PrinterCurrentStatus на каждый принтер
+        self.assertEqual(run['db_writes'], 10)
+
+
+class ResolverCacheTest(TestCase):
+    """Кэш DNS с TTL"""
+
+    def setUp(self):
+        from .resolver import ResolverCache
+
+        self.now = [0.0]
+        self.cache = ResolverCache(default_ttl=300, negative_ttl=60, clock=lambda: self.now[0])
+        self.lookups = []
+
+        def lookup(hostname):
+            self.lookups.append(hostname)
+            if hostname == 'missing.corp.local':
+                return None, 60
+            return '10.0.0.%d' % len(self.lookups), 300
+
+        self.cache._lookup = lookup
+
+    def test_ttl_respected(self):
+        """Повторный запрос в пределах TTL берется из кэша, после - идет в DNS"""
+        self.assertEqual(self.cache.resolve('prn-01.corp.local'), '10.0.0.1')
+        self.assertEqual(self.cache.resolve('PRN-01.corp.local'), '10.0.0.1')
+        self.assertEqual(len(self.lookups), 1)
+
+        self.now[0] = 301
+        self.assertEqual(self.cache.resolve('prn-01.corp.local'), '10.0.0.2')
+        self.assertEqual(len(self.lookups), 2)
+
+    def test_resolve_many_and_negative_cache(self):
+        """resolve_many разрешает только промахи, ненайденные имена тоже кэшируются"""
+        resolved = self.cache.resolve_many(['prn-01.corp.local', 'missing.corp.local', '192.168.1.5'])
+        self.assertEqual(resolved['missing.corp.local'], None)
+        self.assertEqual(resolved['192.168.1.5'], '192.168.1.5')
+
+        self.cache.resolve_many(['prn-01.corp.local', 'missing.corp.local'])
+        self.assertEqual(sorted(self.lookups), ['missing.corp.local', 'prn-01.corp.local'])
+
+
+class HostnameSweepTest(TestCase):
+    """Проверка принтеров по имени хоста"""
+
+    def test_address_change_recorded(self):
+        from .models import PrinterAddressChange, PrinterCurrentStatus
+
+        printer = Equipment.objects.create(mc_number='PRN010', type='printer', hostname='prn-10.corp.local')
+        online = {'online': True, 'response_time': 1.0, 'port': 9100, 'error': None, 'error_type': None}
+        probed = []
+
+        def check(ip):
+            probed.append(ip)
+            return dict(online)
+
+        with mock.patch.object(PrinterMonitorService, 'check_printer', side_effect=check):
+            with mock.patch('printer_monitor.services.RESOLVER.resolve_many',
+                            return_value={'prn-10.corp.local': '10.0.0.5'}):
+                PrinterMonitorService.check_all_printers()
+            with mock.patch('printer_monitor.services.RESOLVER.resolve_many',
+                            return_value={'prn-10.corp.local': '10.0.0.9'}):
+                PrinterMonitorService.check_all_printers()
+
+        self.assertEqual(probed, ['10.0.0.5', '10.0.0.9'])
+        self.assertEqual(PrinterCurrentStatus.objects.get(printer=printer).resolved_ip, '10.0.0.9')
+        change = PrinterAddressChange.objects.get(printer=printer)
+        self.assertEqual((change.old_ip, change.new_ip), ('10.0.0.5', '10.0.0.9'))
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from django.views.generic import TemplateView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -8,9 +10,25 @@ from datetime import timedelta
 
 from equipments.models import Equipment
 from .models import PrinterCheck, PrinterCurrentStatus
+from . import metrics
 from .services import PrinterMonitorService
 
 
+def metrics_view(request):
+    """
+    Метрики мониторинга в формате Prometheus: последний снимок проверки
+    (в том числе из cron), без запросов к БД. Доступ - с адресов из
+    settings.METRICS_ALLOWED_IPS (сервер Prometheus) или сотрудникам (is_staff).
+    """
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if request.META.get('REMOTE_ADDR') not in allowed_ips and not request.user.is_staff:
+        return HttpResponseForbidden('Доступ к метрикам запрещен')
+
+    snapshot = metrics.read_snapshot()
+    registry = metrics.REGISTRY.from_snapshot(snapshot) if snapshot is not None else metrics.REGISTRY
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class PrinterStatusView(LoginRequiredMixin, TemplateView):
     template_name = 'printer_monitor/status.html'
     
@@ -23,12 +41,12 @@ class PrinterStatusView(LoginRequiredMixin, TemplateView):
         # 2. Считаем статистику ПРАВИЛЬНО
         stats = printers.aggregate(
             total=Count('id'),
-            with_ip=Count('id', filter=Q(ip_address__isnull=False)),
-            without_ip=Count('id', filter=Q(ip_address__isnull=True))
+            with_ip=Count('id', filter=Q(ip_address__isnull=False) | ~Q(hostname='')),
+            without_ip=Count('id', filter=Q(ip_address__isnull=True, hostname=''))
         )
         
         # 3. Получаем сетевые принтеры (с IP)
-        network_printers = printers.filter(ip_address__isnull=False)
+        network_printers = PrinterMonitorService.network_printers().order_by('mc_number')
         
         # 4. Для каждого принтера получаем последний статус
         printer_statuses = []
@@ -77,7 +95,8 @@ class CheckPrintersView(LoginRequiredMixin, TemplateView):
     def post(self, request, *args, **kwargs):
         """POST запрос для проверки принтеров"""
         # Используем сервис для проверки
-        results = PrinterMonitorService.check_all_printers()
+        with metrics.shared_snapshot():
+            results = PrinterMonitorService.check_all_printers()
     
         # Отладочная информация
         print(f"DEBUG: Получено {len(results)} результатов")
@@ -99,10 +118,7 @@ class CheckPrintersView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['printers_count'] = Equipment.objects.filter(
-            type='printer', 
-            ip_address__isnull=False
-        ).count()
+        context['printers_count'] = PrinterMonitorService.network_printers().count()
         return context
 
 
@@ -117,13 +133,13 @@ class PrinterStatsView(LoginRequiredMixin, TemplateView):
         # Основная статистика
         stats = printers.aggregate(
             total=Count('id'),
-            with_ip=Count('id', filter=Q(ip_address__isnull=False)),
-            without_ip=Count('id', filter=Q(ip_address__isnull=True)),
+            with_ip=Count('id', filter=Q(ip_address__isnull=False) | ~Q(hostname='')),
+            without_ip=Count('id', filter=Q(ip_address__isnull=True, hostname='')),
         )
         
         # Простая версия problem_printers (убери сервис пока)
         problem_printers = []
-        for printer in printers.filter(ip_address__isnull=True):
+        for printer in printers.filter(ip_address__isnull=True, hostname=''):
             problem_printers.append({
                 'printer': printer,
                 'reason': 'Нет IP-адреса'
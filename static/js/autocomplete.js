@@ -0,0 +1,59 @@
+// Подсказки в строке поиска (МЦ, сотрудники, отделы)
+document.addEventListener('DOMContentLoaded', function() {
+    const TYPE_ICONS = {
+        equipment: 'bi-pc-display',
+        employee: 'bi-person',
+        department: 'bi-building',
+    };
+
+    document.querySelectorAll('[data-autocomplete-url]').forEach(function(input) {
+        const menu = input.parentElement.querySelector('[data-autocomplete-menu]');
+        const url = input.getAttribute('data-autocomplete-url');
+        let timer = null;
+        let controller = null;
+
+        function hide() {
+            menu.classList.remove('show');
+            menu.innerHTML = '';
+        }
+
+        function render(results) {
+            menu.innerHTML = '';
+            results.forEach(function(item) {
+                const link = document.createElement('a');
+                link.className = 'dropdown-item';
+                link.href = item.url;
+                const icon = document.createElement('i');
+                icon.className = 'bi ' + (TYPE_ICONS[item.type] || 'bi-search') + ' me-2';
+                link.appendChild(icon);
+                link.appendChild(document.createTextNode(item.label));
+                menu.appendChild(link);
+            });
+            menu.classList.toggle('show', results.length > 0);
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (!query) {
+                hide();
+                return;
+            }
+            timer = setTimeout(function() {
+                if (controller) {
+                    controller.abort();
+                }
+                controller = new AbortController();
+                fetch(url + '?q=' + encodeURIComponent(query), {signal: controller.signal})
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) { render(data.results); })
+                    .catch(function() {});
+            }, 150);
+        });
+
+        input.addEventListener('blur', function() {
+            // Даем клику по подсказке сработать до скрытия меню
+            setTimeout(hide, 200);
+        });
+    });
+});
@@ -0,0 +1,30 @@
+// Опрос прогресса фоновой задачи импорта/экспорта
+document.addEventListener('DOMContentLoaded', function() {
+    const card = document.querySelector('[data-job-poll]');
+    if (!card) {
+        return;
+    }
+    const url = card.getAttribute('data-job-status-url');
+
+    function poll() {
+        fetch(url, {headers: {'Accept': 'application/json'}})
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                card.querySelectorAll('[data-job-field]').forEach(function(element) {
+                    const value = data[element.getAttribute('data-job-field')];
+                    if (value !== undefined) {
+                        element.textContent = value;
+                    }
+                });
+                if (data.finished) {
+                    // Итоги (ссылка на файл ошибок, изменения) рисует сервер
+                    window.location.reload();
+                } else {
+                    setTimeout(poll, 1000);
+                }
+            })
+            .catch(function() { setTimeout(poll, 5000); });
+    }
+
+    setTimeout(poll, 1000);
+});